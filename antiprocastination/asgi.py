@@ -3,14 +3,131 @@ ASGI config for antiprocastination project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Requests to ``/events/stream/`` are answered here with a Server-Sent Events
+stream of the user's timer and task events, bypassing the Django middleware
+stack so an open dashboard tab costs one connection and no per-second
+queries. Everything else goes to Django. Under WSGI the same URL returns
+204 and the dashboard falls back to ``/events/poll/``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
+import asyncio
+import json
 import os
+from http.cookies import SimpleCookie
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'antiprocastination.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after setup so the app registry is ready.
+from asgiref.sync import sync_to_async  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import aget_user  # noqa: E402
+from django.utils.module_loading import import_string  # noqa: E402
+
+from core.events import events_since, latest_event_id  # noqa: E402
+
+EVENT_STREAM_PATH = '/events/stream/'
+POLL_INTERVAL = 1.0
+HEARTBEAT_INTERVAL = 15.0
+
+
+class _SessionRequest:
+    """The minimum of a request that ``aget_user`` needs."""
+
+    def __init__(self, session):
+        self.session = session
+
+
+def _header(scope, name):
+    for key, value in scope.get('headers', []):
+        if key == name:
+            return value.decode('latin-1')
+    return ''
+
+
+async def _authenticate(scope):
+    cookie = SimpleCookie()
+    cookie.load(_header(scope, b'cookie'))
+    morsel = cookie.get(settings.SESSION_COOKIE_NAME)
+    if morsel is None:
+        return None
+
+    session_store = import_string(f"{settings.SESSION_ENGINE}.SessionStore")
+    user = await aget_user(_SessionRequest(session_store(morsel.value)))
+    return user.id if user.is_authenticated else None
+
+
+async def event_stream(scope, receive, send):
+    user_id = await _authenticate(scope)
+    if user_id is None:
+        await send({'type': 'http.response.start', 'status': 403, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+
+    disconnected = asyncio.Event()
+
+    async def watch_disconnect():
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                disconnected.set()
+                return
+
+    watcher = asyncio.ensure_future(watch_disconnect())
+    get_events = sync_to_async(events_since, thread_sensitive=False)
+
+    last_event_id = _header(scope, b'last-event-id')
+    if last_event_id.isdigit():
+        cursor = int(last_event_id)
+    else:
+        cursor = await sync_to_async(latest_event_id, thread_sensitive=False)(user_id)
+
+    try:
+        await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+        idle = 0.0
+        while not disconnected.is_set():
+            try:
+                await asyncio.wait_for(disconnected.wait(), timeout=POLL_INTERVAL)
+                break
+            except asyncio.TimeoutError:
+                pass
+
+            # Cache read only; the database is never touched after the handshake.
+            cursor, events = await get_events(user_id, cursor)
+            if events:
+                body = ''.join(
+                    f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+                    for event in events
+                )
+                await send({'type': 'http.response.body', 'body': body.encode(), 'more_body': True})
+                idle = 0.0
+            else:
+                idle += POLL_INTERVAL
+                if idle >= HEARTBEAT_INTERVAL:
+                    await send({'type': 'http.response.body', 'body': b': ping\n\n', 'more_body': True})
+                    idle = 0.0
+    finally:
+        watcher.cancel()
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == EVENT_STREAM_PATH:
+        await event_stream(scope, receive, send)
+        return
+    await django_application(scope, receive, send)
@@ -101,6 +101,35 @@ else:
     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Throttles, events, timer state and page versions must be shared by every
+# Gunicorn worker and the process_tasks worker, so the fallback is a table in
+# the main database (`python manage.py createcachetable`). Set REDIS_URL to
+# take that load off the database.
+REDIS_URL = os.environ.get("REDIS_URL", "")
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
+
+
+# Timer +5 min / edit clicks are buffered in the cache and flushed in
+# batches by flush_timer_state. Only safe when the cache outlives a worker
+# restart, so it follows REDIS_URL; otherwise every edit is written through.
+TIMER_WRITE_BEHIND = bool(REDIS_URL)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -160,4 +189,24 @@ EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER", "")
 EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD", "")
 DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", "")
 # Prevents long SMTP hangs that can trigger Gunicorn worker aborts.
-EMAIL_TIMEOUT = int(os.environ.get("EMAIL_TIMEOUT", "15"))
\ No newline at end of file
+EMAIL_TIMEOUT = int(os.environ.get("EMAIL_TIMEOUT", "15"))
+
+# Sliding-window limits for the auth/OTP endpoints: scope -> (max hits, window seconds).
+THROTTLE_RATES = {
+    'signup': (5, 600),
+    'resend_otp': (3, 300),
+    'forgot_password': (3, 300),
+    'verify_otp': (10, 300),
+    # Each regeneration is a paid AI call.
+    'plan_regenerate': (10, 3600),
+}
+# Number of reverse proxies in front of the app (Render adds one); used to
+# pick the real client IP out of X-Forwarded-For.
+THROTTLE_PROXY_COUNT = int(os.environ.get("THROTTLE_PROXY_COUNT", "0"))
+
+# Where background account exports (gzip files) are written.
+EXPORT_ROOT = os.environ.get("EXPORT_ROOT") or os.path.join(BASE_DIR, 'exports')
+
+# Render study plans into the shared cache when they are
+# saved instead of on first view (see core/rendering.py).
+MARKDOWN_PRECOMPUTE = os.environ.get("MARKDOWN_PRECOMPUTE", "false").lower() == "true"
@@ -0,0 +1,192 @@
+"""
+Date-range views over a user's tasks: the JSON agenda (week/month) and the
+ICS subscription feed. Both read only the rows inside the requested window
+(or, for the feed, stream the user's rows in chunks) and expand recurring
+tasks from their rules instead of storing occurrences.
+"""
+import datetime
+import hashlib
+from collections import defaultdict
+
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .models import OccurrenceOverride, RecurrenceRule, StudyPlan, Todo
+from .recurrence import occurrences_with_status
+
+
+FEED_CHUNK_SIZE = 500
+
+
+def agenda_range(view, anchor):
+    """[start, end] of the week (Monday-Sunday) or calendar month containing `anchor`."""
+    if view == 'month':
+        start = anchor.replace(day=1)
+        next_month = (start + datetime.timedelta(days=32)).replace(day=1)
+        return start, next_month - datetime.timedelta(days=1)
+    start = anchor - datetime.timedelta(days=anchor.weekday())
+    return start, start + datetime.timedelta(days=6)
+
+
+def _user_tasks(user):
+    # The dashboard's scope: team tasks a user created for others aren't on their calendar.
+    return Todo.objects.filter(Q(user=user, team__isnull=True) | Q(assignee=user)).exclude(status='DELETED')
+
+
+def _task_item(task, kind, status=None):
+    return {
+        'task_id': task.id,
+        'title': task.title,
+        'kind': kind,
+        'status': status or task.status,
+        'priority': task.priority,
+        'team_id': task.team_id,
+    }
+
+
+def agenda_entries(user, start, end):
+    """
+    Agenda for [start, end] as {date: [item, ...]}. One-off tasks come from
+    the (user, scheduled_date)/(user, deadline) indexes, recurring tasks are
+    expanded from their rules and study plans contribute one item per day.
+    """
+    days = defaultdict(list)
+    tasks = _user_tasks(user)
+
+    one_off = tasks.filter(is_recurring=False).filter(
+        Q(scheduled_date__range=(start, end)) | Q(deadline__range=(start, end))
+    ).only('id', 'title', 'status', 'priority', 'team_id', 'scheduled_date', 'deadline')
+    for task in one_off:
+        if task.scheduled_date and start <= task.scheduled_date <= end:
+            days[task.scheduled_date].append(_task_item(task, 'scheduled'))
+        if task.deadline and start <= task.deadline <= end and task.deadline != task.scheduled_date:
+            days[task.deadline].append(_task_item(task, 'deadline'))
+
+    rules = list(
+        RecurrenceRule.objects.filter(task__in=tasks, dtstart__lte=end)
+        .filter(Q(until__isnull=True) | Q(until__gte=start))
+        .select_related('task')
+    )
+    overrides = defaultdict(dict)
+    for task_id, day, status in OccurrenceOverride.objects.filter(
+        task_id__in=[rule.task_id for rule in rules], date__range=(start, end)
+    ).values_list('task_id', 'date', 'status'):
+        overrides[task_id][day] = status
+    today = timezone.localdate()
+    for rule in rules:
+        for day, status in occurrences_with_status(rule, start, end, overrides[rule.task_id], today=today):
+            days[day].append(_task_item(rule.task, 'recurring', status))
+
+    plans = StudyPlan.objects.filter(user=user, pending_deletion=False, start_date__lte=end, end_date__gte=start).only(
+        'id', 'subject', 'start_date', 'end_date', 'is_completed'
+    )
+    for plan in plans:
+        day = max(start, plan.start_date)
+        while day <= min(end, plan.end_date):
+            days[day].append({
+                'plan_id': plan.id,
+                'title': f"Day {(day - plan.start_date).days + 1}: {plan.subject}",
+                'kind': 'study_plan',
+                'status': 'COMPLETED' if plan.is_completed else 'PLANNED',
+            })
+            day += datetime.timedelta(days=1)
+
+    return days
+
+
+def feed_validators(user):
+    """
+    (etag, last_modified) for the user's ICS feed from two aggregate
+    queries, so an unchanged calendar costs no row reads at all.
+    """
+    tasks = _user_tasks(user).aggregate(count=Count('id'), latest=Max('last_updated'))
+    plans = StudyPlan.objects.filter(user=user, pending_deletion=False).aggregate(count=Count('id'), latest=Max('last_updated'))
+    fingerprint = f"{user.id}:{tasks['count']}:{tasks['latest']}:{plans['count']}:{plans['latest']}"
+    last_modified = max(filter(None, [tasks['latest'], plans['latest']]), default=None)
+    return f'"{hashlib.md5(fingerprint.encode()).hexdigest()}"', last_modified
+
+
+def _escape(text):
+    return (
+        (text or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """RFC 5545 line folding: at most 75 octets per line, continuations start with a space."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts, current = [], b''
+    for char in line:
+        char_bytes = char.encode()
+        if len(current) + len(char_bytes) > (75 if not parts else 74):
+            parts.append(current.decode())
+            current = b''
+        current += char_bytes
+    parts.append(current.decode())
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _event(uid, stamp, day, summary, description='', end_day=None, rrule=None):
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:{uid}",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART;VALUE=DATE:{day:%Y%m%d}",
+        f"DTEND;VALUE=DATE:{(end_day or day) + datetime.timedelta(days=1):%Y%m%d}",
+        f"SUMMARY:{_escape(summary)}",
+    ]
+    if description:
+        lines.append(f"DESCRIPTION:{_escape(description)}")
+    if rrule:
+        lines.append(f"RRULE:{rrule}")
+    lines.append('END:VEVENT')
+    return ''.join(_fold(line) for line in lines)
+
+
+def iter_ics_feed(user, host):
+    """Yields the user's calendar as ICS text, a chunk of rows at a time."""
+    stamp = timezone.now().strftime('%Y%m%dT%H%M%SZ')
+    yield (
+        'BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Smart Planner//Tasks//EN\r\n'
+        'CALSCALE:GREGORIAN\r\nX-WR-CALNAME:Smart Planner\r\n'
+    )
+
+    tasks = (
+        _user_tasks(user)
+        .filter(Q(scheduled_date__isnull=False) | Q(deadline__isnull=False) | Q(recurrence__isnull=False))
+        .select_related('recurrence')
+        .only('id', 'title', 'memo', 'status', 'scheduled_date', 'deadline', 'recurrence')
+        .order_by('id')
+    )
+    chunk = []
+    for task in tasks.iterator(chunk_size=FEED_CHUNK_SIZE):
+        rule = getattr(task, 'recurrence', None)
+        if rule is not None:
+            chunk.append(_event(
+                f"task-{task.id}@{host}", stamp, rule.dtstart, task.title, task.memo, rrule=rule.to_rrule(),
+            ))
+        elif task.scheduled_date:
+            chunk.append(_event(f"task-{task.id}@{host}", stamp, task.scheduled_date, task.title, task.memo))
+        if task.deadline and rule is None and task.deadline != task.scheduled_date:
+            chunk.append(_event(f"deadline-{task.id}@{host}", stamp, task.deadline, f"Deadline: {task.title}"))
+        if len(chunk) >= FEED_CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+
+    plans = (
+        StudyPlan.objects.filter(user=user, pending_deletion=False)
+        .only('id', 'subject', 'goal', 'start_date', 'end_date').order_by('id')
+    )
+    for plan in plans.iterator(chunk_size=FEED_CHUNK_SIZE):
+        chunk.append(_event(
+            f"plan-{plan.id}@{host}", stamp, plan.start_date, f"Study: {plan.subject}", plan.goal,
+            end_day=plan.end_date or plan.start_date,
+        ))
+        if len(chunk) >= FEED_CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk)
+    yield 'END:VCALENDAR\r\n'
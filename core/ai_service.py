@@ -9,6 +9,18 @@ from groq import Groq
 BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(BASE_DIR / '.env')
 
+BLOCKED_AI_PATTERN = re.compile(
+    r'(sex|sexual|porn|pornography|nude|nudes|hookup|explicit|erotic|intimacy tips|kiss|physical relation|bedroom|adult\s*content|\bxxx\b|\b18\+\b)',
+    re.IGNORECASE,
+)
+
+
+def contains_blocked_content(*texts):
+    for text in texts:
+        if text and BLOCKED_AI_PATTERN.search(str(text)):
+            return True
+    return False
+
 
 def call_groq_api(prompt, max_completion_tokens=1024, temperature=0.2):
     API_KEY = os.environ.get("GROQ_API_KEY")
@@ -70,7 +82,8 @@ def get_time_estimate_with_ai(sentence, difficulty):
 
 def get_sub_tasks_with_ai(sentence):
     """
-    Uses Groq API to generate detailed, premium sub-tasks with HTML formatting.
+    Uses Groq API to generate detailed, premium sub-tasks. Returns the steps
+    as markdown-ish lines; core.subtasks renders them to HTML once.
     """
     prompt = f"""
     You are an expert productivity coach. A user wants to tackle a big task. 
@@ -101,11 +114,7 @@ def get_sub_tasks_with_ai(sentence):
     sub_tasks = []
     for line in raw_output.splitlines():
         if line.strip().startswith(('-', '*')) or re.match(r'^\d+\.', line.strip()):
-            processed_line = line.strip("-* ").strip()
-            # **Bold** to <strong style="color: var(--accent-color);">...</strong>
-            processed_line = re.sub(r'\*\*(.*?)\*\*', r'<strong style="color: var(--accent-color);">\1</strong>', processed_line)
-            # *Italic* or _Italic_ to <em style="color: #bdbdbd; font-style: italic;">...</em>
-            processed_line = re.sub(r'[\*\_]([^\*\_]+)[\*\_]', r'<em style="color: #bdbdbd; font-style: italic;">\1</em>', processed_line)
+            processed_line = re.sub(r'^(?:[-*]|\d+\.)\s+', '', line.strip()).strip()
             sub_tasks.append(processed_line)
     
     if not sub_tasks and raw_output:
@@ -114,22 +123,74 @@ def get_sub_tasks_with_ai(sentence):
     return sub_tasks
 
 
-def generate_study_plan_with_ai(subject, goal, duration_days):
+def get_task_metadata_batch_with_ai(titles):
     """
-    Generates a detailed, day-by-day plan with HTML formatting.
+    Category, difficulty and time estimate for many tasks in ONE prompt
+    (used for imports). Returns one dict per title; anything the model
+    skips or garbles falls back to the single-task defaults.
     """
+    categories = ["Work", "Personal", "Learning", "Health", "Shopping", "Other"]
+    difficulties = ["Easy", "Moderate", "Hard"]
+    numbered = "\n".join(f"{index}. {title}" for index, title in enumerate(titles, start=1))
+    prompt = f"""Classify each task below.
+Category must be one of: {", ".join(categories)}.
+Difficulty must be one of: {", ".join(difficulties)}.
+Minutes is your estimate of the time to finish it.
+
+Answer with exactly one line per task, in this format and nothing else:
+N | Category | Difficulty | Minutes
+
+Tasks:
+{numbered}
+"""
+    raw_output = call_groq_api(prompt, max_completion_tokens=max(256, 24 * len(titles)))
+    print(f"AI Raw Output (Batch metadata, {len(titles)} tasks): {raw_output}")
 
-    def _fallback_day_block(day_number):
-        return (
-            f"## Day {day_number}: Focused Progress\n"
-            f"- <strong style=\"color: var(--accent-color);\">Review previous learning</strong>: Revise key concepts from earlier days and note weak points related to <em style=\"color: #bdbdbd; font-style: italic;\">{subject}</em>.\n"
-            f"- <strong style=\"color: var(--accent-color);\">Deep study session</strong>: Work on one concrete milestone connected to your goal: <em style=\"color: #bdbdbd; font-style: italic;\">{goal}</em>.\n"
-            f"- <strong style=\"color: var(--accent-color);\">Hands-on practice</strong>: Build or solve a practical exercise and record errors, fixes, and outcomes.\n"
-            f"- <strong style=\"color: var(--accent-color);\">Reflection and planning</strong>: Summarize what you learned and prepare the next day action list."
-        )
-
-    def _generate_chunk(start_day, end_day):
-        prompt = f"""
+    results = [
+        {'category': 'Other', 'difficulty': 'Moderate', 'time_estimate_minutes': 25}
+        for _ in titles
+    ]
+    for line in raw_output.splitlines():
+        parts = [part.strip() for part in line.split('|')]
+        if len(parts) < 4 or not re.match(r'^\d+', parts[0]):
+            continue
+        index = int(re.match(r'^\d+', parts[0]).group()) - 1
+        if not 0 <= index < len(titles):
+            continue
+        category = next((c for c in categories if c.lower() == parts[1].lower()), None)
+        difficulty = next((d for d in difficulties if d.lower() == parts[2].lower()), None)
+        minutes = re.findall(r'\d+', parts[3])
+        if category:
+            results[index]['category'] = category
+        if difficulty:
+            results[index]['difficulty'] = difficulty
+        if minutes:
+            results[index]['time_estimate_minutes'] = min(int(minutes[0]), 24 * 60)
+    return results
+
+
+# Days per AI call when writing a study plan.
+PLAN_CHUNK_DAYS = 5
+
+
+def fallback_plan_days(subject, goal, start_day, end_day):
+    return "\n\n".join(
+        f"## Day {day_number}: Focused Progress\n"
+        f"- <strong style=\"color: var(--accent-color);\">Review previous learning</strong>: Revise key concepts from earlier days and note weak points related to <em style=\"color: #bdbdbd; font-style: italic;\">{subject}</em>.\n"
+        f"- <strong style=\"color: var(--accent-color);\">Deep study session</strong>: Work on one concrete milestone connected to your goal: <em style=\"color: #bdbdbd; font-style: italic;\">{goal}</em>.\n"
+        f"- <strong style=\"color: var(--accent-color);\">Hands-on practice</strong>: Build or solve a practical exercise and record errors, fixes, and outcomes.\n"
+        f"- <strong style=\"color: var(--accent-color);\">Reflection and planning</strong>: Summarize what you learned and prepare the next day action list."
+        for day_number in range(start_day, end_day + 1)
+    )
+
+
+def generate_plan_chunk(subject, goal, duration_days, start_day, end_day, context=''):
+    """
+    Raw AI text for Day start_day..end_day of a plan (one API call), or ""
+    on failure. `context` holds neighbouring days that are already written,
+    so a regenerated range still fits the days around it.
+    """
+    prompt = f"""
 You are an expert academic advisor creating a high-quality study plan.
 Subject: "{subject}"
 Goal: "{goal}"
@@ -144,26 +205,40 @@ Hard constraints:
 4. Keep tasks actionable and specific.
 5. Output only the plan text for these days.
 """
-        return call_groq_api(prompt, max_completion_tokens=3500, temperature=0.2)
-
-    chunks = []
-    chunk_size = 5
-    for start_day in range(1, duration_days + 1, chunk_size):
-        end_day = min(start_day + chunk_size - 1, duration_days)
-        chunk_text = _generate_chunk(start_day, end_day)
-        print(f"AI Raw Output (Plan Chunk {start_day}-{end_day}): {chunk_text}")
-        if not chunk_text:
-            chunk_text = "\n\n".join(_fallback_day_block(day_no) for day_no in range(start_day, end_day + 1))
-        chunks.append(chunk_text)
+    if context:
+        prompt += f"""
+These neighbouring days are already part of the plan. Do not repeat them; make the new days follow on from the days before and lead into the days after:
+{context}
+"""
+    return call_groq_api(prompt, max_completion_tokens=3500, temperature=0.2)
+
+
+def format_plan_text(plan_text):
+    """**bold** and *italic* in AI plan text to the inline HTML the plan page shows."""
+    processed_text = re.sub(r'\*\*(.*?)\*\*', r'<strong style="color: var(--accent-color);">\1</strong>', plan_text)
+    return re.sub(r'[\*\_]([^\*\_]+)[\*\_]', r'<em style="color: #bdbdbd; font-style: italic;">\1</em>', processed_text)
+
 
+def plan_chunk_ranges(duration_days):
+    """(start_day, end_day) of each AI call that makes up a plan."""
+    return [
+        (start_day, min(start_day + PLAN_CHUNK_DAYS - 1, duration_days))
+        for start_day in range(1, duration_days + 1, PLAN_CHUNK_DAYS)
+    ]
+
+
+def assemble_study_plan(subject, goal, duration_days, chunks):
+    """
+    Joins the generated chunk texts into the final plan with HTML formatting.
+    Days the AI skipped get a fallback block.
+    """
     plan_text = "\n\n".join(chunks)
 
     found_days = {int(day) for day in re.findall(r'##\s*Day\s*(\d+)\s*:', plan_text, flags=re.IGNORECASE)}
     missing_days = [day for day in range(1, duration_days + 1) if day not in found_days]
     if missing_days:
-        plan_text += "\n\n" + "\n\n".join(_fallback_day_block(day_no) for day_no in missing_days)
+        plan_text += "\n\n" + "\n\n".join(fallback_plan_days(subject, goal, day_no, day_no) for day_no in missing_days)
 
-    processed_text = re.sub(r'\*\*(.*?)\*\*', r'<strong style="color: var(--accent-color);">\1</strong>', plan_text)
-    processed_text = re.sub(r'[\*\_]([^\*\_]+)[\*\_]', r'<em style="color: #bdbdbd; font-style: italic;">\1</em>', processed_text)
+    processed_text = format_plan_text(plan_text)
 
-    return processed_text if processed_text else "Could not generate a plan."
\ No newline at end of file
+    return processed_text if processed_text else "Could not generate a plan."
@@ -1,6 +1,22 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.signals import post_migrate
+
+
+def _repair_search_index(sender, using, **kwargs):
+    # SQLite table rebuilds (AlterField etc.) silently drop the FTS triggers,
+    # so re-create them after every migrate once the search migration is in.
+    connection = connections[using]
+    if ('core', '0016_full_text_search') not in MigrationRecorder(connection).applied_migrations():
+        return
+    from .search import install_search_index
+    install_search_index(connection)
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        post_migrate.connect(_repair_search_index, sender=self)
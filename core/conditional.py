@@ -0,0 +1,87 @@
+"""
+Conditional GET for the read-heavy pages (study plan, plan list, history,
+profile).
+
+A page's validator is built from max(last_updated) and count of the rows it
+shows and a per-user "page version": a timestamp kept in the cache and bumped
+by the model signals in models.py, and explicitly by the queryset.update()
+writes, which skip signals. The count catches a row leaving the page without
+moving the max; the page version catches everything else. These are a
+handful of indexed aggregates, so a 304 costs far less than the queries and
+template rendering it replaces.
+"""
+import datetime
+import hashlib
+import time
+from functools import wraps
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+PAGE_VERSION_KEY = 'page-version:{}'
+
+
+def page_version(user_id):
+    """Nanosecond timestamp of the user's last tracked write."""
+    key = PAGE_VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        # A lost key must never match an older validator, so restart from now.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key) or time.time_ns()
+    return version
+
+
+def bump_page_version(*user_ids):
+    now = time.time_ns()
+    cache.set_many({PAGE_VERSION_KEY.format(user_id): now for user_id in set(user_ids) - {None}}, None)
+
+
+def page_validators(request, *timestamps):
+    """
+    (etag, last_modified) for the current user's page. The CSRF secret and
+    today's date are part of the ETag because the rendered forms and the
+    "today" sections depend on them too.
+    """
+    version = page_version(request.user.id)
+    parts = [request.user.id, version, timezone.localdate(), request.META.get('CSRF_COOKIE', ''), *timestamps]
+    etag = f'"{hashlib.md5(":".join(map(str, parts)).encode()).hexdigest()}"'
+    last_modified = max(
+        [int(stamp.timestamp()) for stamp in timestamps if isinstance(stamp, datetime.datetime)] + [version // 1_000_000_000]
+    )
+    return etag, last_modified
+
+
+def conditional_page(timestamps):
+    """
+    View decorator: answers GET/HEAD with 304 while the client's copy is
+    current, without running the view. `timestamps(request, *args, **kwargs)`
+    returns the page's last_updated values and row counts, or None when the
+    page can't be validated (e.g. it is about to 404).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            # Pending flash messages are part of the page and are consumed by rendering it.
+            if request.method not in ('GET', 'HEAD') or len(messages.get_messages(request)):
+                return view(request, *args, **kwargs)
+            stamps = timestamps(request, *args, **kwargs)
+            if stamps is None:
+                return view(request, *args, **kwargs)
+
+            etag, last_modified = page_validators(request, *stamps)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
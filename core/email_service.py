@@ -0,0 +1,89 @@
+import os
+
+import httpx
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+
+BREVO_SEND_URL = "https://api.brevo.com/v3/smtp/email"
+FROM_NAME = "Smart Planner"
+
+_brevo_client = None
+
+
+def _get_brevo_client():
+    """
+    One keep-alive client per worker process, so a batch of outbox mails
+    reuses the same TLS connection instead of opening one per message.
+    """
+    global _brevo_client
+    if _brevo_client is None:
+        _brevo_client = httpx.Client(
+            timeout=settings.EMAIL_TIMEOUT,
+            limits=httpx.Limits(max_keepalive_connections=5, max_connections=10),
+        )
+    return _brevo_client
+
+
+def email_delivery_error():
+    """Returns why mail cannot be delivered with the current config, or None."""
+    if not settings.DEFAULT_FROM_EMAIL:
+        return "DEFAULT_FROM_EMAIL is not configured."
+    if os.environ.get("BREVO_API_KEY", ""):
+        return None
+    if not settings.EMAIL_HOST_USER or not settings.EMAIL_HOST_PASSWORD:
+        return "Neither BREVO_API_KEY nor SMTP credentials are configured."
+    return None
+
+
+def send_email_batch(emails):
+    """
+    Sends (to_email, subject, text_content) tuples and returns a list with
+    None for every delivered mail or the error message for failed ones.
+    Uses the Brevo REST API (works on Render free tier) and falls back to a
+    single shared SMTP connection when BREVO_API_KEY is not set.
+    """
+    api_key = os.environ.get("BREVO_API_KEY", "")
+    from_email = settings.DEFAULT_FROM_EMAIL
+
+    if api_key:
+        client = _get_brevo_client()
+        headers = {
+            "accept": "application/json",
+            "content-type": "application/json",
+            "api-key": api_key,
+        }
+        results = []
+        for to_email, subject, text_content in emails:
+            payload = {
+                "sender": {"name": FROM_NAME, "email": from_email},
+                "to": [{"email": to_email}],
+                "subject": subject,
+                "textContent": text_content,
+            }
+            try:
+                resp = client.post(BREVO_SEND_URL, json=payload, headers=headers)
+            except httpx.HTTPError as e:
+                results.append(f"Brevo request failed: {e}")
+                continue
+            if resp.status_code in (200, 201):
+                results.append(None)
+            else:
+                results.append(f"Brevo API error {resp.status_code}: {resp.text}")
+        return results
+
+    connection = get_connection(fail_silently=False)
+    results = []
+    try:
+        connection.open()
+        for to_email, subject, text_content in emails:
+            try:
+                EmailMessage(subject, text_content, from_email, [to_email], connection=connection).send()
+                results.append(None)
+            except Exception as e:
+                results.append(f"SMTP send failed: {e}")
+    except Exception as e:
+        return [f"SMTP connection failed: {e}"] * len(emails)
+    finally:
+        connection.close()
+    return results
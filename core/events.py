@@ -0,0 +1,66 @@
+from django.core.cache import cache
+
+
+# Events only need to outlive a tab reconnecting, not a long absence.
+EVENT_TTL = 300
+MAX_BACKLOG = 50
+
+
+def _seq_key(user_id):
+    return f"events:{user_id}:seq"
+
+
+def _event_key(user_id, seq):
+    return f"events:{user_id}:{seq}"
+
+
+def latest_event_id(user_id):
+    return cache.get(_seq_key(user_id)) or 0
+
+
+def publish_event(user_id, event_type, data):
+    """Appends an event to the user's short-lived feed in the shared cache."""
+    seq_key = _seq_key(user_id)
+    cache.add(seq_key, 0, timeout=None)
+    try:
+        seq = cache.incr(seq_key)
+    except ValueError:
+        cache.set(seq_key, 1, timeout=None)
+        seq = 1
+    cache.set(_event_key(user_id, seq), {'id': seq, 'type': event_type, 'data': data}, timeout=EVENT_TTL)
+    return seq
+
+
+def publish_task_event(task, event_type, **data):
+    """Sends a task event to the owner and the assignee (if different)."""
+    data['task_id'] = task.id
+    for user_id in {task.user_id, task.assignee_id} - {None}:
+        publish_event(user_id, event_type, data)
+
+
+def publish_task_batch_event(tasks, event_type, **data):
+    """
+    One event per affected user for a whole batch of tasks (dicts or rows
+    with id/user_id/assignee_id), so a bulk action reloads each tab once.
+    """
+    task_ids_by_user = {}
+    for task in tasks:
+        for user_id in {task['user_id'], task['assignee_id']} - {None}:
+            task_ids_by_user.setdefault(user_id, []).append(task['id'])
+    for user_id, task_ids in task_ids_by_user.items():
+        publish_event(user_id, event_type, {**data, 'task_ids': task_ids})
+
+
+def events_since(user_id, cursor):
+    """
+    Returns (latest_id, events) for everything after `cursor`. One cache read
+    when nothing changed, plus one get_many when something did.
+    """
+    latest = latest_event_id(user_id)
+    if latest <= cursor:
+        return latest, []
+
+    start = max(cursor + 1, latest - MAX_BACKLOG + 1)
+    keys = [_event_key(user_id, seq) for seq in range(start, latest + 1)]
+    found = cache.get_many(keys)
+    return latest, [found[key] for key in keys if key in found]
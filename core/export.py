@@ -0,0 +1,116 @@
+"""
+Streaming account export. Every source is read with .values().iterator(),
+so a request or job holds one chunk of rows at a time whatever the account
+size; the same generators feed the HTTP response, the management command
+and the background gzip job.
+"""
+import csv
+import gzip
+import os
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+
+from .models import Profile, StudyPlan, Todo, UserBadge
+
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = ('jsonl', 'csv')
+
+TASK_FIELDS = [
+    'id', 'title', 'status', 'created', 'last_updated', 'scheduled_date', 'deadline', 'category',
+    'difficulty', 'time_estimate_minutes', 'sub_tasks', 'datecompleted', 'memo', 'important',
+    'priority', 'is_recurring', 'recurring_type', 'last_completed', 'team_id', 'assignee_id', 'study_plan_id',
+]
+PLAN_FIELDS = [
+    'id', 'subject', 'goal', 'duration_days', 'start_date', 'end_date', 'is_active', 'is_completed',
+    'created_at', 'generated_plan',
+]
+BADGE_FIELDS = ['code', 'name', 'description', 'earned_at']
+PROFILE_FIELDS = [
+    'xp', 'level', 'mood', 'reminder_time', 'early_bird_streak', 'last_early_bird_date',
+    'night_owl_streak', 'last_night_owl_date',
+]
+
+
+def _tasks(user):
+    return (
+        Todo.objects.filter(Q(user=user) | Q(assignee=user)).exclude(status='DELETED')
+        .order_by('id').values(*TASK_FIELDS)
+    )
+
+
+def _plans(user):
+    return StudyPlan.objects.filter(user=user, pending_deletion=False).order_by('id').values(*PLAN_FIELDS)
+
+
+def _badges(user):
+    return (
+        UserBadge.objects.filter(user=user)
+        .order_by('earned_at')
+        .values('earned_at', code=F('badge__badge_id'), name=F('badge__name'), description=F('badge__description'))
+    )
+
+
+def _profile(user):
+    return Profile.objects.filter(user=user).values(*PROFILE_FIELDS)
+
+
+# model name -> (record type in JSONL, queryset builder, CSV columns)
+EXPORT_SOURCES = {
+    'tasks': ('task', _tasks, TASK_FIELDS),
+    'plans': ('study_plan', _plans, PLAN_FIELDS),
+    'badges': ('badge', _badges, BADGE_FIELDS),
+    'profile': ('profile', _profile, PROFILE_FIELDS),
+}
+
+
+def iter_jsonl(user, models=None):
+    """One JSON object per line, each tagged with its record type."""
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for name in models or EXPORT_SOURCES:
+        record_type, queryset, _ = EXPORT_SOURCES[name]
+        for row in queryset(user).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield encoder.encode({'type': record_type, **row}) + '\n'
+
+
+class _Echo:
+    """File-like object whose write() just hands the line back (csv.writer needs a file)."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(user, model='tasks'):
+    """CSV has one fixed set of columns, so it exports a single model at a time."""
+    _, queryset, columns = EXPORT_SOURCES[model]
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in queryset(user).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield writer.writerow([row[column] for column in columns])
+
+
+def iter_export(user, export_format, model=None):
+    if export_format == 'csv':
+        return iter_csv(user, model or 'tasks')
+    return iter_jsonl(user, [model] if model else None)
+
+
+def export_filename(user, export_format, model=None):
+    suffix = f"-{model}" if model else ''
+    return f"smart-planner-{user.username}{suffix}.{export_format}"
+
+
+def export_root():
+    return settings.EXPORT_ROOT
+
+
+def write_gzip_export(user, export_format, path, model=None):
+    """Streams an export straight into a gzip file, chunk by chunk."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with gzip.open(path, 'wt', encoding='utf-8', newline='') as handle:
+        for piece in iter_export(user, export_format, model):
+            handle.write(piece)
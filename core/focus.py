@@ -0,0 +1,158 @@
+import calendar
+import datetime
+import time
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .conditional import bump_page_version
+from .models import FocusDay, FocusSession
+
+
+MINUTES_PER_DAY = 24 * 60
+HOUR_STARTS = np.arange(24) * 3600
+MINUTE_STARTS = np.arange(MINUTES_PER_DAY) * 60
+
+
+def _from_timestamp(value):
+    return datetime.datetime.fromtimestamp(value, tz=datetime.timezone.utc)
+
+
+def close_session(state):
+    """
+    Appends the stretch a running timer just finished to the ledger.
+    `state` is the timer state from core.timer_state before it was stopped.
+    """
+    if not state['started_at']:
+        return None
+
+    started = state.get('session_started_at') or state['started_at']
+    ended = time.time()
+    if state['seconds'] is not None:
+        # A timer that already hit zero stopped counting at that point.
+        ended = min(ended, state['started_at'] + state['seconds'])
+
+    seconds = int(ended - started)
+    if seconds <= 0:
+        return None
+    return FocusSession.objects.create(
+        user_id=state['user_id'],
+        task_id=state['task_id'],
+        started_at=_from_timestamp(started),
+        ended_at=_from_timestamp(ended),
+        seconds=seconds,
+    )
+
+
+def decode_minutes(bitmap):
+    return np.unpackbits(np.frombuffer(bytes(bitmap), dtype=np.uint8))[:MINUTES_PER_DAY].astype(bool)
+
+
+def decode_hours(blob):
+    return np.frombuffer(bytes(blob), dtype='<i4').astype(np.int64)
+
+
+def _split_by_day(session):
+    """Yields (day, start_second, end_second) for each local day a session touches."""
+    start = timezone.localtime(session.started_at)
+    end = timezone.localtime(session.ended_at)
+    day = start.date()
+    while True:
+        day_start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+        next_day_start = timezone.make_aware(datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time.min))
+        low, high = max(start, day_start), min(end, next_day_start)
+        if high > low:
+            yield day, (low - day_start).total_seconds(), (high - day_start).total_seconds()
+        if end <= next_day_start:
+            return
+        day += datetime.timedelta(days=1)
+
+
+def rollup_pending_sessions(batch_size=1000):
+    """Folds not-yet-rolled-up sessions into FocusDay rows; returns how many."""
+    sessions = list(FocusSession.objects.filter(rolled_up=False).order_by('id')[:batch_size])
+    if not sessions:
+        return 0
+
+    spans = defaultdict(list)
+    for session in sessions:
+        for day, start, end in _split_by_day(session):
+            spans[(session.user_id, day)].append((start, end))
+
+    with transaction.atomic():
+        existing = {
+            (row.user_id, row.day): row
+            for row in FocusDay.objects.select_for_update().filter(
+                user_id__in={user_id for user_id, _ in spans},
+                day__in={day for _, day in spans},
+            )
+        }
+        to_create, to_update = [], []
+        for (user_id, day), pairs in spans.items():
+            bounds = np.array(pairs)
+            starts, ends = bounds[:, :1], bounds[:, 1:]
+
+            # (sessions x 24) overlap of every session with every hour, summed per hour.
+            hour_overlap = np.minimum(ends, HOUR_STARTS + 3600) - np.maximum(starts, HOUR_STARTS)
+            added_hours = np.clip(hour_overlap, 0, None).sum(axis=0)
+            added_minutes = ((MINUTE_STARTS + 60 > starts) & (MINUTE_STARTS < ends)).any(axis=0)
+
+            row = existing.get((user_id, day))
+            if row is None:
+                row = FocusDay(user_id=user_id, day=day)
+                hours, minutes = np.zeros(24, dtype=np.int64), np.zeros(MINUTES_PER_DAY, dtype=bool)
+                to_create.append(row)
+            else:
+                hours, minutes = decode_hours(row.hour_seconds), decode_minutes(row.minute_bitmap)
+                to_update.append(row)
+
+            hours = hours + added_hours.astype(np.int64)
+            row.hour_seconds = hours.astype('<i4').tobytes()
+            row.minute_bitmap = np.packbits(minutes | added_minutes).tobytes()
+            row.total_seconds = int(hours.sum())
+
+        FocusDay.objects.bulk_create(to_create)
+        FocusDay.objects.bulk_update(to_update, ['hour_seconds', 'minute_bitmap', 'total_seconds'])
+        FocusSession.objects.filter(id__in=[session.id for session in sessions]).update(rolled_up=True)
+    # The profile page shows focus_summary(); bulk writes skip the page-version signals.
+    bump_page_version(*{user_id for user_id, _ in spans})
+    return len(sessions)
+
+
+def focus_summary(user, days=28):
+    """Focus analytics for the last `days` days, computed on stacked FocusDay arrays."""
+    since = timezone.localdate() - datetime.timedelta(days=days - 1)
+    rows = list(
+        FocusDay.objects.filter(user=user, day__gte=since)
+        .order_by('day')
+        .values_list('day', 'hour_seconds', 'minute_bitmap')
+    )
+    if not rows:
+        return None
+
+    hours = np.frombuffer(b''.join(bytes(row[1]) for row in rows), dtype='<i4').reshape(len(rows), 24)
+    minutes = np.unpackbits(
+        np.frombuffer(b''.join(bytes(row[2]) for row in rows), dtype=np.uint8).reshape(len(rows), -1),
+        axis=1,
+    )[:, :MINUTES_PER_DAY]
+    weekdays = np.array([row[0].weekday() for row in rows])
+
+    per_day = hours.sum(axis=1)
+    by_hour = hours.sum(axis=0)
+    by_weekday = np.bincount(weekdays, weights=per_day, minlength=7)
+
+    # Longest unbroken run of focused minutes: +1/-1 edges of the padded bitmap.
+    edges = np.diff(np.pad(minutes.astype(np.int8), ((0, 0), (1, 1))), axis=1)
+    run_lengths = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+
+    return {
+        'total_hours': round(float(per_day.sum()) / 3600, 1),
+        'daily_average_minutes': int(per_day.sum() / days // 60),
+        'active_days': int(np.count_nonzero(per_day)),
+        'best_hour': int(by_hour.argmax()),
+        'best_weekday': calendar.day_name[int(by_weekday.argmax())],
+        'longest_block_minutes': int(run_lengths.max()) if run_lengths.size else 0,
+        'hourly_minutes': np.rint(by_hour / 60).astype(int).tolist(),
+    }
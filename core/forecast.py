@@ -0,0 +1,170 @@
+"""
+Productivity forecasts from a user's completion history.
+
+The last FORECAST_DAYS of completed tasks are loaded as NumPy arrays
+(completion time, estimate, focus seconds logged against the task). Every
+figure then comes from a few array operations:
+
+- daily capacity: the median number of minutes finished on active days.
+  Focus time is used where the timer ran, otherwise the estimate.
+- completion probability: the share of each weekday (and of each
+  weekday/hour slot) on which the user finished at least one task.
+- estimate overrun: how far focus time runs past time_estimate_minutes.
+  The median and 80th percentile ratio over timed tasks are kept.
+
+Results are cached per user. The nightly refresh_forecasts job rebuilds
+them for every user, a chunk of users per query, and get_forecast()
+computes on a cache miss. The auto-scheduler uses the capacity and the
+overrun.
+"""
+import calendar
+import datetime
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .conditional import bump_page_version
+from .models import Todo
+
+
+FORECAST_DAYS = 56
+FORECAST_CHUNK_SIZE = 200
+# Refreshed nightly; the extra day covers a late or skipped run.
+FORECAST_TIMEOUT = 60 * 60 * 48
+FORECAST_KEY = 'forecast:{}'
+# Below these, the matching figure is None rather than a guess.
+MIN_ACTIVE_DAYS = 5
+MIN_TIMED_TASKS = 5
+
+EPOCH_WEEKDAY = 3  # 1970-01-01 was a Thursday
+
+
+def _completions(user_ids, since):
+    """(task id, user id, completed at, estimate, focus seconds) rows, ordered by user."""
+    return (
+        Todo.objects.annotate(worker=Coalesce('assignee', 'user'))
+        .filter(worker__in=user_ids, status='COMPLETED', datecompleted__gte=since)
+        .values_list('id', 'worker', 'datecompleted', 'time_estimate_minutes')
+        .annotate(focus=Sum('focus_sessions__seconds'))
+        .order_by('worker')
+    )
+
+
+def _arrays(rows):
+    completed = np.array([row[2].timestamp() for row in rows], dtype=np.float64)
+    estimates = np.array([row[3] or 0 for row in rows], dtype=np.float64)
+    focus_seconds = np.array([row[4] or 0 for row in rows], dtype=np.float64)
+    return completed, estimates, focus_seconds
+
+
+def _weekday(day_offsets, first_day):
+    return (day_offsets + first_day + EPOCH_WEEKDAY) % 7
+
+
+def compute_forecast(completed, estimates, focus_seconds, today, days=FORECAST_DAYS, utc_offset=0):
+    """
+    Forecast from parallel arrays: completion times (epoch seconds),
+    estimates (minutes) and logged focus (seconds). `utc_offset` (seconds)
+    moves completions onto local days. It is the zone's current offset, so a
+    DST change can move a few weeks of history by an hour at most.
+    """
+    first_day = (today - datetime.date(1970, 1, 1)).days - (days - 1)
+    local = completed + utc_offset
+    day = np.floor_divide(local, 86400).astype(np.int64) - first_day
+    keep = (day >= 0) & (day < days)
+    day, local = day[keep], local[keep]
+    estimates, focus_seconds = estimates[keep], focus_seconds[keep]
+    hour = (np.mod(local, 86400) // 3600).astype(np.int64)
+
+    weekday_days = np.bincount(_weekday(np.arange(days), first_day), minlength=7)
+
+    worked = np.where(focus_seconds > 0, focus_seconds / 60, estimates)
+    per_day = np.bincount(day, weights=worked, minlength=days)
+    active = per_day[per_day > 0]
+
+    active_days = np.unique(day)
+    by_weekday = np.bincount(_weekday(active_days, first_day), minlength=7) / weekday_days
+    slots = np.unique(day * 24 + hour)
+    by_slot = (
+        np.bincount(_weekday(slots // 24, first_day) * 24 + slots % 24, minlength=7 * 24).reshape(7, 24)
+        / weekday_days[:, None]
+    )
+    by_hour = np.bincount(slots % 24, minlength=24) / days
+
+    timed = (focus_seconds > 0) & (estimates > 0)
+    ratios = focus_seconds[timed] / 60 / estimates[timed]
+
+    return {
+        'computed_on': today.isoformat(),
+        'completions': int(day.size),
+        'active_days': int(active_days.size),
+        'daily_capacity_minutes': int(np.median(active)) if active.size >= MIN_ACTIVE_DAYS else None,
+        'weekday_probability': np.round(by_weekday, 3).tolist(),
+        'hour_probability': np.round(by_hour, 3).tolist(),
+        'slot_probability': np.round(by_slot, 3).tolist(),
+        'best_weekday': calendar.day_name[int(by_weekday.argmax())] if active_days.size else None,
+        'best_hour': int(by_hour.argmax()) if slots.size else None,
+        'estimate_overrun': round(float(np.median(ratios)), 2) if ratios.size >= MIN_TIMED_TASKS else None,
+        'estimate_overrun_p80': round(float(np.percentile(ratios, 80)), 2) if ratios.size >= MIN_TIMED_TASKS else None,
+    }
+
+
+def _window():
+    today = timezone.localdate()
+    since = timezone.make_aware(
+        datetime.datetime.combine(today - datetime.timedelta(days=FORECAST_DAYS - 1), datetime.time.min)
+    )
+    return today, since, int(timezone.localtime().utcoffset().total_seconds())
+
+
+def forecasts_for(user_ids):
+    """{user id: forecast} for a chunk of users, from one query."""
+    today, since, utc_offset = _window()
+    rows = list(_completions(user_ids, since))
+    completed, estimates, focus_seconds = _arrays(rows)
+    workers = np.array([row[1] for row in rows], dtype=np.int64)
+    # Rows are ordered by user, so each user's history is one contiguous slice.
+    users, starts = np.unique(workers, return_index=True)
+    bounds = dict(zip(users.tolist(), zip(starts.tolist(), [*starts[1:].tolist(), len(rows)])))
+
+    forecasts = {}
+    for user_id in user_ids:
+        start, end = bounds.get(user_id, (0, 0))
+        forecasts[user_id] = compute_forecast(
+            completed[start:end], estimates[start:end], focus_seconds[start:end], today, utc_offset=utc_offset,
+        )
+    return forecasts
+
+
+def get_forecast(user):
+    key = FORECAST_KEY.format(user.id)
+    forecast = cache.get(key)
+    if forecast is None:
+        forecast = forecasts_for([user.id])[user.id]
+        cache.set(key, forecast, FORECAST_TIMEOUT)
+    return forecast
+
+
+def refresh_all(chunk_size=FORECAST_CHUNK_SIZE):
+    """Recomputes and caches every active user's forecast; returns how many."""
+    refreshed, last_id = 0, 0
+    while True:
+        user_ids = list(
+            User.objects.filter(id__gt=last_id, is_active=True).order_by('id').values_list('id', flat=True)[:chunk_size]
+        )
+        if not user_ids:
+            return refreshed
+        forecasts = forecasts_for(user_ids)
+        previous = cache.get_many([FORECAST_KEY.format(user_id) for user_id in user_ids])
+        cache.set_many({FORECAST_KEY.format(user_id): forecast for user_id, forecast in forecasts.items()}, FORECAST_TIMEOUT)
+        # Profile pages showing an outdated forecast must stop answering 304.
+        bump_page_version(*(
+            user_id for user_id, forecast in forecasts.items()
+            if previous.get(FORECAST_KEY.format(user_id)) != forecast
+        ))
+        refreshed += len(user_ids)
+        last_id = user_ids[-1]
@@ -0,0 +1,315 @@
+"""
+Streaming bulk import of tasks from CSV, JSON Lines or ICS.
+
+Rows are parsed one at a time from the uploaded file, validated, and
+written with bulk_create in batches (one transaction per batch), so a
+100k-row file never sits in memory. Each batch also gets its recurrence
+rules, subtasks and reminder rows in bulk, because bulk_create skips
+post_save. Invalid rows are skipped and reported with their line number.
+"""
+import csv
+import datetime
+import io
+import json
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Profile, RecurrenceRule, ScheduledReminder, SubTask, Todo
+from .recurrence import RECURRENCE_PRESETS, parse_rrule
+from .subtasks import build_subtasks, parse_sub_tasks, search_text
+
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_FORMATS = ('csv', 'jsonl', 'ics')
+# Only this many error messages are kept; the rest are just counted.
+MAX_REPORTED_ERRORS = 100
+
+# What AI enrichment may fill in, and only where the file left it blank.
+ENRICHABLE_FIELDS = ('category', 'difficulty', 'time_estimate_minutes')
+
+PRIORITY_NAMES = {'high': 3, 'medium': 2, 'low': 1}
+DIFFICULTIES = {choice for choice, _ in Todo.DIFFICULTY_CHOICES}
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+def detect_format(filename, explicit=''):
+    if explicit in IMPORT_FORMATS:
+        return explicit
+    name = (filename or '').lower()
+    if name.endswith('.ics'):
+        return 'ics'
+    if name.endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    return 'csv'
+
+
+def iter_csv_rows(stream):
+    reader = csv.DictReader(stream)
+    try:
+        for row in reader:
+            yield reader.line_num, row
+    except csv.Error as e:
+        # NUL bytes, a runaway quote...: the rows read so far are still imported.
+        yield reader.line_num, ValueError(f"unreadable CSV ({e}); the rest of the file was skipped")
+
+
+def iter_jsonl_rows(stream):
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, ValueError(f"invalid JSON ({e.msg})")
+            continue
+        if not isinstance(row, dict):
+            yield line_number, ValueError("expected a JSON object")
+            continue
+        # Full-account exports also carry plans/badges; only tasks are imported.
+        if row.get('type', 'task') == 'task':
+            yield line_number, row
+
+
+def _ics_unescape(value):
+    return (
+        value.replace('\\n', '\n').replace('\\N', '\n').replace('\\,', ',')
+        .replace('\\;', ';').replace('\\\\', '\\')
+    )
+
+
+def _ics_date(value):
+    return f"{value[:4]}-{value[4:6]}-{value[6:8]}" if len(value) >= 8 else value
+
+
+def _unfolded_lines(stream):
+    """Joins RFC 5545 continuation lines, keeping the line number where each property starts."""
+    current, start = None, 0
+    for line_number, line in enumerate(stream, start=1):
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield start, current
+        current, start = line, line_number
+    if current is not None:
+        yield start, current
+
+
+def iter_ics_rows(stream):
+    """One row per VEVENT/VTODO, mapped onto the CSV/JSON column names."""
+    row, start = None, 0
+    for line_number, line in _unfolded_lines(stream):
+        name_part, _, value = line.partition(':')
+        name = name_part.split(';', 1)[0].upper()
+        if name == 'BEGIN' and value.upper() in ('VEVENT', 'VTODO'):
+            row, start = {}, line_number
+        elif name == 'END' and value.upper() in ('VEVENT', 'VTODO') and row is not None:
+            yield start, row
+            row = None
+        elif row is None:
+            continue
+        elif name == 'SUMMARY':
+            row['title'] = _ics_unescape(value)
+        elif name == 'DESCRIPTION':
+            row['memo'] = _ics_unescape(value)
+        elif name == 'DTSTART':
+            row['scheduled_date'] = _ics_date(value)
+        elif name == 'DUE':
+            row['deadline'] = _ics_date(value)
+        elif name == 'RRULE':
+            row['rrule'] = value
+        elif name == 'PRIORITY' and value.isdigit() and int(value):
+            row['priority'] = 3 if int(value) <= 4 else 2 if int(value) == 5 else 1
+        elif name == 'STATUS' and value.upper() == 'COMPLETED':
+            row['status'] = 'COMPLETED'
+
+
+ROW_PARSERS = {
+    'csv': iter_csv_rows,
+    'jsonl': iter_jsonl_rows,
+    'ics': iter_ics_rows,
+}
+
+
+def _text(row, key):
+    value = row.get(key)
+    return '' if value is None else str(value).strip()
+
+
+def _date(row, key):
+    value = _text(row, key)
+    if not value:
+        return None
+    try:
+        return datetime.date.fromisoformat(value[:10])
+    except ValueError:
+        raise ValueError(f"{key} must be a YYYY-MM-DD date, got {value!r}")
+
+
+def validate_row(row):
+    """
+    Returns (Todo field values, RecurrenceRule field values or None) for
+    one row, or raises ValueError describing what is wrong with it.
+    """
+    title = _text(row, 'title')
+    if not title:
+        raise ValueError("title is required")
+    if len(title) > 200:
+        raise ValueError("title is longer than 200 characters")
+
+    status = _text(row, 'status').upper() or 'INBOX'
+    if status == 'ACTIVE':
+        status = 'INBOX'  # Imported work lands in the inbox; the mood picker activates it.
+    if status not in ('INBOX', 'COMPLETED'):
+        raise ValueError(f"unsupported status {status!r}")
+
+    priority = _text(row, 'priority').lower() or '2'
+    priority = PRIORITY_NAMES.get(priority, priority)
+    try:
+        priority = int(priority)
+    except ValueError:
+        raise ValueError(f"priority must be 1-3 or high/medium/low, got {row.get('priority')!r}")
+    if priority not in (1, 2, 3):
+        raise ValueError(f"priority must be 1-3, got {priority}")
+
+    difficulty = _text(row, 'difficulty').capitalize() or 'Moderate'
+    if difficulty not in DIFFICULTIES:
+        raise ValueError(f"difficulty must be Easy, Moderate or Hard, got {row.get('difficulty')!r}")
+
+    estimate = _text(row, 'time_estimate_minutes')
+    if estimate:
+        try:
+            estimate = int(float(estimate))
+        except (ValueError, OverflowError):
+            raise ValueError(f"time_estimate_minutes must be a number, got {estimate!r}")
+        if not 0 < estimate <= 24 * 60:
+            raise ValueError("time_estimate_minutes must be between 1 and 1440")
+
+    fields = {
+        'title': title,
+        'status': status,
+        'priority': priority,
+        'difficulty': difficulty,
+        'category': _text(row, 'category')[:50] or 'Other',
+        'time_estimate_minutes': estimate or 25,
+        'memo': _text(row, 'memo'),
+        'sub_tasks': search_text(parse_sub_tasks(row.get('sub_tasks'))),
+        'scheduled_date': _date(row, 'scheduled_date'),
+        'deadline': _date(row, 'deadline'),
+        'important': _text(row, 'important').lower() in ('1', 'true', 'yes'),
+    }
+
+    rule = None
+    rrule = _text(row, 'rrule')
+    recurring_type = _text(row, 'recurring_type').upper()
+    dtstart = fields['scheduled_date'] or timezone.localdate()
+    if rrule:
+        rule = {**parse_rrule(rrule), 'dtstart': dtstart}
+        recurring_type = rule['freq'] if rule['freq'] in RECURRENCE_PRESETS else ''
+    elif recurring_type:
+        if recurring_type not in RECURRENCE_PRESETS:
+            raise ValueError(f"unsupported recurring_type {recurring_type!r}")
+        rule = {**RECURRENCE_PRESETS[recurring_type](dtstart), 'dtstart': dtstart}
+    if rule:
+        fields['is_recurring'] = True
+        fields['recurring_type'] = recurring_type
+    return fields, rule
+
+
+def _reminders_for(tasks, reminder_time):
+    """Reminder rows for freshly inserted tasks (bulk_create skips the post_save sync)."""
+    today = timezone.localdate()
+    reminders = []
+    for task in tasks:
+        if task.status != 'INBOX':
+            continue
+        for kind, day in (('SCHEDULED', task.scheduled_date), ('DEADLINE', task.deadline)):
+            if day is None or day < today or (kind == 'DEADLINE' and day == task.scheduled_date):
+                continue
+            reminders.append(ScheduledReminder(
+                user_id=task.user_id, task_id=task.id, kind=kind,
+                due_at=ScheduledReminder.due_at_for(day, reminder_time),
+            ))
+    return reminders
+
+
+def _write_batch(batch, reminder_time):
+    tasks = [task for task, _ in batch]
+    with transaction.atomic():
+        Todo.objects.bulk_create(tasks)
+        RecurrenceRule.objects.bulk_create([
+            RecurrenceRule(task=task, **rule) for task, rule in batch if rule
+        ])
+        SubTask.objects.bulk_create([
+            subtask for task in tasks if task.sub_tasks
+            for subtask in build_subtasks(task, task.sub_tasks.splitlines())
+        ])
+        ScheduledReminder.objects.bulk_create(_reminders_for(tasks, reminder_time))
+    return tasks
+
+
+def import_tasks(user, stream, import_format, batch_size=IMPORT_BATCH_SIZE, on_batch=None):
+    """
+    Imports tasks for `user` from a text stream. `on_batch(tasks)` is called
+    after each committed batch (used to queue AI enrichment).
+    """
+    result = ImportResult()
+    reminder_time = (
+        Profile.objects.filter(user=user).values_list('reminder_time', flat=True).first()
+        or datetime.time(9, 0)
+    )
+    now = timezone.now()
+    batch = []
+
+    for line_number, row in ROW_PARSERS[import_format](stream):
+        if isinstance(row, Exception):
+            result.add_error(line_number, str(row))
+            continue
+        try:
+            fields, rule = validate_row(row)
+        except ValueError as e:
+            result.add_error(line_number, str(e))
+            continue
+        if fields['status'] == 'COMPLETED':
+            fields['datecompleted'] = now
+        task = Todo(user=user, **fields)
+        task.blank_fields = [field for field in ENRICHABLE_FIELDS if not _text(row, field)]
+        batch.append((task, rule))
+
+        if len(batch) >= batch_size:
+            tasks = _write_batch(batch, reminder_time)
+            result.created += len(tasks)
+            if on_batch:
+                on_batch(tasks)
+            batch = []
+
+    if batch:
+        tasks = _write_batch(batch, reminder_time)
+        result.created += len(tasks)
+        if on_batch:
+            on_batch(tasks)
+    return result
+
+
+def enrichment_targets(tasks):
+    """[[task id, [fields the file left blank]], ...] for enrich_imported_tasks."""
+    return [[task.id, task.blank_fields] for task in tasks if task.blank_fields]
+
+
+def open_upload(uploaded_file):
+    """Text stream over an upload without reading it into memory (BOM-tolerant)."""
+    return io.TextIOWrapper(uploaded_file.file, encoding='utf-8-sig', newline='')
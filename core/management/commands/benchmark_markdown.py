@@ -0,0 +1,61 @@
+import random
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from core import rendering
+
+
+WORDS = (
+    "revise chapter practice problems notes summary flashcards lecture formulas derivations "
+    "past paper mock test diagrams definitions examples review weak topics timed quiz"
+).split()
+
+
+def build_plan(days, tasks_per_day, rng):
+    blocks = []
+    for day in range(1, days + 1):
+        lines = [f"## Day {day}: {' '.join(rng.choices(WORDS, k=3)).title()}"]
+        for _ in range(tasks_per_day):
+            lines.append(f"- **{rng.choice(WORDS).title()}** {' '.join(rng.choices(WORDS, k=8))} *{rng.choice(WORDS)}*")
+        blocks.append('\n'.join(lines))
+    return '\n\n'.join(blocks)
+
+
+class Command(BaseCommand):
+    help = "Times plan/markdown rendering cold, from the shared cache and from the in-process LRU."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90)
+        parser.add_argument('--tasks-per-day', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def _time(self, label, func, repeat, before=None):
+        timings = []
+        for _ in range(repeat):
+            if before:
+                before()
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        self.stdout.write(f"{label:34} median {timings[len(timings) // 2]:9.3f} ms  best {timings[0]:9.3f} ms")
+
+    def handle(self, *args, **options):
+        text = build_plan(options['days'], options['tasks_per_day'], random.Random(42))
+        repeat = options['repeat']
+        self.stdout.write(f"Plan: {options['days']} days, {len(text):,} characters")
+
+        def cold():
+            # Only this plan's keys; the cache may be a shared Redis.
+            rendering.clear_local_cache()
+            cache.delete_many([rendering.cache_key(kind, text) for kind in ('plan', 'markdown')])
+
+        for kind, func in (('plan structure', rendering.plan_structure), ('markdown', rendering.render_markdown)):
+            self._time(f"{kind}: cold render", lambda: func(text), repeat, before=cold)
+            func(text)
+            self._time(f"{kind}: shared cache hit", lambda: func(text), repeat, before=rendering.clear_local_cache)
+            func(text)
+            self._time(f"{kind}: in-process LRU hit", lambda: func(text), repeat)
+        cold()
@@ -0,0 +1,78 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core import retention
+from core.models import Todo
+from core.search import search
+
+
+WORDS = (
+    "read write revise physics chemistry biology maths essay report invoice email call meeting "
+    "gym run groceries laundry project deadline review draft slides budget exam notes chapter "
+    "practice lecture assignment presentation research interview design refactor deploy"
+).split()
+QUERIES = ['physics', 'essay draft', 'rev', 'budget review meeting', 'nonexistentword']
+BENCHMARK_USERNAME = 'search-benchmark'
+
+
+class Command(BaseCommand):
+    help = "Fills a throwaway user with N tasks (1M by default) and times full-text searches against them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=1_000_000)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--keep', action='store_true', help="Keep the benchmark user and tasks afterwards.")
+
+    def handle(self, *args, **options):
+        # A last_login keeps the pending_signups retention policy from deleting
+        # a --keep user, and its million tasks, through the cascade collector.
+        user, _ = User.objects.get_or_create(
+            username=BENCHMARK_USERNAME, defaults={'is_active': False, 'last_login': timezone.now()},
+        )
+        existing = Todo.objects.filter(user=user).count()
+        rng = random.Random(42)
+
+        started = time.perf_counter()
+        remaining = options['tasks'] - existing
+        while remaining > 0:
+            size = min(options['batch_size'], remaining)
+            with transaction.atomic():
+                Todo.objects.bulk_create([
+                    Todo(
+                        user=user,
+                        title=' '.join(rng.choices(WORDS, k=4)),
+                        memo=' '.join(rng.choices(WORDS, k=12)),
+                        sub_tasks='\n'.join(' '.join(rng.choices(WORDS, k=3)) for _ in range(3)),
+                    )
+                    for _ in range(size)
+                ])
+            remaining -= size
+        if existing < options['tasks']:
+            self.stdout.write(
+                f"Inserted {options['tasks'] - existing} tasks in {time.perf_counter() - started:.1f}s "
+                f"({connection.vendor})"
+            )
+
+        try:
+            for query in QUERIES:
+                timings = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    results, has_next = search(user, query, page=1)
+                    timings.append((time.perf_counter() - start) * 1000)
+                timings.sort()
+                self.stdout.write(
+                    f"{query!r:28} median {timings[len(timings) // 2]:8.1f} ms  "
+                    f"best {timings[0]:8.1f} ms  results {len(results)}{'+' if has_next else ''}"
+                )
+        finally:
+            if not options['keep']:
+                # Raw batched deletes; user.delete() would load and signal every task.
+                retention.delete_tasks(Todo.objects.filter(user=user))
+                user.delete()
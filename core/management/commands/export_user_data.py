@@ -0,0 +1,34 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.export import EXPORT_FORMATS, EXPORT_SOURCES, iter_export, write_gzip_export
+
+
+class Command(BaseCommand):
+    help = "Streams one user's data as JSON Lines or CSV to stdout, a file, or a gzip file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='jsonl')
+        parser.add_argument('--model', choices=list(EXPORT_SOURCES), help="Only export one kind of record (CSV defaults to tasks).")
+        parser.add_argument('--output', help="File to write; '.gz' paths are gzip-compressed. Defaults to stdout.")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f"No user named {options['username']!r}")
+
+        export_format = options['format']
+        model = options['model'] or ('tasks' if export_format == 'csv' else None)
+        output = options['output']
+
+        if output and output.endswith('.gz'):
+            write_gzip_export(user, export_format, output, model)
+        elif output:
+            with open(output, 'w', encoding='utf-8', newline='') as handle:
+                handle.writelines(iter_export(user, export_format, model))
+        else:
+            for piece in iter_export(user, export_format, model):
+                self.stdout.write(piece, ending='')
+            return
+        self.stderr.write(f"Wrote {export_format} export for {user.username} to {output}")
@@ -0,0 +1,40 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importer import IMPORT_BATCH_SIZE, IMPORT_FORMATS, detect_format, enrichment_targets, import_tasks
+from core.tasks import enrich_imported_tasks
+
+
+class Command(BaseCommand):
+    help = "Streams tasks from a CSV, JSON Lines or ICS file into a user's inbox in batched inserts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument('--enrich', action='store_true', help="Queue batched AI enrichment for the category, difficulty and estimate left blank.")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f"No user named {options['username']!r}")
+
+        def queue_enrichment(tasks):
+            targets = enrichment_targets(tasks)
+            if targets:
+                enrich_imported_tasks(targets)
+
+        import_format = detect_format(options['path'], options['format'] or '')
+        with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+            result = import_tasks(
+                user, stream, import_format,
+                batch_size=options['batch_size'],
+                on_batch=queue_enrichment if options['enrich'] else None,
+            )
+
+        for line, error in result.errors:
+            self.stderr.write(f"line {line}: {error}")
+        if result.error_count > len(result.errors):
+            self.stderr.write(f"... {result.error_count - len(result.errors)} more errors not shown")
+        self.stdout.write(f"Imported {result.created} task(s), skipped {result.error_count} row(s).")
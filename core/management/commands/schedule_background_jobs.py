@@ -0,0 +1,43 @@
+import datetime
+
+from background_task.models import Task
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.tasks import (
+    daily_reminder_job, deliver_outbox_emails, flush_timer_state, purge_expired_rows, refresh_forecasts, rollup_focus_sessions,
+)
+
+
+# (job, repeat interval in seconds)
+REPEATING_JOBS = [
+    (deliver_outbox_emails, 10),
+    (flush_timer_state, 30),
+    (rollup_focus_sessions, 300),
+    (daily_reminder_job, 60),
+]
+
+# (job, local time of day it runs at)
+NIGHTLY_JOBS = [
+    (refresh_forecasts, datetime.time(3, 0)),
+    (purge_expired_rows, datetime.time(4, 0)),
+]
+
+
+def _next_run(at):
+    now = timezone.localtime()
+    run = timezone.make_aware(datetime.datetime.combine(now.date(), at))
+    return run if run > now else run + datetime.timedelta(days=1)
+
+
+class Command(BaseCommand):
+    help = "Registers the repeating background jobs. Safe to run on every deploy."
+
+    def handle(self, *args, **options):
+        for job, repeat in REPEATING_JOBS:
+            # remove_existing_tasks keeps a single queued copy of each job.
+            job(repeat=repeat, remove_existing_tasks=True)
+            self.stdout.write(f"Scheduled {job.name} every {repeat}s")
+        for job, at in NIGHTLY_JOBS:
+            job(schedule=_next_run(at), repeat=Task.DAILY, remove_existing_tasks=True)
+            self.stdout.write(f"Scheduled {job.name} daily at {at:%H:%M}")
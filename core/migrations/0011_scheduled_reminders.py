@@ -0,0 +1,68 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:46
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_reminders(apps, schema_editor):
+    Todo = apps.get_model('core', 'Todo')
+    Profile = apps.get_model('core', 'Profile')
+    ScheduledReminder = apps.get_model('core', 'ScheduledReminder')
+
+    today = timezone.localdate()
+    reminder_times = dict(Profile.objects.values_list('user_id', 'reminder_time'))
+    open_tasks = Todo.objects.filter(status__in=['INBOX', 'ACTIVE']).filter(
+        models.Q(scheduled_date__gte=today) | models.Q(deadline__gte=today)
+    )
+
+    batch = []
+    for task in open_tasks.iterator(chunk_size=1000):
+        recipient_id = task.assignee_id or task.user_id
+        reminder_time = reminder_times.get(recipient_id, datetime.time(9, 0))
+        for kind, day in (('SCHEDULED', task.scheduled_date), ('DEADLINE', task.deadline)):
+            if day is None or day < today or (kind == 'DEADLINE' and day == task.scheduled_date):
+                continue
+            batch.append(ScheduledReminder(
+                user_id=recipient_id,
+                task_id=task.id,
+                kind=kind,
+                due_at=timezone.make_aware(datetime.datetime.combine(day, reminder_time)),
+            ))
+        if len(batch) >= 1000:
+            ScheduledReminder.objects.bulk_create(batch)
+            batch = []
+    ScheduledReminder.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_todo_is_recurring_todo_last_completed_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='reminder_time',
+            field=models.TimeField(default=datetime.time(9, 0)),
+        ),
+        migrations.CreateModel(
+            name='ScheduledReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('SCHEDULED', 'Scheduled date'), ('DEADLINE', 'Deadline')], max_length=10)),
+                ('due_at', models.DateTimeField()),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='core.todo')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scheduled_reminders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['due_at'], name='reminder_due_at_idx')],
+                'constraints': [models.UniqueConstraint(fields=('task', 'kind'), name='unique_reminder_per_task_kind')],
+            },
+        ),
+        migrations.RunPython(backfill_reminders, migrations.RunPython.noop),
+    ]
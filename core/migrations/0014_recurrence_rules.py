@@ -0,0 +1,75 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+WEEKDAY_CODES = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+
+
+def backfill_rules(apps, schema_editor):
+    """Gives every existing DAILY/WEEKLY task the equivalent RecurrenceRule."""
+    Todo = apps.get_model('core', 'Todo')
+    RecurrenceRule = apps.get_model('core', 'RecurrenceRule')
+
+    batch = []
+    recurring = Todo.objects.filter(is_recurring=True, recurring_type__in=['DAILY', 'WEEKLY'])
+    for task in recurring.iterator(chunk_size=1000):
+        dtstart = task.scheduled_date or timezone.localtime(task.created).date()
+        batch.append(RecurrenceRule(
+            task_id=task.id,
+            freq=task.recurring_type,
+            weekdays=WEEKDAY_CODES[dtstart.weekday()] if task.recurring_type == 'WEEKLY' else '',
+            dtstart=dtstart,
+        ))
+        if len(batch) >= 1000:
+            RecurrenceRule.objects.bulk_create(batch)
+            batch = []
+    RecurrenceRule.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_focus_sessions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='todo',
+            name='recurring_type',
+            field=models.CharField(blank=True, choices=[('', 'Not Recurring'), ('DAILY', 'Repeat Daily'), ('WEEKLY', 'Repeat Weekly'), ('WEEKDAYS', 'Repeat on Weekdays'), ('MONTHLY', 'Repeat Monthly')], default='', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='OccurrenceOverride',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('COMPLETED', 'Completed'), ('SKIPPED', 'Skipped')], max_length=10)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrence_overrides', to='core.todo')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('task', 'date'), name='unique_occurrence_override')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RecurrenceRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('freq', models.CharField(choices=[('DAILY', 'Daily'), ('WEEKLY', 'Weekly'), ('MONTHLY', 'Monthly'), ('YEARLY', 'Yearly')], max_length=10)),
+                ('interval', models.PositiveSmallIntegerField(default=1)),
+                ('weekdays', models.CharField(blank=True, default='', max_length=20)),
+                ('month_day', models.SmallIntegerField(blank=True, null=True)),
+                ('dtstart', models.DateField()),
+                ('until', models.DateField(blank=True, null=True)),
+                ('count', models.PositiveIntegerField(blank=True, null=True)),
+                ('task', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='recurrence', to='core.todo')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dtstart', 'until'], name='recurrence_window_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_rules, migrations.RunPython.noop),
+    ]
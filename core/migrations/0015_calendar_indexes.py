@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_recurrence_rules'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='calendar_token',
+            field=models.CharField(blank=True, max_length=43, null=True, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['user', 'scheduled_date'], name='todo_user_scheduled_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['user', 'deadline'], name='todo_user_deadline_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_data_exports'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todo',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from core.subtasks import build_subtasks, parse_sub_tasks, search_text
+
+
+def split_sub_tasks(apps, schema_editor):
+    """
+    Turns every stored sub_tasks value (list repr, JSON or plain lines) into
+    SubTask rows and rewrites the column as the plain-text search copy.
+    """
+    Todo = apps.get_model('core', 'Todo')
+    SubTask = apps.get_model('core', 'SubTask')
+
+    rows, tasks = [], []
+    for task in Todo.objects.exclude(sub_tasks__isnull=True).exclude(sub_tasks='').only('id', 'sub_tasks').iterator(chunk_size=1000):
+        steps = parse_sub_tasks(task.sub_tasks)
+        rows += build_subtasks(task, steps, model=SubTask)
+        task.sub_tasks = search_text(steps)
+        tasks.append(task)
+        if len(tasks) >= 1000:
+            SubTask.objects.bulk_create(rows)
+            Todo.objects.bulk_update(tasks, ['sub_tasks'])
+            rows, tasks = [], []
+    SubTask.objects.bulk_create(rows)
+    Todo.objects.bulk_update(tasks, ['sub_tasks'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_sync_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField()),
+                ('text', models.TextField()),
+                ('html', models.TextField()),
+                ('is_done', models.BooleanField(default=False)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subtasks', to='core.todo')),
+            ],
+            options={
+                'ordering': ['position'],
+                'constraints': [models.UniqueConstraint(fields=('task', 'position'), name='unique_subtask_position')],
+            },
+        ),
+        migrations.RunPython(split_sub_tasks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:28
+
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+def demote_extra_active(apps, schema_editor):
+    """Keeps each person's most recently touched ACTIVE task; the rest go back to INBOX."""
+    Todo = apps.get_model('core', 'Todo')
+    seen, extra = set(), []
+    for task in Todo.objects.filter(status='ACTIVE').order_by('-last_updated', '-id').only('id', 'user_id', 'assignee_id'):
+        owner = task.assignee_id or task.user_id
+        if owner in seen:
+            extra.append(task.id)
+        seen.add(owner)
+    Todo.objects.filter(id__in=extra).update(status='INBOX')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_subtasks'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(demote_extra_active, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('status', 'INBOX')), fields=['user', 'priority'], name='todo_inbox_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('status', 'INBOX')), fields=['assignee', 'priority'], name='todo_inbox_assignee_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='todo',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Coalesce('assignee', 'user'), condition=models.Q(('status', 'ACTIVE')), name='one_active_task_per_user'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_one_active_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studyplan',
+            name='generation_status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('READY', 'Ready'), ('FAILED', 'Failed')], default='READY', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='StudyPlanChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_day', models.PositiveSmallIntegerField()),
+                ('end_day', models.PositiveSmallIntegerField()),
+                ('text', models.TextField(blank=True, default='')),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('plan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='core.studyplan')),
+            ],
+            options={
+                'ordering': ['start_day'],
+                'constraints': [models.UniqueConstraint(fields=('plan', 'start_day'), name='unique_plan_chunk_start')],
+            },
+        ),
+    ]
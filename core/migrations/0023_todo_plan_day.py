@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_plan_generation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todo',
+            name='plan_day',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
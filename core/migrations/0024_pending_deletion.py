@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_todo_plan_day'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='history_cleared_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='studyplan',
+            name='pending_deletion',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='pending_deletion',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,11 +1,14 @@
 # core/models.py
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.db.models.signals import post_save
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from datetime import timedelta
 import datetime
+import secrets
 
 
 
@@ -14,12 +17,21 @@ class Team(models.Model):
     name = models.CharField(max_length=100)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="owned_teams")
     members = models.ManyToManyField(User, related_name="teams")
+    # Set when the owner deletes the team; the delete_team_rows job removes it in batches.
+    pending_deletion = models.BooleanField(default=False)
 
     def __str__(self):
         return self.name
 
 
 class StudyPlan(models.Model):
+    GENERATION_STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('READY', 'Ready'),
+        ('FAILED', 'Failed'),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='study_plans')
     subject = models.CharField(max_length=200)
     goal = models.TextField()
@@ -32,6 +44,16 @@ class StudyPlan(models.Model):
     start_date = models.DateField(default=timezone.now)
     end_date = models.DateField(null=True, blank=True)
     is_active = models.BooleanField(default=False)
+    last_updated = models.DateTimeField(auto_now=True)
+    # generated_plan is filled in by the background job once every chunk is written.
+    generation_status = models.CharField(max_length=10, choices=GENERATION_STATUS_CHOICES, default='READY')
+    # Hidden from the user and deleted in batches by the delete_study_plans job.
+    pending_deletion = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'last_updated'], name='plan_user_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.subject} Plan for {self.user.username}"
@@ -40,7 +62,9 @@ class StudyPlan(models.Model):
         if not self.end_date:
             self.end_date = self.start_date + timedelta(days=self.duration_days - 1)
         if self.is_active:
-            StudyPlan.objects.filter(user=self.user, is_active=True).exclude(id=self.id).update(is_active=False)
+            StudyPlan.objects.filter(user=self.user, is_active=True).exclude(id=self.id).update(
+                is_active=False, last_updated=timezone.now(),
+            )
         super().save(*args, **kwargs)
 
 
@@ -68,6 +92,8 @@ class Todo(models.Model):
         ('', 'Not Recurring'),
         ('DAILY', 'Repeat Daily'),
         ('WEEKLY', 'Repeat Weekly'),
+        ('WEEKDAYS', 'Repeat on Weekdays'),
+        ('MONTHLY', 'Repeat Monthly'),
     ]
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_tasks')
@@ -82,7 +108,6 @@ class Todo(models.Model):
     category = models.CharField(max_length=50, default='Other')
     difficulty = models.CharField(max_length=10, choices=DIFFICULTY_CHOICES, default='Moderate')
     time_estimate_minutes = models.IntegerField(default=25, null=True, blank=True)
-    sub_tasks = models.JSONField(null=True, blank=True)
     datecompleted = models.DateTimeField(null=True, blank=True)
     memo = models.TextField(default='', blank=True)
     important = models.BooleanField(default=False)
@@ -95,18 +120,69 @@ class Todo(models.Model):
 
  
     study_plan = models.ForeignKey('StudyPlan', on_delete=models.SET_NULL, null=True, blank=True, related_name='tasks')
+    # Which day of the study plan the task came from; scheduling skips days already added.
+    plan_day = models.PositiveSmallIntegerField(null=True, blank=True)
     scheduled_date = models.DateField(null=True, blank=True)
 
+    # Plain-text copy of the SubTask rows, one step per line, for search and exports.
     sub_tasks = models.TextField(null=True, blank=True)
 
     priority = models.IntegerField(choices=PRIORITY_CHOICES, default=2)
     is_recurring = models.BooleanField(default=False)
     recurring_type = models.CharField(max_length=10, choices=RECURRING_CHOICES, blank=True, default='')
     last_completed = models.DateField(null=True, blank=True)
+    # Bumped on every user-visible edit; the kanban move endpoint only
+    # applies a change when the client's copy is still current.
+    version = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'scheduled_date'], name='todo_user_scheduled_idx'),
+            models.Index(fields=['user', 'deadline'], name='todo_user_deadline_idx'),
+            # "Changes since" sync reads both sides of Q(user) | Q(assignee) by last_updated.
+            models.Index(fields=['user', 'last_updated'], name='todo_user_updated_idx'),
+            models.Index(fields=['assignee', 'last_updated'], name='todo_assignee_updated_idx'),
+            # The mood picker ranks only open tasks; history stays out of these.
+            models.Index(fields=['user', 'priority'], name='todo_inbox_user_idx', condition=models.Q(status='INBOX')),
+            models.Index(fields=['assignee', 'priority'], name='todo_inbox_assignee_idx', condition=models.Q(status='INBOX')),
+        ]
+        constraints = [
+            # One ACTIVE task per person; on team tasks that's the assignee (see suggest.py).
+            models.UniqueConstraint(
+                Coalesce('assignee', 'user'), name='one_active_task_per_user', condition=models.Q(status='ACTIVE'),
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What the reminder queue was last synced from; see sync_task_reminders.
+        if REMINDER_ATTNAMES.issubset(field_names):
+            instance._reminder_state = instance.reminder_state()
+        return instance
+
+    def reminder_state(self):
+        """The values ScheduledReminder.sync_for_task() depends on."""
+        return (
+            self.status in ('INBOX', 'ACTIVE'), _as_date(self.scheduled_date), _as_date(self.deadline), self.assignee_id,
+        )
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        # Timer bookkeeping isn't an edit to the card, so it keeps the version.
+        if update_fields is None or not TIMER_FIELDS.issuperset(update_fields):
+            self.version = (self.version or 0) + 1
+            if update_fields is not None:
+                # auto_now only reaches the row when last_updated is listed too.
+                kwargs['update_fields'] = {*update_fields, 'version', 'last_updated'}
+        super().save(*args, **kwargs)
+
+
+TIMER_FIELDS = {'timer_start_time', 'timer_seconds_remaining'}
+REMINDER_ATTNAMES = {'status', 'scheduled_date', 'deadline', 'assignee_id'}
 
 
 class Profile(models.Model):
@@ -127,6 +203,24 @@ class Profile(models.Model):
     night_owl_streak = models.IntegerField(default=0)
 
     last_reminder_sent_date = models.DateField(null=True, blank=True)
+    reminder_time = models.TimeField(default=datetime.time(9, 0))
+    # Secret for the ICS subscription URL; calendar apps can't log in.
+    calendar_token = models.CharField(max_length=43, unique=True, null=True, blank=True)
+    # Completed tasks up to here are hidden from history and deleted by the delete_task_history job.
+    history_cleared_at = models.DateTimeField(null=True, blank=True)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'last_updated'}
+        super().save(*args, **kwargs)
+
+    def get_calendar_token(self):
+        if not self.calendar_token:
+            self.calendar_token = secrets.token_urlsafe(32)
+            self.save(update_fields=['calendar_token'])
+        return self.calendar_token
 
     def get_title(self):
         titles = [
@@ -175,7 +269,410 @@ class OTPVerification(models.Model):
     otp = models.CharField(max_length=6)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    VALID_FOR = datetime.timedelta(minutes=5)
+
     def is_valid(self):
-        # OTP is valid for 5 minutes
-        expiration_time = self.created_at + datetime.timedelta(minutes=5)
-        return timezone.now() < expiration_time
+        return timezone.now() < self.created_at + self.VALID_FOR
+
+
+
+def _as_date(value):
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value) if value else None
+    return value
+
+
+class ScheduledReminder(models.Model):
+    """
+    Queue of pending reminder emails, one row per (task, kind).
+    Rows are kept in sync from Todo saves so the reminder worker only has to
+    read the entries that are due instead of scanning every profile.
+    """
+    KIND_CHOICES = [
+        ('SCHEDULED', 'Scheduled date'),
+        ('DEADLINE', 'Deadline'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='scheduled_reminders')
+    task = models.ForeignKey(Todo, on_delete=models.CASCADE, related_name='reminders')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    due_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['task', 'kind'], name='unique_reminder_per_task_kind'),
+        ]
+        indexes = [
+            models.Index(fields=['due_at'], name='reminder_due_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} reminder for {self.task_id} at {self.due_at}"
+
+    @staticmethod
+    def due_at_for(day, reminder_time):
+        return timezone.make_aware(datetime.datetime.combine(day, reminder_time))
+
+    @classmethod
+    def sync_for_task(cls, task):
+        """Upserts or clears the reminder rows for one task."""
+        if task.status not in ('INBOX', 'ACTIVE'):
+            cls.objects.filter(task=task).delete()
+            return
+
+        recipient_id = task.assignee_id or task.user_id
+        reminder_time = (
+            Profile.objects.filter(user_id=recipient_id).values_list('reminder_time', flat=True).first()
+            or datetime.time(9, 0)
+        )
+        # Views assign raw POST strings to the date fields, so normalise first.
+        wanted = {
+            kind: _as_date(day)
+            for kind, day in (('SCHEDULED', task.scheduled_date), ('DEADLINE', task.deadline))
+        }
+        today = timezone.localdate()
+        for kind, day in wanted.items():
+            # A deadline on the scheduled day would just send the same mail
+            # twice, and a past day's reminder has already gone out.
+            if day is None or day < today or (kind == 'DEADLINE' and day == wanted['SCHEDULED']):
+                cls.objects.filter(task=task, kind=kind).delete()
+                continue
+            cls.objects.update_or_create(
+                task=task,
+                kind=kind,
+                defaults={'user_id': recipient_id, 'due_at': cls.due_at_for(day, reminder_time)},
+            )
+
+    @classmethod
+    def sync_for_tasks(cls, task_ids):
+        """
+        Set-based sync_for_task() for rows changed with queryset.update(),
+        which skips post_save: one DELETE, two SELECTs and one bulk INSERT.
+        """
+        cls.objects.filter(task_id__in=task_ids).delete()
+        tasks = list(
+            Todo.objects.filter(id__in=task_ids, status__in=['INBOX', 'ACTIVE'])
+            .values_list('id', 'user_id', 'assignee_id', 'scheduled_date', 'deadline')
+        )
+        recipients = {assignee_id or user_id for _, user_id, assignee_id, _, _ in tasks}
+        reminder_times = dict(Profile.objects.filter(user_id__in=recipients).values_list('user_id', 'reminder_time'))
+
+        today = timezone.localdate()
+        reminders = []
+        for task_id, user_id, assignee_id, scheduled_date, deadline in tasks:
+            recipient_id = assignee_id or user_id
+            reminder_time = reminder_times.get(recipient_id) or datetime.time(9, 0)
+            for kind, day in (('SCHEDULED', scheduled_date), ('DEADLINE', deadline)):
+                if day is None or day < today or (kind == 'DEADLINE' and day == scheduled_date):
+                    continue
+                reminders.append(cls(
+                    user_id=recipient_id, task_id=task_id, kind=kind, due_at=cls.due_at_for(day, reminder_time),
+                ))
+        cls.objects.bulk_create(reminders, batch_size=500)
+
+    @classmethod
+    def reschedule_for_user(cls, user, reminder_time):
+        """Moves a user's pending reminders to a new time of day."""
+        pending = list(cls.objects.filter(user=user).select_related('task'))
+        for reminder in pending:
+            day = reminder.task.scheduled_date if reminder.kind == 'SCHEDULED' else reminder.task.deadline
+            reminder.due_at = cls.due_at_for(day, reminder_time)
+        cls.objects.bulk_update(pending, ['due_at'], batch_size=500)
+
+
+REMINDER_FIELDS = {'status', 'scheduled_date', 'deadline', 'assignee'}
+
+
+@receiver(post_save, sender=Todo)
+def sync_task_reminders(sender, instance, created=False, update_fields=None, **kwargs):
+    # Timer and memo saves don't touch anything the reminder queue cares about.
+    if update_fields is not None and not REMINDER_FIELDS.intersection(update_fields):
+        return
+    # Nor does a title edit: re-syncing would re-queue a reminder that was
+    # already sent and popped from the queue.
+    state = instance.reminder_state()
+    if not created and getattr(instance, '_reminder_state', None) == state:
+        return
+    ScheduledReminder.sync_for_task(instance)
+    instance._reminder_state = state
+
+
+class EmailOutbox(models.Model):
+    """
+    Transactional mails waiting for the delivery worker. Views only insert a
+    row here (inside the same transaction as the OTP) and never talk to the
+    mail provider themselves.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    ]
+
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=200)
+    text_content = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to_email} ({self.status})"
+
+
+class FocusSession(models.Model):
+    """Append-only log of timed focus stretches, written when a running timer stops."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='focus_sessions')
+    task = models.ForeignKey(Todo, on_delete=models.SET_NULL, null=True, blank=True, related_name='focus_sessions')
+    started_at = models.DateTimeField()
+    ended_at = models.DateTimeField()
+    seconds = models.IntegerField()
+    rolled_up = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'started_at'], name='focus_user_started_idx'),
+            models.Index(fields=['rolled_up', 'id'], name='focus_rollup_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} focused {self.seconds}s from {self.started_at}"
+
+
+class FocusDay(models.Model):
+    """
+    Daily per-user rollup of FocusSession rows in compact binary form:
+    minute_bitmap is a packed 1,440-bit map of focused minutes (180 bytes)
+    and hour_seconds holds 24 little-endian int32 second totals (96 bytes).
+    See core/focus.py for the encoding.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='focus_days')
+    day = models.DateField()
+    minute_bitmap = models.BinaryField()
+    hour_seconds = models.BinaryField()
+    total_seconds = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='unique_focus_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} focus on {self.day}: {self.total_seconds}s"
+
+
+class RecurrenceRule(models.Model):
+    """
+    RRULE-style repeat rule for a recurring Todo. Occurrences are never
+    stored; core/recurrence.py expands them lazily for any date range and
+    OccurrenceOverride keeps only the dates that were completed or skipped.
+    """
+    FREQ_CHOICES = [
+        ('DAILY', 'Daily'),
+        ('WEEKLY', 'Weekly'),
+        ('MONTHLY', 'Monthly'),
+        ('YEARLY', 'Yearly'),
+    ]
+
+    task = models.OneToOneField(Todo, on_delete=models.CASCADE, related_name='recurrence')
+    freq = models.CharField(max_length=10, choices=FREQ_CHOICES)
+    interval = models.PositiveSmallIntegerField(default=1)
+    # BYDAY as RRULE codes, e.g. "MO,WE,FR"; only used for WEEKLY.
+    weekdays = models.CharField(max_length=20, blank=True, default='')
+    # BYMONTHDAY for MONTHLY/YEARLY; negative values count from the month end.
+    month_day = models.SmallIntegerField(null=True, blank=True)
+    dtstart = models.DateField()
+    until = models.DateField(null=True, blank=True)
+    count = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['dtstart', 'until'], name='recurrence_window_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.to_rrule()} from {self.dtstart}"
+
+    @classmethod
+    def from_preset(cls, task, preset):
+        """Creates the rule behind one of the form presets (see RECURRENCE_PRESETS)."""
+        from .recurrence import RECURRENCE_PRESETS
+        dtstart = _as_date(task.scheduled_date) or timezone.localdate()
+        return cls.objects.create(task=task, dtstart=dtstart, **RECURRENCE_PRESETS[preset](dtstart))
+
+    def weekday_numbers(self):
+        from .recurrence import WEEKDAY_CODES
+        return sorted({WEEKDAY_CODES.index(code) for code in self.weekdays.split(',') if code in WEEKDAY_CODES})
+
+    def occurrences(self, start, end):
+        from .recurrence import iter_occurrences
+        return iter_occurrences(self, start, end)
+
+    def to_rrule(self):
+        parts = [f"FREQ={self.freq}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.freq == 'WEEKLY' and self.weekdays:
+            parts.append(f"BYDAY={self.weekdays}")
+        if self.freq in ('MONTHLY', 'YEARLY') and self.month_day:
+            parts.append(f"BYMONTHDAY={self.month_day}")
+        if self.until:
+            parts.append(f"UNTIL={self.until:%Y%m%d}")
+        if self.count:
+            parts.append(f"COUNT={self.count}")
+        return ';'.join(parts)
+
+
+class OccurrenceOverride(models.Model):
+    """Sparse per-occurrence state of a recurring task; dates without a row are pending/missed."""
+    STATUS_CHOICES = [
+        ('COMPLETED', 'Completed'),
+        ('SKIPPED', 'Skipped'),
+    ]
+
+    task = models.ForeignKey(Todo, on_delete=models.CASCADE, related_name='occurrence_overrides')
+    date = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['task', 'date'], name='unique_occurrence_override'),
+        ]
+
+    def __str__(self):
+        return f"{self.task_id} on {self.date}: {self.status}"
+
+
+class SubTask(models.Model):
+    """One step of a task, in order, with its HTML rendered when it is written."""
+    task = models.ForeignKey(Todo, on_delete=models.CASCADE, related_name='subtasks')
+    position = models.PositiveSmallIntegerField()
+    text = models.TextField()
+    html = models.TextField()
+    is_done = models.BooleanField(default=False)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['position']
+        constraints = [
+            models.UniqueConstraint(fields=['task', 'position'], name='unique_subtask_position'),
+        ]
+
+    def __str__(self):
+        return f"{self.task_id}.{self.position}: {self.text[:40]}"
+
+
+class StudyPlanChunk(models.Model):
+    """
+    One AI call's worth of a plan being generated. Finished chunks are kept
+    until the plan is assembled, so a retried or restarted job only
+    generates the ones still missing.
+    """
+    plan = models.ForeignKey(StudyPlan, on_delete=models.CASCADE, related_name='chunks')
+    start_day = models.PositiveSmallIntegerField()
+    end_day = models.PositiveSmallIntegerField()
+    text = models.TextField(blank=True, default='')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['start_day']
+        constraints = [
+            models.UniqueConstraint(fields=['plan', 'start_day'], name='unique_plan_chunk_start'),
+        ]
+
+    def __str__(self):
+        return f"Plan {self.plan_id} days {self.start_day}-{self.end_day}"
+
+
+class DataExport(models.Model):
+    """A gzip account export built in the background for large accounts."""
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('READY', 'Ready'),
+        ('FAILED', 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='data_exports')
+    export_format = models.CharField(max_length=10, default='jsonl')
+    model = models.CharField(max_length=20, blank=True, default='')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    file_name = models.CharField(max_length=255, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.export_format} export for {self.user_id} ({self.status})"
+
+
+class SyncTombstone(models.Model):
+    """
+    Marks a task or study plan row that was removed outright (plan deletes,
+    team and plan cascades), so sync clients can drop it from their cache.
+    Tasks the user deletes themselves are kept as status='DELETED' instead
+    and travel with the normal last_updated deltas.
+    """
+    MODEL_CHOICES = [
+        ('task', 'Task'),
+        ('study_plan', 'Study plan'),
+    ]
+
+    # No DB constraint: rows are written from post_delete while the owning
+    # user may be part of the same cascade.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False, related_name='+')
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='tombstone_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} deleted"
+
+
+@receiver(post_delete, sender=Todo)
+def record_task_tombstone(sender, instance, **kwargs):
+    # Soft-deleted rows already reached clients as status='DELETED'.
+    if instance.status == 'DELETED':
+        return
+    SyncTombstone.objects.bulk_create([
+        SyncTombstone(user_id=user_id, model='task', object_id=instance.id)
+        for user_id in {instance.user_id, instance.assignee_id} - {None}
+    ])
+
+
+@receiver(post_delete, sender=StudyPlan)
+def record_plan_tombstone(sender, instance, **kwargs):
+    SyncTombstone.objects.create(user_id=instance.user_id, model='study_plan', object_id=instance.id)
+
+
+def _bump_page_version(sender, instance, **kwargs):
+    # Lazy import: conditional.py is a view helper and shouldn't load with the models.
+    from .conditional import bump_page_version
+    bump_page_version(instance.user_id, getattr(instance, 'assignee_id', None))
+
+
+# Anything the conditional-GET pages render; see core/conditional.py.
+for _model in (Todo, StudyPlan, Profile, UserBadge, DataExport, FocusSession):
+    post_save.connect(_bump_page_version, sender=_model, dispatch_uid=f'page_version_save_{_model.__name__}')
+    post_delete.connect(_bump_page_version, sender=_model, dispatch_uid=f'page_version_delete_{_model.__name__}')
+
+
+@receiver(post_save, sender=StudyPlan)
+def precompute_rendered_text(sender, instance, **kwargs):
+    if not settings.MARKDOWN_PRECOMPUTE:
+        return
+    from .rendering import precompute
+    precompute(instance)
@@ -0,0 +1,262 @@
+"""
+Generating study plans in the background, and editing them a range of days
+at a time.
+
+A new plan starts out PENDING with one StudyPlanChunk row per AI call. The
+generate_study_plan job fills the chunks in order and saves each one as soon
+as it arrives. A failed call is retried later by re-queuing the job. A
+killed worker's job is simply run again. Either way only the missing chunks
+are generated. When the last chunk is in, the plan text is assembled and
+the plan turns READY.
+
+StudyPlan.generated_plan is one text of "## Day N: Title" blocks.
+day_blocks() splits it into per-day blocks, and splice_days() replaces a
+range of them with new text. Every other day is left byte-for-byte as it
+was. Regenerating a few days is therefore a single chunk call to the AI,
+with the neighbouring days sent as context, instead of a new plan.
+
+schedule_days() turns plan days into dashboard tasks in one bulk insert.
+Each task records its plan and day, so adding a day again creates nothing.
+"""
+import datetime
+import html
+import re
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .ai_service import (
+    PLAN_CHUNK_DAYS, assemble_study_plan, contains_blocked_content, fallback_plan_days, format_plan_text,
+    generate_plan_chunk, plan_chunk_ranges,
+)
+from .models import ScheduledReminder, StudyPlan, StudyPlanChunk, Todo
+
+
+DAY_HEADING = re.compile(r'^[ \t]*##\s*Day\s*(\d+)\s*:?', re.IGNORECASE | re.MULTILINE)
+# Days either side of a regenerated range that go to the AI as context.
+CONTEXT_DAYS = 2
+MAX_REGENERATE_DAYS = PLAN_CHUNK_DAYS
+# An empty AI answer is retried this many times, CHUNK_RETRY_DELAY seconds
+# apart, before the chunk falls back to the standard day blocks.
+CHUNK_MAX_ATTEMPTS = 3
+CHUNK_RETRY_DELAY = 30
+TASK_BULLET = re.compile(r'^(?:[-*\u2022]|\d+\.)\s*')
+MIN_TASK_LENGTH = 4
+
+
+def start_generation(user, subject, goal, duration_days):
+    """
+    Creates a PENDING plan with its empty chunks. The caller queues
+    generate_study_plan. The plan only becomes the active one once it is
+    READY, so the current active plan stays active meanwhile.
+    """
+    today = timezone.localdate()
+    with transaction.atomic():
+        plan = StudyPlan.objects.create(
+            user=user,
+            subject=subject,
+            goal=goal,
+            duration_days=duration_days,
+            generated_plan='',
+            generation_status='PENDING',
+            start_date=today,
+            end_date=today + datetime.timedelta(days=duration_days - 1),
+        )
+        StudyPlanChunk.objects.bulk_create([
+            StudyPlanChunk(plan=plan, start_day=start_day, end_day=end_day)
+            for start_day, end_day in plan_chunk_ranges(duration_days)
+        ])
+    return plan
+
+
+def run_generation(plan_id):
+    """
+    Generates the plan's unfinished chunks in order, saving each as it
+    arrives. Returns the plan's final status, 'RETRY' when a chunk failed
+    and the job should run again later, or None if there is nothing to do
+    (the plan is finished or was deleted).
+    """
+    plan = StudyPlan.objects.filter(id=plan_id, generation_status__in=['PENDING', 'RUNNING']).first()
+    if plan is None:
+        return None
+    if plan.generation_status == 'PENDING':
+        StudyPlan.objects.filter(id=plan_id).update(generation_status='RUNNING', last_updated=timezone.now())
+
+    for chunk in plan.chunks.filter(completed_at__isnull=True):
+        text = generate_plan_chunk(plan.subject, plan.goal, plan.duration_days, chunk.start_day, chunk.end_day)
+        print(f"AI Raw Output (Plan {plan_id} Chunk {chunk.start_day}-{chunk.end_day}): {text}")
+        if not text and chunk.attempts + 1 < CHUNK_MAX_ATTEMPTS:
+            StudyPlanChunk.objects.filter(id=chunk.id).update(attempts=F('attempts') + 1)
+            return 'RETRY'
+        saved = StudyPlanChunk.objects.filter(id=chunk.id).update(
+            text=text or fallback_plan_days(plan.subject, plan.goal, chunk.start_day, chunk.end_day),
+            attempts=F('attempts') + 1,
+            completed_at=timezone.now(),
+        )
+        if not saved:
+            return None  # The plan was deleted while we were waiting on the AI.
+    return _finish_generation(plan_id)
+
+
+def _finish_generation(plan_id):
+    with transaction.atomic():
+        plan = StudyPlan.objects.select_for_update().filter(id=plan_id).first()
+        if plan is None:
+            return None
+        chunks = list(plan.chunks.values_list('text', flat=True))
+        plan_text = assemble_study_plan(plan.subject, plan.goal, plan.duration_days, chunks)
+        if contains_blocked_content(plan_text):
+            plan.generation_status = 'FAILED'
+        else:
+            plan.generated_plan = plan_text
+            plan.generation_status = 'READY'
+            # save() deactivates the user's other plans.
+            plan.is_active = True
+        plan.save(update_fields=['generated_plan', 'generation_status', 'is_active', 'last_updated'])
+        # The chunks only exist to resume an unfinished plan.
+        plan.chunks.all().delete()
+    return plan.generation_status
+
+
+def generation_progress(plan):
+    """What the plan page polls while a plan is being written."""
+    ranges = plan_chunk_ranges(plan.duration_days)
+    if plan.generation_status in ('READY', 'FAILED'):
+        done, days = len(ranges), plan.duration_days
+    else:
+        counts = plan.chunks.aggregate(
+            done=Count('id', filter=Q(completed_at__isnull=False)),
+            days=Sum(F('end_day') - F('start_day') + 1, filter=Q(completed_at__isnull=False)),
+        )
+        done, days = counts['done'], counts['days'] or 0
+    return {
+        'status': plan.generation_status,
+        'chunks_done': done,
+        'chunks_total': len(ranges),
+        'days_ready': days,
+        'duration_days': plan.duration_days,
+    }
+
+
+def day_blocks(plan_text):
+    """
+    [(day, block)] in plan order. Text before the first heading comes back
+    as day None; a repeated day keeps only its first block.
+    """
+    matches = list(DAY_HEADING.finditer(plan_text))
+    blocks, seen = [], set()
+    preamble = plan_text[:matches[0].start()] if matches else plan_text
+    if preamble.strip():
+        blocks.append((None, preamble.strip()))
+    for index, match in enumerate(matches):
+        day = int(match.group(1))
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(plan_text)
+        if day not in seen:
+            seen.add(day)
+            blocks.append((day, plan_text[match.start():end].strip()))
+    return blocks
+
+
+def splice_days(plan_text, new_text, start_day, end_day):
+    """plan_text with Day start_day..end_day taken from new_text, in day order."""
+    replacements = {day: block for day, block in day_blocks(new_text) if day and start_day <= day <= end_day}
+    kept = [(day, block) for day, block in day_blocks(plan_text) if day is None or not start_day <= day <= end_day]
+    blocks = sorted(kept + list(replacements.items()), key=lambda item: -1 if item[0] is None else item[0])
+    return "\n\n".join(block for _, block in blocks)
+
+
+def regenerated_days(plan, start_day, end_day):
+    """
+    New text for Day start_day..end_day of `plan`, from one AI call. Days
+    the AI leaves out get the standard fallback block.
+    """
+    blocks = dict(day_blocks(plan.generated_plan))
+    neighbours = [
+        blocks[day] for day in [*range(start_day - CONTEXT_DAYS, start_day), *range(end_day + 1, end_day + 1 + CONTEXT_DAYS)]
+        if day in blocks
+    ]
+    raw = generate_plan_chunk(
+        plan.subject, plan.goal, plan.duration_days, start_day, end_day,
+        context=strip_tags("\n\n".join(neighbours)),
+    )
+    new = {day: block for day, block in day_blocks(format_plan_text(raw or '')) if day and start_day <= day <= end_day}
+    for day in range(start_day, end_day + 1):
+        if day not in new:
+            new[day] = fallback_plan_days(plan.subject, plan.goal, day, day)
+    return "\n\n".join(new[day] for day in sorted(new))
+
+
+def save_regenerated_days(plan_id, new_text, start_day, end_day):
+    """
+    Splices the new days into the plan as it is now. The row is locked and
+    re-read because the AI call takes seconds, and an edit made meanwhile
+    must not be lost.
+    """
+    with transaction.atomic():
+        plan = StudyPlan.objects.select_for_update().get(id=plan_id)
+        plan.generated_plan = splice_days(plan.generated_plan, new_text, start_day, end_day)
+        plan.save(update_fields=['generated_plan', 'last_updated'])
+    return plan
+
+
+def day_tasks(plan_text):
+    """
+    {day: [task title, ...]} as plain text. Bullet lines are the tasks; a
+    day without bullets falls back to its other lines, as on the plan page.
+    """
+    tasks = {}
+    for day, block in day_blocks(plan_text):
+        if day is None:
+            continue
+        bullets, other = [], []
+        for line in block.splitlines()[1:]:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            title = html.unescape(strip_tags(TASK_BULLET.sub('', line))).replace('**', '').strip()
+            if len(title) >= MIN_TASK_LENGTH:
+                (bullets if TASK_BULLET.match(line) else other).append(title[:Todo._meta.get_field('title').max_length])
+        if bullets or other:
+            tasks[day] = bullets or other
+    return tasks
+
+
+def plan_dates(start, duration_days, skip_weekends=False):
+    """{day: date} for Day 1..duration_days from `start`, optionally on weekdays only."""
+    dates, date = {}, start
+    for day in range(1, duration_days + 1):
+        while skip_weekends and date.weekday() >= 5:
+            date += datetime.timedelta(days=1)
+        dates[day] = date
+        date += datetime.timedelta(days=1)
+    return dates
+
+
+def schedule_days(plan, dates):
+    """
+    Adds the tasks of every day in `dates` ({day: date}) to the plan owner's
+    dashboard, linked to the plan, in one bulk insert. Days that still
+    have tasks from this plan are skipped, so repeating a request is a
+    no-op; a day whose tasks were all deleted can be added again. Returns (tasks created, days already scheduled).
+    """
+    tasks = day_tasks(plan.generated_plan)
+    with transaction.atomic():
+        # Serialises concurrent requests for the same plan.
+        list(StudyPlan.objects.select_for_update().filter(id=plan.id).values_list('id'))
+        scheduled = set(
+            Todo.objects.filter(study_plan=plan, plan_day__in=list(dates)).exclude(status='DELETED')
+            .values_list('plan_day', flat=True).distinct()
+        )
+        created = Todo.objects.bulk_create([
+            Todo(
+                user_id=plan.user_id, title=title, status='INBOX', priority=2,
+                scheduled_date=date, study_plan=plan, plan_day=day,
+            )
+            for day, date in sorted(dates.items()) if day not in scheduled
+            for title in tasks.get(day, [])
+        ], batch_size=500)
+        # bulk_create skips the post_save reminder sync.
+        ScheduledReminder.sync_for_tasks([task.id for task in created])
+    return created, sorted(scheduled)
@@ -0,0 +1,190 @@
+"""
+Lazy expansion of RRULE-style recurrence rules (FREQ, INTERVAL, BYDAY,
+BYMONTHDAY, UNTIL, COUNT) into occurrence dates.
+
+Nothing is materialised: iter_occurrences() jumps straight to the first
+period that can overlap the requested range and yields dates one by one,
+so asking for a year of a rule that started long ago costs the same as
+asking for its first year.
+"""
+import calendar
+import datetime
+
+
+WEEKDAY_CODES = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+# Largest INTERVAL and COUNT the RecurrenceRule columns hold.
+MAX_INTERVAL = 32767
+MAX_COUNT = 2 ** 31 - 1
+
+# Presets offered by the task forms; each maps to RecurrenceRule fields.
+RECURRENCE_PRESETS = {
+    'DAILY': lambda dtstart: {'freq': 'DAILY'},
+    'WEEKLY': lambda dtstart: {'freq': 'WEEKLY', 'weekdays': WEEKDAY_CODES[dtstart.weekday()]},
+    'WEEKDAYS': lambda dtstart: {'freq': 'WEEKLY', 'weekdays': 'MO,TU,WE,TH,FR'},
+    'MONTHLY': lambda dtstart: {'freq': 'MONTHLY', 'month_day': dtstart.day},
+}
+
+
+def parse_rrule(text):
+    """
+    Parses the RRULE subset RecurrenceRule supports into its field values.
+    Raises ValueError for anything else (BYSETPOS, hourly rules, ...).
+    """
+    fields = {'interval': 1, 'weekdays': '', 'month_day': None, 'until': None, 'count': None}
+    for part in text.strip().removeprefix('RRULE:').split(';'):
+        if not part:
+            continue
+        key, _, value = part.partition('=')
+        key = key.upper()
+        if key == 'FREQ':
+            if value not in ('DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY'):
+                raise ValueError(f"Unsupported FREQ {value}")
+            fields['freq'] = value
+        elif key == 'INTERVAL':
+            fields['interval'] = int(value)
+        elif key == 'BYDAY':
+            codes = value.split(',')
+            if any(code not in WEEKDAY_CODES for code in codes):
+                raise ValueError(f"Unsupported BYDAY {value}")
+            fields['weekdays'] = value
+        elif key == 'BYMONTHDAY':
+            fields['month_day'] = int(value)
+        elif key == 'UNTIL':
+            fields['until'] = datetime.datetime.strptime(value[:8], '%Y%m%d').date()
+        elif key == 'COUNT':
+            fields['count'] = int(value)
+        elif key != 'WKST':
+            raise ValueError(f"Unsupported RRULE part {key}")
+    if 'freq' not in fields:
+        raise ValueError("RRULE without FREQ")
+    # Checked here so a bad rule is a row error rather than an IntegrityError on insert.
+    if not 1 <= fields['interval'] <= MAX_INTERVAL:
+        raise ValueError(f"INTERVAL must be between 1 and {MAX_INTERVAL}")
+    if fields['count'] is not None and not 1 <= fields['count'] <= MAX_COUNT:
+        raise ValueError(f"COUNT must be between 1 and {MAX_COUNT}")
+    if fields['month_day'] is not None and not 1 <= abs(fields['month_day']) <= 31:
+        raise ValueError("BYMONTHDAY must be 1 to 31 or -1 to -31")
+    return fields
+
+
+def _ceil_div(a, b):
+    return -(-a // b)
+
+
+def _month_day(year, month, month_day):
+    """Resolves BYMONTHDAY (negative counts from month end); None if the month lacks it."""
+    days_in_month = calendar.monthrange(year, month)[1]
+    day = month_day if month_day > 0 else days_in_month + month_day + 1
+    if 1 <= day <= days_in_month:
+        return datetime.date(year, month, day)
+    return None
+
+
+def _daily(rule, start):
+    step = rule.interval
+    period = max(0, _ceil_div((start - rule.dtstart).days, step))
+    index = period
+    day = rule.dtstart + datetime.timedelta(days=period * step)
+    delta = datetime.timedelta(days=step)
+    while True:
+        yield index, day
+        index += 1
+        day += delta
+
+
+def _weekly(rule, start):
+    weekdays = rule.weekday_numbers() or [rule.dtstart.weekday()]
+    step = rule.interval
+    first_monday = rule.dtstart - datetime.timedelta(days=rule.dtstart.weekday())
+    first_week_count = sum(1 for wd in weekdays if wd >= rule.dtstart.weekday())
+
+    weeks = max(0, (start - first_monday).days // 7)
+    period = _ceil_div(weeks, step)
+    index = 0 if period == 0 else first_week_count + (period - 1) * len(weekdays)
+
+    while True:
+        monday = first_monday + datetime.timedelta(weeks=period * step)
+        for wd in weekdays:
+            day = monday + datetime.timedelta(days=wd)
+            if day < rule.dtstart:
+                continue
+            yield index, day
+            index += 1
+        period += 1
+
+
+def _monthly(rule, start, months_per_period):
+    month_day = rule.month_day or rule.dtstart.day
+    step = rule.interval * months_per_period
+    first_month = rule.dtstart.year * 12 + rule.dtstart.month - 1
+    start_month = start.year * 12 + start.month - 1
+    period = max(0, _ceil_div(start_month - first_month, step))
+    if not 1 <= abs(month_day) <= 31:
+        return  # No month has it; don't scan to MAXYEAR looking.
+
+    def occurrence(period):
+        year, month = divmod(first_month + period * step, 12)
+        day = _month_day(year, month + 1, month_day)
+        # The first period's day can fall before dtstart; it isn't an occurrence.
+        return day if day is not None and day >= rule.dtstart else None
+
+    if -28 <= month_day <= 28:
+        index = period - (period > 0 and occurrence(0) is None)
+    else:
+        # Months without e.g. a 31st don't count towards COUNT; only walk them when it matters.
+        index = 0
+        if rule.count is not None:
+            index = sum(occurrence(earlier) is not None for earlier in range(period))
+
+    while first_month + period * step < (datetime.MAXYEAR + 1) * 12:
+        day = occurrence(period)
+        if day is not None:
+            yield index, day
+            index += 1
+        period += 1
+
+
+def _periods(rule, start):
+    if rule.freq == 'DAILY':
+        return _daily(rule, start)
+    if rule.freq == 'WEEKLY':
+        return _weekly(rule, start)
+    if rule.freq == 'MONTHLY':
+        return _monthly(rule, start, 1)
+    if rule.freq == 'YEARLY':
+        return _monthly(rule, start, 12)
+    raise ValueError(f"Unsupported recurrence frequency: {rule.freq}")
+
+
+def iter_occurrences(rule, start, end):
+    """Yields the occurrence dates of `rule` within [start, end], in order."""
+    last = min(end, rule.until) if rule.until else end
+    first = max(start, rule.dtstart)
+    if first > last:
+        return
+
+    for index, day in _periods(rule, first):
+        if rule.count is not None and index >= rule.count:
+            return
+        if day > last:
+            return
+        if day >= first:
+            yield day
+
+
+def next_occurrence(rule, after):
+    """First occurrence strictly after `after`, or None when the series has ended."""
+    return next(iter_occurrences(rule, after + datetime.timedelta(days=1), datetime.date.max), None)
+
+
+def occurrences_with_status(rule, start, end, overrides, today=None):
+    """
+    Yields (date, status) for each occurrence. `overrides` maps dates to the
+    sparse OccurrenceOverride status; past dates without one are MISSED.
+    """
+    today = today or datetime.date.today()
+    for day in iter_occurrences(rule, start, end):
+        status = overrides.get(day)
+        if status is None:
+            status = 'MISSED' if day < today else 'PENDING'
+        yield day, status
@@ -0,0 +1,161 @@
+"""
+Render-once cache for study plan text.
+
+Rendering a 90-day plan (markdown, or the day/task structure the plan page
+shows) is pure CPU on text that rarely changes, so results are memoised by
+a hash of the content: first in a small per-process LRU, then in the shared
+cache so every worker benefits. A changed plan hashes differently, so
+nothing ever needs invalidating.
+
+With MARKDOWN_PRECOMPUTE on, saving a StudyPlan renders it straight away
+(see the signal in models.py), so the first page view is already a cache
+hit.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from urllib.parse import urlsplit
+
+import markdown as md
+from django.core.cache import cache
+from markdown.extensions import Extension
+from markdown.treeprocessors import Treeprocessor
+
+
+RENDER_CACHE_SIZE = 256
+RENDER_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+RENDER_VERSION = 2  # bump when the renderers' output changes
+
+_local = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def cache_key(kind, text):
+    return f"render:{RENDER_VERSION}:{kind}:{hashlib.sha1(text.encode()).hexdigest()}"
+
+
+def cached_render(kind, text, render):
+    """render(text), memoised by (kind, sha1 of text)."""
+    key = cache_key(kind, text)
+    with _local_lock:
+        if key in _local:
+            _local.move_to_end(key)
+            return _local[key]
+
+    result = cache.get(key)
+    if result is None:
+        result = render(text)
+        cache.set(key, result, RENDER_CACHE_TIMEOUT)
+
+    with _local_lock:
+        _local[key] = result
+        _local.move_to_end(key)
+        while len(_local) > RENDER_CACHE_SIZE:
+            _local.popitem(last=False)
+    return result
+
+
+def clear_local_cache():
+    with _local_lock:
+        _local.clear()
+
+
+SAFE_URL_SCHEMES = ('http', 'https', 'mailto')
+
+
+class _DropUnsafeUrls(Treeprocessor):
+    def run(self, root):
+        for element in root.iter():
+            for attribute in ('href', 'src'):
+                url = element.get(attribute)
+                scheme = url and urlsplit(url.strip()).scheme.lower()
+                if scheme and scheme not in SAFE_URL_SCHEMES:
+                    del element.attrib[attribute]
+
+
+class _NoRawHtml(Extension):
+    """
+    Raw HTML in AI/user text comes out as text, and javascript:/data: links
+    lose their URL. The source itself isn't escaped, so code blocks and
+    blockquotes still render.
+    """
+    def extendMarkdown(self, md):
+        md.preprocessors.deregister('html_block')
+        md.inlinePatterns.deregister('html')
+        md.treeprocessors.register(_DropUnsafeUrls(md), 'drop_unsafe_urls', 0)
+
+
+def _markdown(text):
+    return md.markdown(text, extensions=['markdown.extensions.fenced_code', _NoRawHtml()])
+
+
+def render_markdown(text):
+    return cached_render('markdown', text or '', _markdown)
+
+
+def parse_plan_days(plan_text):
+    """
+    Returns list of dicts: [{'day': 1, 'title': 'Title', 'content': '...'}, ...]
+    Robustly extracts blocks that start with "## Day N: Title" (case-insensitive).
+    Works with the AI output format your app expects.
+    """
+    pattern = r'##\s*Day\s*(\d+)\s*:?\s*([^\n\r]+)\s*(.*?)(?=(?:##\s*Day\s*\d+\s*:)|\Z)'
+    matches = re.findall(pattern, plan_text, flags=re.IGNORECASE | re.DOTALL)
+    days = []
+    for num_str, title, content in matches:
+        try:
+            num = int(num_str)
+        except ValueError:
+            continue
+        days.append({
+            'day': num,
+            'title': title.strip(),
+            'content': content.strip()
+        })
+    days.sort(key=lambda d: d['day'])
+    return days
+
+
+def _plan_structure(plan_text):
+    structure = []
+    for d in parse_plan_days(plan_text):
+        lines = d['content'].splitlines()
+        tasks = []
+        fallback_lines = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith(('-', '*')) or re.match(r'^\d+\.', line):
+                task_text = re.sub(r'^[\-\*\d\.\s]+', '', line).strip()
+                if task_text:
+                    processed_line = re.sub(r'\*\*(.*?)\*\*', r'<strong style="color: var(--accent-color);">\1</strong>', task_text)
+                    processed_line = re.sub(r'\*(.*?)\*', r'<em class="text-secondary" style="font-weight: 500;">\1</em>', processed_line)
+                    processed_line = re.sub(r'\_(.*?)\_', r'<em class="text-secondary" style="font-weight: 500;">\1</em>', processed_line)
+                    tasks.append(processed_line)
+            elif not line.startswith('#'):
+                fallback_lines.append(line)
+
+        if not tasks and fallback_lines:
+            tasks = fallback_lines
+
+        if tasks:
+            # Keep URL param slash-safe by passing only day number token.
+            day_key = f"Day {d['day']}"
+            pretty_title = f"Day {d['day']} {d['title']}"
+            structure.append((day_key, pretty_title, tasks))
+    return structure
+
+
+def plan_structure(plan_text):
+    """[(day_key, title, [task_html, ...]), ...] for the plan page."""
+    return cached_render('plan', plan_text or '', _plan_structure)
+
+
+def precompute(plan):
+    """Warms the cache for a freshly saved study plan."""
+    # The page only falls back to plain markdown when no days parse.
+    if not plan_structure(plan.generated_plan):
+        render_markdown(plan.generated_plan)
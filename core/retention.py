@@ -0,0 +1,147 @@
+"""
+Retention: deleting rows nothing will read again.
+
+Each policy names a queryset of expired rows. purge_expired() works through
+them RETENTION_BATCH_SIZE primary keys at a time, one short transaction per
+batch, so no delete holds more than a batch's worth of row locks (plus their
+cascades) and the job can be stopped at any point. Policies:
+
+- tasks: soft-deleted (status='DELETED') tasks, once sync clients no longer
+  need them as tombstones (SYNC_HISTORY_DAYS).
+- tombstones: SyncTombstones older than SYNC_HISTORY_DAYS, for the same reason.
+- otps: codes past OTPVerification.VALID_FOR; verifying one fails anyway.
+- pending_signups: accounts that never verified their email, with no fresh
+  code, after PENDING_SIGNUP_DAYS.
+- outbox: delivered mails after OUTBOX_DAYS.
+- completed_jobs: django-background-tasks' CompletedTask history after
+  COMPLETED_JOB_DAYS. The repeating jobs add one row per run.
+
+Deletes a user asks for (clearing history, deleting completed plans or a
+team) use the same batching from a background job. The view only marks
+the target, which hides it at once. Tasks go through delete_tasks(). It
+never loads Todo instances: related rows go with one DELETE or UPDATE per
+table, the tasks with a plain DELETE, and tombstones and page versions are
+written per batch in place of the post_delete receivers.
+"""
+import datetime
+from collections import Counter
+
+from background_task.models import CompletedTask
+from django.contrib.auth.models import User
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .conditional import bump_page_version
+from .models import EmailOutbox, OTPVerification, Profile, StudyPlan, SyncTombstone, Team, Todo
+from .sync import SYNC_HISTORY_DAYS
+
+
+RETENTION_BATCH_SIZE = 500
+PENDING_SIGNUP_DAYS = 7
+OUTBOX_DAYS = 30
+COMPLETED_JOB_DAYS = 7
+
+
+def _days_ago(now, days):
+    return now - datetime.timedelta(days=days)
+
+
+# (name, now -> queryset of rows to delete)
+POLICIES = [
+    ('tasks', lambda now: Todo.objects.filter(status='DELETED', last_updated__lt=_days_ago(now, SYNC_HISTORY_DAYS))),
+    ('tombstones', lambda now: SyncTombstone.objects.filter(deleted_at__lt=_days_ago(now, SYNC_HISTORY_DAYS))),
+    ('otps', lambda now: OTPVerification.objects.filter(created_at__lt=now - OTPVerification.VALID_FOR)),
+    ('pending_signups', lambda now: User.objects.filter(
+        is_active=False, last_login__isnull=True, date_joined__lt=_days_ago(now, PENDING_SIGNUP_DAYS),
+    ).exclude(otpverification__created_at__gte=_days_ago(now, PENDING_SIGNUP_DAYS))),
+    ('outbox', lambda now: EmailOutbox.objects.filter(status='SENT', sent_at__lt=_days_ago(now, OUTBOX_DAYS))),
+    ('completed_jobs', lambda now: CompletedTask.objects.filter(run_at__lt=_days_ago(now, COMPLETED_JOB_DAYS))),
+]
+
+
+def delete_in_batches(queryset, batch_size=RETENTION_BATCH_SIZE):
+    """
+    Deletes `queryset` batch_size primary keys per transaction. Returns
+    rows removed per model label, cascades included.
+    """
+    removed = Counter()
+    model = queryset.model
+    while True:
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return removed
+        with transaction.atomic():
+            _, per_model = model.objects.filter(pk__in=ids).delete()
+        removed.update(per_model)
+
+
+def purge_expired(policies=None, batch_size=RETENTION_BATCH_SIZE, now=None):
+    """Runs the named policies (all by default); returns {policy: {model label: rows}}."""
+    now = now or timezone.now()
+    report = {}
+    for name, expired in POLICIES:
+        if policies is None or name in policies:
+            report[name] = dict(delete_in_batches(expired(now), batch_size))
+    return report
+
+
+def _delete_task_batch(ids):
+    rows = list(Todo.objects.filter(id__in=ids).values_list('id', 'user_id', 'assignee_id', 'status'))
+    for relation in Todo._meta.related_objects:
+        related = relation.related_model._base_manager.filter(**{f'{relation.field.name}__in': ids})
+        if relation.on_delete is models.SET_NULL:
+            related.update(**{relation.field.name: None})
+        else:
+            related.delete()
+    # Same rows record_task_tombstone would write: soft-deleted tasks already reached clients.
+    SyncTombstone.objects.bulk_create([
+        SyncTombstone(user_id=user_id, model='task', object_id=task_id)
+        for task_id, owner_id, assignee_id, status in rows if status != 'DELETED'
+        for user_id in {owner_id, assignee_id} - {None}
+    ])
+    deleted = Todo.objects.filter(id__in=ids)._raw_delete(Todo.objects.db)
+    bump_page_version(*{user_id for row in rows for user_id in row[1:3]})
+    return deleted
+
+
+def delete_tasks(queryset, batch_size=RETENTION_BATCH_SIZE):
+    """Deletes the tasks in `queryset`, batch_size per transaction. Returns how many."""
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            deleted += _delete_task_batch(ids)
+
+
+def delete_task_history(user_id, batch_size=RETENTION_BATCH_SIZE):
+    """Deletes the user's tasks completed up to Profile.history_cleared_at."""
+    cleared_at = Profile.objects.filter(user_id=user_id).values_list('history_cleared_at', flat=True).first()
+    if cleared_at is None:
+        return 0
+    return delete_tasks(
+        Todo.objects.filter(
+            Q(datecompleted__lte=cleared_at) | Q(datecompleted__isnull=True), user_id=user_id, status='COMPLETED',
+        ),
+        batch_size,
+    )
+
+
+def delete_study_plans(user_id, batch_size=RETENTION_BATCH_SIZE):
+    """Deletes the user's plans marked pending_deletion and their tasks. Returns (plans, tasks)."""
+    plan_ids = list(StudyPlan.objects.filter(user_id=user_id, pending_deletion=True).values_list('id', flat=True))
+    tasks = delete_tasks(Todo.objects.filter(study_plan_id__in=plan_ids), batch_size)
+    # A user has a handful of plans, so the ORM delete (and its tombstones) is fine here.
+    _, removed = StudyPlan.objects.filter(id__in=plan_ids).delete()
+    return removed.get('core.StudyPlan', 0), tasks
+
+
+def delete_team(team_id, batch_size=RETENTION_BATCH_SIZE):
+    """Deletes a team marked pending_deletion, its tasks first. Returns how many tasks."""
+    if not Team.objects.filter(id=team_id, pending_deletion=True).exists():
+        return 0
+    tasks = delete_tasks(Todo.objects.filter(team_id=team_id), batch_size)
+    Team.objects.filter(id=team_id).delete()
+    return tasks
@@ -0,0 +1,156 @@
+"""
+Auto-scheduling: packs a user's unscheduled INBOX tasks into the coming days.
+
+Tasks are taken in urgency order (earliest deadline, then priority, then
+age) and each goes to the earliest day in the window that still has room
+for its time estimate, counting work already scheduled there. Hard tasks
+are also capped per day so one day doesn't get all of them. Open days sit
+in a heap keyed by date. Full days drop out of it, and a running bound on
+the largest gap left lets tasks that can no longer fit anywhere skip the
+search. A few thousand tasks pack in milliseconds. Capacity and estimates
+come from the user's forecast (see forecast.py) unless the caller sets them.
+
+plan_schedule() is pure. auto_schedule() loads the tasks, and unless
+`preview` is set it writes every new date with a single bulk_update.
+"""
+import datetime
+import heapq
+import math
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from . import forecast
+from .models import ScheduledReminder, Todo
+
+
+DAILY_CAPACITY_MINUTES = 240
+MAX_CAPACITY_MINUTES = 24 * 60
+SCHEDULE_DAYS = 14
+MAX_SCHEDULE_DAYS = 90
+MAX_HARD_PER_DAY = 2
+DEFAULT_ESTIMATE = 25
+# Bounds on the forecast overrun applied to estimates.
+MIN_OVERRUN = 0.5
+MAX_OVERRUN = 3.0
+
+TASK_FIELDS = (
+    'id', 'user_id', 'assignee_id', 'title', 'priority', 'difficulty', 'deadline',
+    'time_estimate_minutes', 'snoozed_until', 'created',
+)
+
+
+def _urgency(task):
+    return (task['deadline'] or datetime.date.max, -task['priority'], task['created'], task['id'])
+
+
+def plan_schedule(tasks, start, days, capacity, load=None, hard_load=None, overrun=1.0):
+    """
+    Returns ({task id: date}, [ids that didn't fit]). `tasks` are dicts with
+    TASK_FIELDS. `load` and `hard_load` map dates to minutes and Hard tasks
+    already booked. Estimates are scaled by `overrun`, the user's typical
+    actual/estimated time. A task longer than a whole day may take an empty
+    day alone, or it would never be placed.
+    """
+    load, hard_load = load or {}, hard_load or {}
+
+    def minutes_for(task):
+        return min(math.ceil((task['time_estimate_minutes'] or DEFAULT_ESTIMATE) * overrun), capacity)
+
+    dates = [start + datetime.timedelta(days=offset) for offset in range(days)]
+    remaining = [capacity - load.get(day, 0) for day in dates]
+    hard = [hard_load.get(day, 0) for day in dates]
+    smallest = min((minutes_for(task) for task in tasks), default=capacity)
+
+    open_days = [index for index in range(days) if remaining[index] >= smallest]
+    heapq.heapify(open_days)
+    largest_gap = max(remaining, default=0)
+    hard_slots = sum(count < MAX_HARD_PER_DAY for count in hard)
+
+    placed, unplaced = {}, []
+    for task in sorted(tasks, key=_urgency):
+        minutes = minutes_for(task)
+        is_hard = task['difficulty'] == 'Hard'
+        earliest = timezone.localdate(task['snoozed_until']) if task['snoozed_until'] else start
+        if minutes > largest_gap or (is_hard and not hard_slots):
+            unplaced.append(task['id'])
+            continue
+
+        skipped, found, gap = [], None, 0
+        while open_days:
+            index = heapq.heappop(open_days)
+            gap = max(gap, remaining[index])
+            if remaining[index] >= minutes and dates[index] >= earliest and not (is_hard and hard[index] >= MAX_HARD_PER_DAY):
+                found = index
+                break
+            skipped.append(index)
+
+        if found is None:
+            # Every open day was checked, so `gap` is now the exact largest gap.
+            largest_gap = gap
+            unplaced.append(task['id'])
+        else:
+            placed[task['id']] = dates[found]
+            remaining[found] -= minutes
+            if is_hard:
+                hard[found] += 1
+                hard_slots -= hard[found] == MAX_HARD_PER_DAY
+            if remaining[found] >= smallest:
+                skipped.append(found)
+        for index in skipped:
+            heapq.heappush(open_days, index)
+    return placed, unplaced
+
+
+def _candidates(user, today):
+    return Todo.objects.filter(
+        Q(user=user, team__isnull=True) | Q(assignee=user),
+        Q(scheduled_date__isnull=True) | Q(scheduled_date__lt=today),
+        status='INBOX',
+    )
+
+
+def _booked(user, start, end):
+    """({date: minutes}, {date: Hard tasks}) already scheduled in [start, end)."""
+    rows = (
+        Todo.objects.filter(
+            Q(user=user, team__isnull=True) | Q(assignee=user),
+            status__in=['INBOX', 'ACTIVE'], scheduled_date__gte=start, scheduled_date__lt=end,
+        )
+        .values('scheduled_date')
+        .annotate(minutes=Sum('time_estimate_minutes'), hard=Count('id', filter=Q(difficulty='Hard')))
+    )
+    return (
+        {row['scheduled_date']: row['minutes'] or 0 for row in rows},
+        {row['scheduled_date']: row['hard'] for row in rows},
+    )
+
+
+def auto_schedule(user, days=SCHEDULE_DAYS, capacity=None, start=None, preview=False):
+    """
+    Schedules the user's unscheduled (or overdue) INBOX tasks from `start`
+    (today by default). Without an explicit `capacity`, the user's forecast
+    capacity is used (or DAILY_CAPACITY_MINUTES with too little history).
+    Returns (placed rows with their new 'scheduled_date', ids left
+    unscheduled). With `preview`, nothing is written.
+    """
+    start = start or timezone.localdate()
+    user_forecast = forecast.get_forecast(user)
+    capacity = capacity or user_forecast['daily_capacity_minutes'] or DAILY_CAPACITY_MINUTES
+    overrun = min(max(user_forecast['estimate_overrun'] or 1.0, MIN_OVERRUN), MAX_OVERRUN)
+    tasks = list(_candidates(user, start).values(*TASK_FIELDS))
+    load, hard_load = _booked(user, start, start + datetime.timedelta(days=days))
+    placed, unplaced = plan_schedule(tasks, start, days, capacity, load, hard_load, overrun)
+
+    rows = [{**task, 'scheduled_date': placed[task['id']]} for task in tasks if task['id'] in placed]
+    if rows and not preview:
+        now = timezone.now()
+        with transaction.atomic():
+            Todo.objects.bulk_update([
+                Todo(id=row['id'], scheduled_date=row['scheduled_date'], last_updated=now, version=F('version') + 1)
+                for row in rows
+            ], ['scheduled_date', 'last_updated', 'version'])
+            ScheduledReminder.sync_for_tasks(list(placed))
+    rows.sort(key=lambda row: (row['scheduled_date'], _urgency(row)))
+    return rows, unplaced
@@ -0,0 +1,182 @@
+"""
+Full-text search over tasks (title, memo, sub_tasks) and study plans
+(subject, goal, generated_plan).
+
+The index lives in the database and is picked from the configured backend:
+
+* SQLite: FTS5 external-content tables kept in sync by triggers, ranked
+  with bm25().
+* PostgreSQL: a stored, weighted ``tsvector`` generated column with a GIN
+  index, ranked with ts_rank().
+* Anything else falls back to icontains filters (no ranking).
+
+install_search_index() is idempotent. It runs from the migration and again
+after every migrate, because SQLite drops a table's triggers whenever
+Django rebuilds that table for a schema change.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import StudyPlan, Todo
+
+
+SEARCH_TARGETS = {
+    'tasks': {
+        'model': Todo,
+        'table': 'core_todo',
+        'columns': ['title', 'memo', 'sub_tasks'],
+        'weights': ['A', 'B', 'C'],
+    },
+    'plans': {
+        'model': StudyPlan,
+        'table': 'core_studyplan',
+        'columns': ['subject', 'goal', 'generated_plan'],
+        'weights': ['A', 'B', 'C'],
+    },
+}
+
+# bm25() column weights, same order as 'columns'.
+SQLITE_WEIGHTS = '10.0, 4.0, 1.0'
+
+
+def _sqlite_statements(table, columns):
+    fts = f"{table}_fts"
+    cols = ', '.join(columns)
+    new_values = ', '.join(f"new.{col}" for col in columns)
+    old_values = ', '.join(f"old.{col}" for col in columns)
+    changed = ' OR '.join(f"old.{col} IS NOT new.{col}" for col in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{cols}, content='{table}', content_rowid='id', tokenize='porter unicode61')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END",
+        # Timer/status saves rewrite every column; only reindex when the text changed.
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} WHEN {changed} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+    ]
+
+
+def _postgres_statements(table, columns, weights):
+    vector = ' || '.join(
+        f"setweight(to_tsvector('english', coalesce({col}, '')), '{weight}')"
+        for col, weight in zip(columns, weights)
+    )
+    return [
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS ({vector}) STORED",
+        f"CREATE INDEX IF NOT EXISTS {table}_search_idx ON {table} USING GIN (search_vector)",
+    ]
+
+
+def install_search_index(schema_connection=None):
+    """Creates (or repairs) the full-text index for the current backend."""
+    conn = schema_connection or connection
+    with conn.cursor() as cursor:
+        for target in SEARCH_TARGETS.values():
+            table, columns = target['table'], target['columns']
+            if conn.vendor == 'sqlite':
+                fts = f"{table}_fts"
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [fts])
+                created = cursor.fetchone() is None
+                for statement in _sqlite_statements(table, columns):
+                    cursor.execute(statement)
+                if created:
+                    cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+            elif conn.vendor == 'postgresql':
+                for statement in _postgres_statements(table, columns, target['weights']):
+                    cursor.execute(statement)
+
+
+def remove_search_index(schema_connection=None):
+    conn = schema_connection or connection
+    with conn.cursor() as cursor:
+        for target in SEARCH_TARGETS.values():
+            table = target['table']
+            if conn.vendor == 'sqlite':
+                for suffix in ('ai', 'ad', 'au'):
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}")
+                cursor.execute(f"DROP TABLE IF EXISTS {table}_fts")
+            elif conn.vendor == 'postgresql':
+                cursor.execute(f"DROP INDEX IF EXISTS {table}_search_idx")
+                cursor.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector")
+
+
+def _fts5_query(text):
+    """Turns free text into an FTS5 query: every word must match, as a prefix."""
+    words = re.findall(r'\w+', text)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _owner_clause(kind):
+    if kind == 'tasks':
+        return "(t.user_id = %s OR t.assignee_id = %s) AND t.status <> 'DELETED'", 2
+    # Plans waiting for the delete_study_plans job are already gone for the user.
+    return "t.user_id = %s AND NOT t.pending_deletion", 1
+
+
+def _ranked_ids(kind, user, text, limit, offset):
+    target = SEARCH_TARGETS[kind]
+    table = target['table']
+    owner_sql, owner_params = _owner_clause(kind)
+
+    if connection.vendor == 'sqlite':
+        match = _fts5_query(text)
+        if not match:
+            return []
+        sql = (
+            f"SELECT t.id FROM {table}_fts f JOIN {table} t ON t.id = f.rowid "
+            f"WHERE {table}_fts MATCH %s AND {owner_sql} "
+            f"ORDER BY bm25({table}_fts, {SQLITE_WEIGHTS}), t.id DESC LIMIT %s OFFSET %s"
+        )
+        params = [match]
+    else:
+        sql = (
+            f"SELECT t.id FROM {table} t, websearch_to_tsquery('english', %s) q "
+            f"WHERE t.search_vector @@ q AND {owner_sql} "
+            f"ORDER BY ts_rank(t.search_vector, q) DESC, t.id DESC LIMIT %s OFFSET %s"
+        )
+        params = [text]
+
+    params += [user.id] * owner_params + [limit, offset]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fallback_ids(kind, user, text, limit, offset):
+    target = SEARCH_TARGETS[kind]
+    words = re.findall(r'\w+', text)
+    if not words:
+        return []
+    if kind == 'tasks':
+        queryset = Todo.objects.filter(Q(user=user) | Q(assignee=user)).exclude(status='DELETED')
+    else:
+        queryset = StudyPlan.objects.filter(user=user, pending_deletion=False)
+    for word in words:
+        condition = Q()
+        for col in target['columns']:
+            condition |= Q(**{f"{col}__icontains": word})
+        queryset = queryset.filter(condition)
+    return list(queryset.order_by('-id').values_list('id', flat=True)[offset:offset + limit])
+
+
+def search(user, text, kind='tasks', page=1, per_page=20):
+    """
+    Ranked, paginated search. Returns (objects, has_next); fetching
+    per_page + 1 ids avoids a COUNT over the match set.
+    """
+    offset = (page - 1) * per_page
+    if connection.vendor in ('sqlite', 'postgresql'):
+        ids = _ranked_ids(kind, user, text, per_page + 1, offset)
+    else:
+        ids = _fallback_ids(kind, user, text, per_page + 1, offset)
+
+    has_next = len(ids) > per_page
+    ids = ids[:per_page]
+    objects = SEARCH_TARGETS[kind]['model'].objects.in_bulk(ids)
+    return [objects[pk] for pk in ids if pk in objects], has_next
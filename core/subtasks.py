@@ -0,0 +1,81 @@
+"""
+Subtask parsing and rendering.
+
+Steps live in SubTask rows with their HTML rendered once at write time, so
+the dashboard just prints them. Todo.sub_tasks keeps a newline-joined plain
+text copy for full-text search and exports.
+"""
+import ast
+import html
+import json
+import re
+
+from django.utils.html import escape, strip_tags
+
+from .models import SubTask
+
+
+BOLD_HTML = r'<strong style="color: var(--accent-color);">\1</strong>'
+ITALIC_HTML = r'<em style="color: #bdbdbd; font-style: italic;">\1</em>'
+
+
+def parse_sub_tasks(value):
+    """
+    List of step strings from whatever sub_tasks holds: a list, the repr()
+    of a list (what createtodo_ai used to store), a JSON array, or plain
+    newline-separated text.
+    """
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        items = value
+    else:
+        text = str(value).strip()
+        items = None
+        if text.startswith('['):
+            for loader in (json.loads, ast.literal_eval):
+                try:
+                    items = loader(text)
+                    break
+                except (ValueError, SyntaxError):
+                    continue
+        if not isinstance(items, (list, tuple)):
+            items = text.splitlines()
+    steps = []
+    for item in items:
+        step = re.sub(r'^\s*(?:[-*]|\d+\.)\s+', '', str(item)).strip()
+        if step:
+            steps.append(step)
+    return steps
+
+
+def step_source(step):
+    """
+    A step as markdown-ish text. Older AI steps were stored already turned
+    into <strong>/<em> HTML; those tags go back to **/* markers.
+    """
+    step = re.sub(r'<strong[^>]*>(.*?)</strong>', r'**\1**', step)
+    step = re.sub(r'<em[^>]*>(.*?)</em>', r'*\1*', step)
+    return html.unescape(strip_tags(step)).strip()
+
+
+def render_html(source):
+    """**bold** and *italic*/_italic_ to the dashboard's inline styles; everything else escaped."""
+    rendered = escape(source)
+    rendered = re.sub(r'\*\*(.+?)\*\*', BOLD_HTML, rendered)
+    rendered = re.sub(r'(?<!\w)[*_]([^*_]+)[*_](?!\w)', ITALIC_HTML, rendered)
+    return rendered
+
+
+def build_subtasks(task, steps, model=SubTask):
+    """Unsaved SubTask rows for `task`, numbered in order (`model` lets migrations pass theirs)."""
+    rows = []
+    for index, step in enumerate(steps):
+        source = step_source(step)
+        rows.append(model(task=task, position=index, text=source, html=render_html(source)))
+    return rows
+
+
+def search_text(steps):
+    """The plain-text copy stored in Todo.sub_tasks."""
+    return '\n'.join(step_source(step) for step in steps) or None
@@ -0,0 +1,117 @@
+"""
+Picking and activating a user's next task.
+
+A user works on at most one ACTIVE task: a partial unique index on
+COALESCE(assignee, user) WHERE status = 'ACTIVE' enforces it (the assignee
+is the one working on a team task). Activating a task is therefore a swap
+inside one transaction: demote whatever is active, then promote the new one.
+
+The mood picker ranks the whole INBOX in one query instead of filtering,
+falling back and re-querying. The score favours, in this order, a
+difficulty matching the mood, priority, deadline urgency, being scheduled
+for today and being a quick win; snoozed tasks aren't candidates. The
+partial INBOX indexes keep the scan to the user's open tasks however much
+history the account has.
+"""
+import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, ExpressionWrapper, F, IntegerField, Q, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .conditional import bump_page_version
+from .models import Todo
+
+
+# The mood match outweighs everything else combined, so a matching task
+# always wins and the rest of the inbox is only the fallback.
+MOOD_MATCH_SCORE = 1000
+PRIORITY_SCORE = 100           # per priority point (1-3)
+OVERDUE_SCORE = 250            # deadline today or already passed
+DUE_SOON_SCORE = 150           # deadline within DUE_SOON_DAYS
+DUE_THIS_WEEK_SCORE = 50
+DUE_SOON_DAYS = 2
+SCHEDULED_TODAY_SCORE = 100    # scheduled for today or earlier
+QUICK_WIN_SCORE = 20
+QUICK_WIN_MINUTES = 25
+
+
+def active_owner(task):
+    """The user whose single ACTIVE slot `task` occupies (a Todo or a values() row)."""
+    if isinstance(task, dict):
+        return task['assignee_id'] or task['user_id']
+    return task.assignee_id or task.user_id
+
+
+def active_tasks(owner_id):
+    # Same expression and condition as the unique index, so it serves this lookup.
+    return Todo.objects.alias(active_owner=Coalesce('assignee', 'user')).filter(
+        active_owner=owner_id, status='ACTIVE',
+    )
+
+
+def demote_active(owner_id, keep=None, now=None):
+    """
+    Sends the owner's ACTIVE task (other than `keep`) back to the inbox.
+    Call inside the transaction that activates the replacement.
+    """
+    now = now or timezone.now()
+    demoted = active_tasks(owner_id).exclude(id=keep).update(
+        status='INBOX', last_updated=now, version=F('version') + 1,
+    )
+    if demoted:
+        # update() skips the page-version signals.
+        transaction.on_commit(lambda: bump_page_version(owner_id))
+    return demoted
+
+
+def ranked_candidates(user, difficulty, now=None):
+    """The user's INBOX tasks, best next task first, with the score annotated."""
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    score = (
+        Case(When(difficulty=difficulty, then=Value(MOOD_MATCH_SCORE)), default=Value(0))
+        + F('priority') * PRIORITY_SCORE
+        + Case(
+            When(deadline__lte=today, then=Value(OVERDUE_SCORE)),
+            When(deadline__lte=today + datetime.timedelta(days=DUE_SOON_DAYS), then=Value(DUE_SOON_SCORE)),
+            When(deadline__lte=today + datetime.timedelta(days=7), then=Value(DUE_THIS_WEEK_SCORE)),
+            default=Value(0),
+        )
+        + Case(When(scheduled_date__lte=today, then=Value(SCHEDULED_TODAY_SCORE)), default=Value(0))
+        + Case(When(time_estimate_minutes__lte=QUICK_WIN_MINUTES, then=Value(QUICK_WIN_SCORE)), default=Value(0))
+    )
+    return (
+        Todo.objects.filter(Q(assignee=user) | Q(user=user, team=None), status='INBOX')
+        .exclude(snoozed_until__gt=now)
+        .annotate(score=ExpressionWrapper(score, output_field=IntegerField()))
+        .order_by('-score', F('deadline').asc(nulls_last=True), 'created', 'id')
+    )
+
+
+def activate_next(user, difficulty):
+    """
+    Activates the best INBOX task for the mood and returns it as a dict
+    (id, title, user_id, assignee_id), or None when there is nothing to
+    activate or a concurrent swap got there first. The previously active
+    task, if any, goes back to the inbox in the same transaction.
+    """
+    now = timezone.now()
+    task = ranked_candidates(user, difficulty, now).values('id', 'title', 'user_id', 'assignee_id').first()
+    if task is None:
+        return None
+    try:
+        with transaction.atomic():
+            demote_active(active_owner(task), keep=task['id'], now=now)
+            # status='INBOX' again: the row may have moved since it was ranked.
+            if not Todo.objects.filter(id=task['id'], status='INBOX').update(
+                status='ACTIVE', last_updated=now, version=F('version') + 1,
+            ):
+                transaction.set_rollback(True)
+                return None
+    except IntegrityError:
+        # Another request activated a task for this user between our two UPDATEs.
+        return None
+    bump_page_version(task['user_id'], task['assignee_id'])
+    return task
@@ -0,0 +1,137 @@
+"""
+"Changes since" sync for client-side caches.
+
+A client starts with no cursor and pages through its tasks, study plans and
+profile; every response carries an opaque cursor, and sending it back returns
+only rows changed after it. Each model is paged by keyset on
+(last_updated, id), which the (user, last_updated) indexes serve directly, so
+a poll costs a few index range scans however big the account is.
+
+Deletes arrive as tombstones: tasks the user deletes stay behind with
+status='DELETED', and rows removed outright (plans, cascades) leave a
+SyncTombstone. Both are only kept for SYNC_HISTORY_DAYS; an older cursor is
+answered with reset=True and a fresh full sync. Plans marked
+pending_deletion are sent as deleted before the job removes them.
+"""
+import base64
+import datetime
+import json
+
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .export import PLAN_FIELDS, PROFILE_FIELDS, TASK_FIELDS
+from .models import Profile, StudyPlan, SyncTombstone, Todo
+
+
+SYNC_PAGE_SIZE = 500
+SYNC_HISTORY_DAYS = 30
+# last_updated is stamped before commit, so a slow transaction can land
+# "in the past". Cursors never move past now - SYNC_SETTLE; clients upsert
+# by id, so the few rows sent twice are harmless.
+SYNC_SETTLE = datetime.timedelta(seconds=5)
+
+SYNC_TASK_FIELDS = TASK_FIELDS + ['version']
+SYNC_PLAN_FIELDS = PLAN_FIELDS + ['last_updated']
+SYNC_PROFILE_FIELDS = PROFILE_FIELDS + ['last_updated']
+
+
+def encode_cursor(state):
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Raises ValueError for anything that isn't a cursor we issued."""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        issued = parse_datetime(state['issued'])
+    except (TypeError, KeyError, ValueError, UnicodeDecodeError):
+        raise ValueError("invalid sync cursor")
+    if issued is None:
+        raise ValueError("invalid sync cursor")
+    return state
+
+
+def _page(queryset, fields, key, limit, settled):
+    """
+    One keyset page ordered by (last_updated, id). Returns (rows, next key,
+    has_more); the key is [iso timestamp, id] or None before the first row.
+    """
+    if key:
+        since = parse_datetime(key[0])
+        queryset = queryset.filter(Q(last_updated__gt=since) | Q(last_updated=since, id__gt=key[1]))
+    rows = list(queryset.order_by('last_updated', 'id').values(*fields)[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if rows:
+        key = [rows[-1]['last_updated'].isoformat(), rows[-1]['id']]
+    if not has_more and (key is None or parse_datetime(key[0]) > settled):
+        key = [settled.isoformat(), 0]
+    return rows, key, has_more
+
+
+def changes_since(user, cursor=None, limit=SYNC_PAGE_SIZE):
+    """
+    Returns the sync payload for `user` after `cursor` (None for a full
+    sync). Raises ValueError for a malformed cursor.
+    """
+    now = timezone.now()
+    settled = now - SYNC_SETTLE
+    state = decode_cursor(cursor) if cursor else {}
+    reset = bool(state) and parse_datetime(state['issued']) < now - datetime.timedelta(days=SYNC_HISTORY_DAYS)
+    if reset:
+        state = {}
+    full = not state
+
+    tasks = Todo.objects.filter(Q(user=user) | Q(assignee=user))
+    if full:
+        tasks = tasks.exclude(status='DELETED')
+    task_rows, task_key, tasks_more = _page(tasks, SYNC_TASK_FIELDS, state.get('tasks'), limit, settled)
+    plans = StudyPlan.objects.filter(user=user)
+    if full:
+        plans = plans.exclude(pending_deletion=True)
+    plan_rows, plan_key, plans_more = _page(
+        plans, SYNC_PLAN_FIELDS + ['pending_deletion'], state.get('plans'), limit, settled,
+    )
+
+    profile = Profile.objects.filter(user=user).values(*SYNC_PROFILE_FIELDS).first()
+    profile_key = state.get('profile')
+    if profile and profile_key and profile['last_updated'] <= parse_datetime(profile_key):
+        profile = None
+    elif profile:
+        profile_key = min(profile['last_updated'], settled).isoformat()
+
+    deleted = {'task': [], 'study_plan': []}
+    tombstones = SyncTombstone.objects.filter(user=user)
+    if full:
+        tombstone_key = tombstones.aggregate(latest=Max('id'))['latest'] or 0
+        tombstones_more = False
+    else:
+        tombstone_key = state.get('tombstones', 0)
+        rows = list(tombstones.filter(id__gt=tombstone_key).order_by('id').values_list('id', 'model', 'object_id')[:limit + 1])
+        tombstones_more = len(rows) > limit
+        for tombstone_id, model, object_id in rows[:limit]:
+            deleted[model].append(object_id)
+            tombstone_key = tombstone_id
+
+    deleted['task'] += [row['id'] for row in task_rows if row['status'] == 'DELETED']
+    pending_plans = {row['id'] for row in plan_rows if row.pop('pending_deletion')}
+    deleted['study_plan'] += sorted(pending_plans)
+    return {
+        'cursor': encode_cursor({
+            'issued': now.isoformat(),
+            'tasks': task_key,
+            'plans': plan_key,
+            'profile': profile_key,
+            'tombstones': tombstone_key,
+        }),
+        'has_more': tasks_more or plans_more or tombstones_more,
+        'reset': reset,
+        'full': full,
+        'tasks': [row for row in task_rows if row['status'] != 'DELETED'],
+        'deleted_tasks': deleted['task'],
+        'plans': [row for row in plan_rows if row['id'] not in pending_plans],
+        'deleted_plans': deleted['study_plan'],
+        'profile': profile,
+    }
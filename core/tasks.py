@@ -1,51 +1,209 @@
 # core/tasks.py
+import os
+from datetime import timedelta
+from itertools import groupby
+
 from background_task import background
-from django.core.mail import send_mail
 from django.utils import timezone
-from django.db.models import Q
-from django.conf import settings
-from django.contrib.auth.models import User
-from .models import Todo, Profile
+from django.db import transaction
+from django.db.models import F
+from .ai_service import get_task_metadata_batch_with_ai
+from .models import DataExport, EmailOutbox, ScheduledReminder, Todo
+from .email_service import send_email_batch
+from . import export, focus, forecast, importer, plans, retention, timer_state
+
+REMINDER_BATCH_SIZE = 200
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_MAX_ATTEMPTS = 5
+# Claimed rows are pushed this far ahead so a crashed worker's batch is retried later.
+OUTBOX_LEASE = timedelta(minutes=2)
+# Imported tasks are classified this many per AI prompt.
+ENRICH_BATCH_SIZE = 25
+
+
+def _outbox_backoff(attempts):
+    return timedelta(seconds=min(30 * 2 ** (attempts - 1), 3600))
+
+
+@background(schedule=5)
+def deliver_outbox_emails():
+    now = timezone.now()
+
+    with transaction.atomic():
+        batch = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDING', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:OUTBOX_BATCH_SIZE]
+        )
+        if not batch:
+            return
+        EmailOutbox.objects.filter(id__in=[mail.id for mail in batch]).update(next_attempt_at=now + OUTBOX_LEASE)
+
+    results = send_email_batch([(mail.to_email, mail.subject, mail.text_content) for mail in batch])
+
+    sent_at = timezone.now()
+    for mail, error in zip(batch, results):
+        mail.attempts += 1
+        if error is None:
+            mail.status = 'SENT'
+            mail.sent_at = sent_at
+            mail.last_error = ''
+        else:
+            print(f" -> Outbox mail {mail.id} to {mail.to_email} failed: {error}")
+            mail.last_error = error
+            if mail.attempts >= OUTBOX_MAX_ATTEMPTS:
+                mail.status = 'FAILED'
+            else:
+                mail.next_attempt_at = sent_at + _outbox_backoff(mail.attempts)
+    EmailOutbox.objects.bulk_update(batch, ['attempts', 'status', 'sent_at', 'last_error', 'next_attempt_at'])
+
+
+@background(schedule=30)
+def flush_timer_state():
+    flushed = timer_state.flush_dirty()
+    if flushed:
+        print(f"Flushed {flushed} timer(s) to the database")
+
+
+@background(schedule=300)
+def rollup_focus_sessions():
+    rolled = focus.rollup_pending_sessions()
+    if rolled:
+        print(f"Rolled up {rolled} focus session(s)")
+
+
+@background(schedule=0)
+def generate_study_plan(plan_id):
+    # Finished chunks are stored as they arrive, so a retry only asks for the missing ones.
+    if plans.run_generation(plan_id) == 'RETRY':
+        generate_study_plan(plan_id, schedule=plans.CHUNK_RETRY_DELAY)
+
+
+@background(schedule=0)
+def refresh_forecasts():
+    refreshed = forecast.refresh_all()
+    print(f"Refreshed forecasts for {refreshed} user(s)")
+
+
+@background(schedule=0)
+def purge_expired_rows():
+    for policy, removed in retention.purge_expired().items():
+        if removed:
+            print(f"Retention {policy}: removed " + ", ".join(f"{count} {label}" for label, count in sorted(removed.items())))
+
+
+@background(schedule=0)
+def delete_task_history(user_id):
+    deleted = retention.delete_task_history(user_id)
+    print(f"Deleted {deleted} completed task(s) for user {user_id}")
+
+
+@background(schedule=0)
+def delete_study_plans(user_id):
+    plans_deleted, tasks_deleted = retention.delete_study_plans(user_id)
+    print(f"Deleted {plans_deleted} plan(s) and {tasks_deleted} task(s) for user {user_id}")
+
+
+@background(schedule=0)
+def delete_team_rows(team_id):
+    deleted = retention.delete_team(team_id)
+    print(f"Deleted team {team_id} and {deleted} task(s)")
+
+
+@background(schedule=0)
+def build_data_export(export_id):
+    data_export = DataExport.objects.select_related('user').filter(id=export_id, status='PENDING').first()
+    if data_export is None:
+        return
+
+    base_name = export.export_filename(data_export.user, data_export.export_format, data_export.model or None)
+    file_name = f"{data_export.user_id}/{data_export.id}-{base_name}.gz"
+    try:
+        export.write_gzip_export(
+            data_export.user,
+            data_export.export_format,
+            os.path.join(export.export_root(), file_name),
+            data_export.model or None,
+        )
+    except Exception as e:
+        print(f" -> Export {export_id} failed: {e}")
+        data_export.status = 'FAILED'
+    else:
+        data_export.status = 'READY'
+        data_export.file_name = file_name
+    data_export.completed_at = timezone.now()
+    data_export.save(update_fields=['status', 'file_name', 'completed_at'])
+
+
+@background(schedule=0)
+def enrich_imported_tasks(targets):
+    """`targets` is importer.enrichment_targets(): [[task id, [blank fields]], ...]."""
+    blank_fields = {task_id: fields for task_id, fields in targets}
+    task_ids = list(blank_fields)
+    for start in range(0, len(task_ids), ENRICH_BATCH_SIZE):
+        # version=0: never edited since the import, so nothing the user chose is overwritten.
+        tasks = list(
+            Todo.objects.filter(id__in=task_ids[start:start + ENRICH_BATCH_SIZE], version=0)
+            .only('id', 'title', *importer.ENRICHABLE_FIELDS)
+        )
+        if not tasks:
+            continue
+        now = timezone.now()
+        # Ek prompt mein poora batch, har task ke liye alag call nahi
+        for task, metadata in zip(tasks, get_task_metadata_batch_with_ai([task.title for task in tasks])):
+            # Only fields the file left blank; values from the file win.
+            for field in blank_fields[task.id]:
+                setattr(task, field, metadata[field])
+            # Sync clients and the page validators pick the change up like any other edit.
+            task.last_updated = now
+            task.version = F('version') + 1
+        Todo.objects.bulk_update(tasks, [*importer.ENRICHABLE_FIELDS, 'last_updated', 'version'])
+
 
 @background(schedule=60) # Ye task har 60 seconds baad queue check karega
 def daily_reminder_job():
     print("Running Daily Reminder Job...")
-    today = timezone.now().date()
-    
-    # 1. Wo saare users dhundho jinko aaj reminder NAHI mila hai
-    profiles_to_check = Profile.objects.filter(
-        Q(last_reminder_sent_date__lt=today) | Q(last_reminder_sent_date__isnull=True)
-    )
-
-    for profile in profiles_to_check:
-        user = profile.user
-        
-        # 2. Check karo: Kya aaj koi 'Pending' task hai?
-        pending_count = Todo.objects.filter(
-            user=user, 
-            status='INBOX', 
-            scheduled_date=today
-        ).count()
-
-        if pending_count > 0:
-            subject = f"🔔 Reminder: {pending_count} Tasks Waiting for You!"
-            message = (
-                f"Hi {user.username},\n\n"
-                f"You have {pending_count} unfinished tasks scheduled for today on SmartPlanner.\n"
-                f"Complete them now to maintain your productivity streak!\n\n"
-                f"Go to Dashboard: http://127.0.0.1:8000/dashboard/\n\n"
-                f"- Team SmartPlanner"
-            )
-            
-            try:
-                send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
-                print(f" -> Sent mail to {user.email}")
-                
-                # 3. Update date taaki aaj dobara mail na jaye
-                profile.last_reminder_sent_date = today
-                profile.save()
-                
-            except Exception as e:
-                print(f" -> Error sending to {user.email}: {e}")
-        else:
-            print(f" -> No pending tasks for {user.username}")
\ No newline at end of file
+    now = timezone.now()
+
+    with transaction.atomic():
+        # 1. Sirf wahi reminders uthao jinka time ho chuka hai (due_at index se)
+        due_reminders = list(
+            ScheduledReminder.objects.select_for_update(skip_locked=True)
+            .select_related('user', 'task')
+            .filter(due_at__lte=now)
+            .order_by('user_id', 'due_at')[:REMINDER_BATCH_SIZE]
+        )
+        if not due_reminders:
+            return
+
+        # 2. Queue se pop karo taaki dusra worker same reminder na bheje
+        ScheduledReminder.objects.filter(id__in=[r.id for r in due_reminders]).delete()
+
+        # 3. Mail outbox mein likho, same transaction mein: deliver_outbox_emails
+        # bhejta hai aur fail hone par retry karta hai, reminder kho nahi jaata
+        mails = []
+        for user_id, reminders in groupby(due_reminders, key=lambda r: r.user_id):
+            reminders = list(reminders)
+            user = reminders[0].user
+            if not user.email:
+                continue
+
+            lines = []
+            for reminder in reminders:
+                label = "deadline" if reminder.kind == 'DEADLINE' else "scheduled"
+                lines.append(f"- {reminder.task.title} ({label} {timezone.localdate(reminder.due_at):%d %b})")
+
+            mails.append(EmailOutbox(
+                to_email=user.email,
+                subject=f"🔔 Reminder: {len(reminders)} Tasks Waiting for You!",
+                text_content=(
+                    f"Hi {user.username},\n\n"
+                    f"You have {len(reminders)} unfinished tasks waiting on SmartPlanner:\n"
+                    + "\n".join(lines) + "\n\n"
+                    f"Complete them now to maintain your productivity streak!\n\n"
+                    f"Go to Dashboard: http://127.0.0.1:8000/dashboard/\n\n"
+                    f"- Team SmartPlanner"
+                ),
+            ))
+        EmailOutbox.objects.bulk_create(mails)
+    print(f" -> Queued {len(mails)} reminder mail(s)")
@@ -0,0 +1,15 @@
+# core/templatetags/core_tags.py
+
+from django import template
+from django.template.defaultfilters import stringfilter
+from django.utils.safestring import mark_safe
+
+from core.rendering import render_markdown
+
+register = template.Library()
+
+@register.filter()
+@stringfilter
+def markdown(value):
+    # Rendered once per distinct text, then served from core.rendering's cache
+    return mark_safe(render_markdown(value))
@@ -1,18 +1,61 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+
+import numpy as np
 from django.contrib.auth.models import User
 from django.core import mail
-from django.test import TestCase, override_settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from django.template import Context, Template
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from datetime import datetime, timedelta
 from unittest.mock import patch
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+
+from . import focus, forecast, plans, rendering, retention, scheduler
+from .rendering import parse_plan_days
+from .focus import decode_hours, decode_minutes, focus_summary
+from .models import (
+	Badge, DataExport, EmailOutbox, Profile, Team, FocusDay, FocusSession, OccurrenceOverride, OTPVerification, RecurrenceRule, ScheduledReminder,
+	StudyPlan, SubTask, SyncTombstone, Todo, UserBadge,
+)
+from .importer import import_tasks
+from .recurrence import iter_occurrences, next_occurrence, occurrences_with_status
+from .subtasks import build_subtasks, parse_sub_tasks
+from .scheduler import plan_schedule
+from .suggest import ranked_candidates
+from .sync import changes_since, encode_cursor
+from .events import publish_event
+from .tasks import (
+	build_data_export, daily_reminder_job, delete_study_plans, delete_team_rows, enrich_imported_tasks, deliver_outbox_emails,
+	flush_timer_state, generate_study_plan, rollup_focus_sessions,
+)
 
-from .models import OTPVerification, StudyPlan
+# The shared DatabaseCache adds its own queries; the query-count tests below
+# measure the app's, so they run on an in-process cache.
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
 
 
 @override_settings(
 	EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
 	DEFAULT_FROM_EMAIL='noreply@example.com',
+	EMAIL_HOST_USER='smtp-user',
+	EMAIL_HOST_PASSWORD='smtp-password',
 )
 @patch.dict('os.environ', {'BREVO_API_KEY': ''}, clear=False)
 class SignupFlowTests(TestCase):
+	def setUp(self):
+		cache.clear()
+
 	def test_signup_creates_inactive_user_and_redirects_to_verify(self):
 		response = self.client.post(
 			reverse('signup'),
@@ -27,7 +70,12 @@ class SignupFlowTests(TestCase):
 		user = User.objects.get(username='newuser')
 		self.assertFalse(user.is_active)
 		self.assertTrue(OTPVerification.objects.filter(user=user).exists())
+		self.assertEqual(len(mail.outbox), 0)
+		self.assertEqual(EmailOutbox.objects.filter(to_email='newuser@example.com').count(), 1)
+
+		deliver_outbox_emails.now()
 		self.assertEqual(len(mail.outbox), 1)
+		self.assertIn(user.otpverification.otp, mail.outbox[0].body)
 
 	def test_signup_reuses_existing_inactive_user(self):
 		user = User.objects.create_user(
@@ -58,8 +106,41 @@ class SignupFlowTests(TestCase):
 		self.assertTrue(user.check_password('NewPassword@123'))
 		self.assertNotEqual(user.password, old_password_hash)
 		self.assertNotEqual(otp.created_at, original_created_at)
+		deliver_outbox_emails.now()
 		self.assertEqual(len(mail.outbox), 1)
 
+	def test_failed_delivery_is_retried_with_backoff(self):
+		outbox_mail = EmailOutbox.objects.create(to_email='a@example.com', subject='Hi', text_content='Body')
+
+		with patch('core.tasks.send_email_batch', return_value=['Brevo API error 502: bad gateway']):
+			deliver_outbox_emails.now()
+
+		outbox_mail.refresh_from_db()
+		self.assertEqual(outbox_mail.status, 'PENDING')
+		self.assertEqual(outbox_mail.attempts, 1)
+		self.assertGreater(outbox_mail.next_attempt_at, timezone.now())
+
+		# Not due yet, so the next tick leaves it alone.
+		deliver_outbox_emails.now()
+		self.assertEqual(len(mail.outbox), 0)
+
+	@override_settings(EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='')
+	def test_signup_without_mail_config_shows_local_otp(self):
+		response = self.client.post(
+			reverse('signup'),
+			{
+				'username': 'localuser',
+				'email': 'local@example.com',
+				'password': 'Password@123',
+			},
+			HTTP_HOST='localhost',
+			follow=True,
+		)
+
+		otp = OTPVerification.objects.get(user__username='localuser')
+		self.assertContains(response, f'Use this OTP: {otp.otp}')
+		self.assertFalse(EmailOutbox.objects.exists())
+
 	def test_verify_otp_activates_user_and_clears_pending_record(self):
 		user = User.objects.create_user(
 			username='verifyuser',
@@ -109,3 +190,1508 @@ class StudyPlanViewTests(TestCase):
 
 		self.assertEqual(response.status_code, 200)
 		self.assertContains(response, '/add-day/Day%203/')
+
+	def test_regenerating_days_is_one_chunk_call_spliced_into_the_plan(self):
+		user = User.objects.create_user(username='replanner', password='Password@123')
+		self.client.login(username='replanner', password='Password@123')
+		plan = StudyPlan.objects.create(
+			user=user, subject='Physics', goal='Mechanics', duration_days=20,
+			generated_plan="Intro line\n\n" + "\n\n".join(f"## Day {day}: Old {day}\n- Task {day}" for day in range(1, 21)),
+		)
+		fresh = "## Day 12: New twelve\n- **Kinematics** drills\n\n## Day 13: New thirteen\n- Forces\n\n## Day 16: Out of range\n- Ignored"
+
+		with patch('core.plans.generate_plan_chunk', return_value=fresh) as chunk:
+			response = self.client.post(reverse('regenerate_plan_days', args=[plan.id]), {'start_day': 12, 'end_day': 14})
+
+		self.assertRedirects(response, reverse('view_study_plan', args=[plan.id]))
+		self.assertEqual(chunk.call_count, 1)
+		self.assertEqual(chunk.call_args.args[3:], (12, 14))
+		context = chunk.call_args.kwargs['context']
+		self.assertIn('Old 11', context)
+		self.assertIn('Old 15', context)
+		self.assertNotIn('Old 12', context)
+
+		plan.refresh_from_db()
+		days = [day['title'] for day in parse_plan_days(plan.generated_plan)]
+		self.assertEqual(days[10:15], ['Old 11', 'New twelve', 'New thirteen', 'Focused Progress', 'Old 15'])
+		self.assertEqual(len(days), 20)
+		self.assertTrue(plan.generated_plan.startswith('Intro line\n\n## Day 1: Old 1'))
+		self.assertIn('<strong style="color: var(--accent-color);">Kinematics</strong>', plan.generated_plan)
+
+		with patch('core.plans.generate_plan_chunk') as chunk:
+			self.client.post(reverse('regenerate_plan_days', args=[plan.id]), {'start_day': 1, 'end_day': 9})
+			self.client.post(reverse('regenerate_plan_days', args=[plan.id]), {'start_day': 19, 'end_day': 21})
+		chunk.assert_not_called()
+
+	def test_plan_is_generated_in_the_background_and_resumes_missing_chunks(self):
+		user = User.objects.create_user(username='bgplanner', password='Password@123')
+		self.client.login(username='bgplanner', password='Password@123')
+
+		current = StudyPlan.objects.create(user=user, subject='Biology', goal='Cells', generated_plan='', is_active=True)
+		response = self.client.post(reverse('create_study_plan'), {'subject': 'Chemistry', 'goal': 'Organic', 'duration_days': 12})
+		plan = StudyPlan.objects.get(user=user, subject='Chemistry')
+		self.assertFalse(plan.is_active)
+		current.refresh_from_db()
+		self.assertTrue(current.is_active)
+		self.assertRedirects(response, reverse('view_study_plan', args=[plan.id]))
+		self.assertEqual(plan.generation_status, 'PENDING')
+		self.assertEqual(list(plan.chunks.values_list('start_day', 'end_day')), [(1, 5), (6, 10), (11, 12)])
+		self.assertContains(self.client.get(reverse('view_study_plan', args=[plan.id])), 'being generated')
+
+		def days(start, end):
+			return "\n\n".join(f"## Day {day}: Topic {day}\n- Study {day}" for day in range(start, end + 1))
+
+		with patch('core.plans.generate_plan_chunk', side_effect=[days(1, 5), '']) as chunk:
+			generate_study_plan.now(plan.id)
+		self.assertEqual(chunk.call_count, 2)
+		progress = self.client.get(reverse('study_plan_progress', args=[plan.id])).json()
+		self.assertEqual(progress, {'status': 'RUNNING', 'chunks_done': 1, 'chunks_total': 3, 'days_ready': 5, 'duration_days': 12})
+
+		# The retry only asks for the chunks that are still missing.
+		with patch('core.plans.generate_plan_chunk', side_effect=[days(6, 10), days(11, 12)]) as chunk:
+			generate_study_plan.now(plan.id)
+		self.assertEqual([call.args[3:] for call in chunk.call_args_list], [(6, 10), (11, 12)])
+
+		plan.refresh_from_db()
+		self.assertEqual(plan.generation_status, 'READY')
+		self.assertTrue(plan.is_active)
+		current.refresh_from_db()
+		self.assertFalse(current.is_active)
+		self.assertFalse(plan.chunks.exists())
+		self.assertEqual([day['title'] for day in parse_plan_days(plan.generated_plan)], [f'Topic {day}' for day in range(1, 13)])
+		self.assertEqual(self.client.get(reverse('study_plan_progress', args=[plan.id])).json()['days_ready'], 12)
+
+		blocked = plans.start_generation(user, 'Chemistry', 'Organic', 3)
+		with patch('core.plans.generate_plan_chunk', return_value='## Day 1: Topic\n- Study'), \
+				patch('core.plans.contains_blocked_content', return_value=True):
+			self.assertEqual(plans.run_generation(blocked.id), 'FAILED')
+		blocked.refresh_from_db()
+		self.assertFalse(blocked.is_active)
+		self.assertEqual(StudyPlan.objects.get(is_active=True).id, plan.id)
+
+	def test_scheduling_a_whole_plan_is_one_insert_and_idempotent(self):
+		user = User.objects.create_user(username='calplanner', password='Password@123')
+		self.client.login(username='calplanner', password='Password@123')
+		plan = StudyPlan.objects.create(
+			user=user, subject='Art', goal='Sketching', duration_days=4,
+			generated_plan=(
+				"## Day 1: Lines\n- <strong style=\"color: var(--accent-color);\">Contours</strong>: draw 10 &amp; shade\n- Hatching\n\n"
+				"## Day 2: Shapes\n- Cubes\n\n## Day 3: Light\nLook at shadows today\n\n## Day 4: Review\n- Redo day one"
+			),
+		)
+		# 2026-10-23 is a Friday, so Day 2 moves over the weekend.
+		with CaptureQueriesContext(connection) as queries:
+			response = self.client.post(reverse('schedule_study_plan', args=[plan.id]), {'start_date': '2026-10-23', 'skip_weekends': 'on'})
+		self.assertEqual(sum(query['sql'].startswith('INSERT INTO "core_todo"') for query in queries.captured_queries), 1)
+		self.assertRedirects(response, reverse('view_study_plan', args=[plan.id]))
+
+		tasks = list(plan.tasks.order_by('plan_day', 'id').values_list('plan_day', 'scheduled_date', 'title'))
+		self.assertEqual(tasks, [
+			(1, datetime(2026, 10, 23).date(), 'Contours: draw 10 & shade'),
+			(1, datetime(2026, 10, 23).date(), 'Hatching'),
+			(2, datetime(2026, 10, 26).date(), 'Cubes'),
+			(3, datetime(2026, 10, 27).date(), 'Look at shadows today'),
+			(4, datetime(2026, 10, 28).date(), 'Redo day one'),
+		])
+		self.assertEqual(ScheduledReminder.objects.filter(task__study_plan=plan, kind='SCHEDULED').count(), 5)
+
+		self.client.post(reverse('schedule_study_plan', args=[plan.id]), {'start_date': '2026-11-02'})
+		self.client.post(reverse('add_plan_day_tasks', args=[plan.id, 'Day 2']), {'manual_scheduled_date': '2026-11-02'})
+		self.assertEqual(plan.tasks.count(), 5)
+
+		cube = plan.tasks.get(plan_day=2)
+		self.client.post(reverse('delete_task', args=[cube.id]))
+		self.client.post(reverse('add_plan_day_tasks', args=[plan.id, 'Day 2']), {'manual_scheduled_date': '2026-11-02'})
+		self.assertEqual(
+			list(plan.tasks.filter(plan_day=2).order_by('id').values_list('status', 'scheduled_date')),
+			[('DELETED', datetime(2026, 10, 26).date()), ('INBOX', datetime(2026, 11, 2).date())],
+		)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+@patch.dict('os.environ', {'BREVO_API_KEY': ''}, clear=False)
+class ReminderQueueTests(TestCase):
+	def setUp(self):
+		self.user = User.objects.create_user(
+			username='reminduser',
+			email='remind@example.com',
+			password='Password@123',
+		)
+
+	def test_scheduling_and_rescheduling_keeps_one_queue_entry(self):
+		today = timezone.localdate()
+		task = Todo.objects.create(user=self.user, title='Write report', scheduled_date=today)
+		self.assertEqual(ScheduledReminder.objects.filter(task=task).count(), 1)
+
+		task.scheduled_date = today + timedelta(days=2)
+		task.deadline = today + timedelta(days=3)
+		task.save()
+
+		reminders = dict(ScheduledReminder.objects.filter(task=task).values_list('kind', 'due_at'))
+		self.assertEqual(set(reminders), {'SCHEDULED', 'DEADLINE'})
+		self.assertEqual(timezone.localdate(reminders['SCHEDULED']), today + timedelta(days=2))
+
+		task.status = 'COMPLETED'
+		task.save(update_fields=['status'])
+		self.assertFalse(ScheduledReminder.objects.filter(task=task).exists())
+
+	def test_job_sends_only_due_reminders_and_pops_them(self):
+		today = timezone.localdate()
+		due = Todo.objects.create(user=self.user, title='Due task', scheduled_date=today)
+		ScheduledReminder.objects.filter(task=due).update(due_at=timezone.now() - timedelta(minutes=5))
+		later = Todo.objects.create(user=self.user, title='Later task', scheduled_date=today + timedelta(days=5))
+
+		# One indexed SELECT, one DELETE and one outbox INSERT (plus the savepoint pair), whatever the user count.
+		with self.assertNumQueries(5):
+			daily_reminder_job.now()
+
+		self.assertEqual(len(mail.outbox), 0)
+		self.assertFalse(ScheduledReminder.objects.filter(task=due).exists())
+		self.assertTrue(ScheduledReminder.objects.filter(task=later).exists())
+
+		# The outbox delivers it, with its retries if the provider is down.
+		deliver_outbox_emails.now()
+		self.assertEqual(len(mail.outbox), 1)
+		self.assertIn('Due task', mail.outbox[0].body)
+		self.assertEqual(EmailOutbox.objects.get().status, 'SENT')
+
+	def test_edits_to_an_overdue_task_do_not_requeue_its_reminder(self):
+		today = timezone.localdate()
+		overdue = Todo.objects.create(user=self.user, title='Overdue', scheduled_date=today - timedelta(days=10))
+		self.assertFalse(ScheduledReminder.objects.filter(task=overdue).exists())
+
+		sent = Todo.objects.create(user=self.user, title='Today', scheduled_date=today)
+		ScheduledReminder.objects.filter(task=sent).delete()  # popped by the job
+		sent = Todo.objects.get(id=sent.id)
+		for title in ('Today (v2)', 'Today (v3)'):
+			sent.title = title
+			sent.save()
+		sent.status = 'ACTIVE'
+		sent.save()
+		self.assertFalse(ScheduledReminder.objects.filter(task=sent).exists())
+
+		# A real change to the date still queues a new reminder.
+		sent.scheduled_date = today + timedelta(days=1)
+		sent.save()
+		self.assertTrue(ScheduledReminder.objects.filter(task=sent).exists())
+
+
+@override_settings(
+	DEFAULT_FROM_EMAIL='noreply@example.com',
+	EMAIL_HOST_USER='smtp-user',
+	EMAIL_HOST_PASSWORD='smtp-password',
+	THROTTLE_RATES={
+		'signup': (2, 600),
+		'resend_otp': (2, 300),
+		'forgot_password': (2, 300),
+		'verify_otp': (3, 300),
+	},
+)
+@override_settings(CACHES=LOCMEM_CACHES)
+@patch.dict('os.environ', {'BREVO_API_KEY': ''}, clear=False)
+class ThrottleTests(TestCase):
+	def setUp(self):
+		cache.clear()
+
+	def _signup(self, n):
+		return self.client.post(
+			reverse('signup'),
+			{'username': f'spammer{n}', 'email': f'spam{n}@example.com', 'password': 'Password@123'},
+		)
+
+	def test_signup_throttled_per_ip_without_touching_database(self):
+		self._signup(1)
+		self._signup(2)
+
+		with self.assertNumQueries(0):
+			response = self._signup(3)
+
+		self.assertRedirects(response, reverse('signup'), fetch_redirect_response=False)
+		self.assertFalse(User.objects.filter(username='spammer3').exists())
+
+	def test_resend_loop_stops_writing_otps_and_mail(self):
+		user = User.objects.create_user(username='looper', email='loop@example.com', password='Password@123')
+		user.is_active = False
+		user.save(update_fields=['is_active'])
+		session = self.client.session
+		session['verify_user_id'] = user.id
+		session.save()
+
+		for _ in range(5):
+			self.client.post(reverse('resend_otp'))
+
+		self.assertEqual(EmailOutbox.objects.filter(to_email='loop@example.com').count(), 2)
+
+	def test_forgot_password_throttled_per_identity_across_ips(self):
+		User.objects.create_user(username='victim', email='victim@example.com', password='Password@123')
+
+		for n in range(4):
+			self.client.post(
+				reverse('forgot_password'),
+				{'identifier': 'victim@example.com'},
+				REMOTE_ADDR=f'10.0.0.{n}',
+			)
+
+		self.assertEqual(EmailOutbox.objects.filter(to_email='victim@example.com').count(), 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TaskEventTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_user(username='tabuser', email='tab@example.com', password='Password@123')
+		self.client.login(username='tabuser', password='Password@123')
+		self.task = Todo.objects.create(user=self.user, title='Focus', status='ACTIVE')
+
+	def test_timer_change_reaches_other_tabs_without_todo_queries(self):
+		cursor = self.client.get(reverse('event_poll')).json()['cursor']
+		self.client.post(reverse('start_task_timer', args=[self.task.id]))
+
+		# Session + user lookup only; events come from the cache.
+		with self.assertNumQueries(2):
+			data = self.client.get(reverse('event_poll'), {'cursor': cursor}).json()
+
+		self.assertEqual(len(data['events']), 1)
+		event = data['events'][0]
+		self.assertEqual(event['type'], 'timer')
+		self.assertEqual(event['data'], {'task_id': self.task.id, 'seconds': 25 * 60, 'running': True})
+
+	def test_stream_url_under_wsgi_tells_client_to_fall_back(self):
+		response = self.client.get(reverse('event_stream'))
+		self.assertEqual(response.status_code, 204)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TimerStateTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_user(username='pomodoro', password='Password@123')
+		self.client.login(username='pomodoro', password='Password@123')
+		self.task = Todo.objects.create(user=self.user, title='Deep work', status='ACTIVE', time_estimate_minutes=30)
+
+	def test_interactions_make_one_small_write_and_status_reads_cache(self):
+		self.client.post(reverse('start_task_timer', args=[self.task.id]))
+
+		# Session + user + one two-column UPDATE (in a savepoint it shares with
+		# the focus ledger INSERT, skipped here because no time elapsed).
+		with self.assertNumQueries(5):
+			self.client.post(reverse('pause_task_timer', args=[self.task.id]))
+
+		with self.assertNumQueries(2):
+			data = self.client.get(reverse('task_timer_status', args=[self.task.id])).json()
+		self.assertEqual(data, {'status': 'ok', 'seconds': 30 * 60, 'running': False})
+
+		self.task.refresh_from_db()
+		self.assertEqual(self.task.timer_seconds_remaining, 30 * 60)
+		self.assertIsNone(self.task.timer_start_time)
+
+	def test_busy_lock_is_neither_skipped_nor_released(self):
+		self.client.post(reverse('start_task_timer', args=[self.task.id]))
+		lock_key = f'timer:lock:{self.task.id}'
+		cache.set(lock_key, 'other-request', timeout=60)
+
+		with patch('core.timer_state.LOCK_TIMEOUT', 0.05):
+			response = self.client.post(reverse('pause_task_timer', args=[self.task.id]))
+		self.assertEqual(response.status_code, 400)
+		self.assertEqual(cache.get(lock_key), 'other-request')
+		self.task.refresh_from_db()
+		self.assertIsNotNone(self.task.timer_start_time)
+
+	@override_settings(TIMER_WRITE_BEHIND=True)
+	def test_add_time_is_buffered_until_flush(self):
+		self.client.post(reverse('start_task_timer', args=[self.task.id]))
+		self.client.post(reverse('pause_task_timer', args=[self.task.id]))
+
+		with self.assertNumQueries(2):
+			self.client.post(reverse('add_time_to_timer', args=[self.task.id]))
+		self.task.refresh_from_db()
+		self.assertEqual(self.task.timer_seconds_remaining, 30 * 60)
+
+		flush_timer_state.now()
+		self.task.refresh_from_db()
+		self.assertEqual(self.task.timer_seconds_remaining, 35 * 60)
+
+	def test_state_is_rebuilt_from_row_after_cache_loss(self):
+		self.client.post(reverse('start_task_timer', args=[self.task.id]))
+		self.client.post(reverse('edit_task_timer', args=[self.task.id]), {'minutes': '10'})
+		cache.clear()
+
+		data = self.client.get(reverse('task_timer_status', args=[self.task.id])).json()
+		self.assertTrue(data['running'])
+		self.assertLessEqual(data['seconds'], 10 * 60)
+		self.assertGreater(data['seconds'], 10 * 60 - 5)
+
+	def test_other_users_cannot_touch_timer(self):
+		User.objects.create_user(username='intruder', password='Password@123')
+		self.client.login(username='intruder', password='Password@123')
+		response = self.client.post(reverse('start_task_timer', args=[self.task.id]))
+		self.assertEqual(response.status_code, 404)
+
+
+class FocusLedgerTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_user(username='focused', password='Password@123')
+		self.client.login(username='focused', password='Password@123')
+
+	def test_pause_appends_session_for_elapsed_time(self):
+		task = Todo.objects.create(user=self.user, title='Read', status='ACTIVE')
+		self.client.post(reverse('start_task_timer', args=[task.id]))
+
+		# Pretend the timer has been running for ten minutes.
+		state = cache.get(f'timer:{task.id}')
+		state['started_at'] -= 600
+		state['session_started_at'] -= 600
+		cache.set(f'timer:{task.id}', state)
+
+		self.client.post(reverse('pause_task_timer', args=[task.id]))
+
+		session = FocusSession.objects.get(task=task)
+		self.assertAlmostEqual(session.seconds, 600, delta=2)
+
+	def test_rollup_compacts_sessions_into_day_arrays(self):
+		day = timezone.localdate() - timedelta(days=1)
+		start = timezone.make_aware(datetime.combine(day, datetime.min.time())) + timedelta(hours=9, minutes=30)
+		FocusSession.objects.create(
+			user=self.user, started_at=start, ended_at=start + timedelta(hours=1), seconds=3600,
+		)
+		FocusSession.objects.create(
+			user=self.user, started_at=start + timedelta(hours=3), ended_at=start + timedelta(hours=3, minutes=20), seconds=1200,
+		)
+
+		rollup_focus_sessions.now()
+
+		row = FocusDay.objects.get(user=self.user, day=day)
+		hours = decode_hours(row.hour_seconds)
+		self.assertEqual(hours[9], 1800)
+		self.assertEqual(hours[10], 1800)
+		self.assertEqual(hours[12], 1200)
+		self.assertEqual(row.total_seconds, 4800)
+		self.assertEqual(int(decode_minutes(row.minute_bitmap).sum()), 80)
+		self.assertFalse(FocusSession.objects.filter(rolled_up=False).exists())
+
+		summary = focus_summary(self.user)
+		self.assertEqual(summary['longest_block_minutes'], 60)
+		self.assertEqual(summary['active_days'], 1)
+		self.assertEqual(summary['hourly_minutes'][12], 20)
+
+		response = self.client.get(reverse('profile'))
+		self.assertContains(response, 'Longest block')
+
+
+class RecurrenceTests(TestCase):
+	def setUp(self):
+		self.user = User.objects.create_user(username='repeater', password='Password@123')
+		self.client.login(username='repeater', password='Password@123')
+
+	def test_skip_ahead_matches_expansion_from_dtstart(self):
+		start = datetime(2024, 1, 3).date()
+		rules = [
+			RecurrenceRule(freq='DAILY', interval=3, dtstart=start, count=200),
+			RecurrenceRule(freq='WEEKLY', interval=2, weekdays='MO,WE,FR', dtstart=start, count=90),
+			RecurrenceRule(freq='MONTHLY', month_day=31, dtstart=start, count=20),
+			RecurrenceRule(freq='YEARLY', dtstart=datetime(2024, 2, 29).date(), until=datetime(2040, 1, 1).date()),
+		]
+		window_start, window_end = datetime(2025, 6, 10).date(), datetime(2026, 6, 10).date()
+		for rule in rules:
+			full = [day for day in iter_occurrences(rule, start, window_end) if day >= window_start]
+			self.assertEqual(list(iter_occurrences(rule, window_start, window_end)), full, rule.to_rrule())
+
+	def test_windowed_count_skips_a_first_period_before_dtstart(self):
+		rules = [
+			(RecurrenceRule(freq='MONTHLY', month_day=5, dtstart=datetime(2026, 1, 20).date(), count=2), datetime(2026, 3, 1).date()),
+			(RecurrenceRule(freq='YEARLY', month_day=1, dtstart=datetime(2021, 10, 22).date(), count=3), datetime(2024, 1, 1).date()),
+			(RecurrenceRule(freq='MONTHLY', month_day=-20, dtstart=datetime(2026, 1, 20).date(), count=2), datetime(2026, 3, 1).date()),
+			(RecurrenceRule(freq='MONTHLY', month_day=30, dtstart=datetime(2026, 1, 31).date(), count=2), datetime(2026, 4, 1).date()),
+		]
+		for rule, window_start in rules:
+			window_end = datetime(2030, 1, 1).date()
+			full = list(iter_occurrences(rule, rule.dtstart, window_end))
+			self.assertEqual(len(full), rule.count, rule.to_rrule())
+			self.assertEqual(list(iter_occurrences(rule, window_start, window_end)), [day for day in full if day >= window_start], rule.to_rrule())
+		self.assertEqual(next_occurrence(rules[0][0], datetime(2026, 2, 10).date()), datetime(2026, 3, 5).date())
+
+		rule = RecurrenceRule(freq='MONTHLY', month_day=40, dtstart=datetime(2026, 1, 1).date())
+		self.assertEqual(list(iter_occurrences(rule, rule.dtstart, datetime.max.date())), [])
+
+	def test_monthly_rules_skip_missing_days_and_count_from_month_end(self):
+		rule = RecurrenceRule(freq='MONTHLY', month_day=31, dtstart=datetime(2025, 1, 31).date())
+		days = list(iter_occurrences(rule, rule.dtstart, datetime(2025, 5, 31).date()))
+		self.assertEqual([day.month for day in days], [1, 3, 5])
+
+		rule = RecurrenceRule(freq='MONTHLY', month_day=-1, dtstart=datetime(2025, 1, 1).date(), count=3)
+		days = list(iter_occurrences(rule, rule.dtstart, datetime(2026, 1, 1).date()))
+		self.assertEqual([(day.month, day.day) for day in days], [(1, 31), (2, 28), (3, 31)])
+
+	def test_year_of_occurrences_for_many_rules_without_queries(self):
+		dtstart = datetime(2020, 1, 1).date()
+		rules = [RecurrenceRule(freq='WEEKLY', weekdays='MO,TU,WE,TH,FR', dtstart=dtstart) for _ in range(2000)]
+		window_start = datetime(2026, 1, 1).date()
+		with self.assertNumQueries(0):
+			total = sum(1 for rule in rules for _ in iter_occurrences(rule, window_start, window_start + timedelta(days=364)))
+		self.assertEqual(total, 2000 * 261)
+
+	def test_completing_recurring_task_records_override_and_moves_forward(self):
+		monday = timezone.localdate() - timedelta(days=timezone.localdate().weekday())
+		self.client.post(reverse('add_task_manual'), {
+			'title': 'Standup notes', 'priority': 2, 'scheduled_date': monday.isoformat(), 'recurring_type': 'WEEKDAYS',
+		})
+		task = Todo.objects.get(title='Standup notes')
+		self.assertEqual(task.recurrence.to_rrule(), 'FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR')
+
+		self.client.post(reverse('complete_task', args=[task.id]))
+		task.refresh_from_db()
+		self.assertEqual(task.status, 'INBOX')
+		self.assertEqual(task.scheduled_date, monday + timedelta(days=1))
+		override = OccurrenceOverride.objects.get(task=task)
+		self.assertEqual((override.date, override.status), (monday, 'COMPLETED'))
+
+		statuses = dict(occurrences_with_status(
+			task.recurrence, monday, monday + timedelta(days=6), {monday: 'COMPLETED'}, today=monday + timedelta(days=2),
+		))
+		self.assertEqual(list(statuses.values()), ['COMPLETED', 'MISSED', 'PENDING', 'PENDING', 'PENDING'])
+
+	def test_series_with_count_ends_as_completed(self):
+		task = Todo.objects.create(
+			user=self.user, title='Twice', is_recurring=True, recurring_type='DAILY',
+			scheduled_date=timezone.localdate(),
+		)
+		RecurrenceRule.objects.create(task=task, freq='DAILY', dtstart=timezone.localdate(), count=2)
+
+		self.client.post(reverse('complete_task', args=[task.id]))
+		self.client.post(reverse('complete_task', args=[task.id]))
+
+		task.refresh_from_db()
+		self.assertEqual(task.status, 'COMPLETED')
+		self.assertEqual(OccurrenceOverride.objects.filter(task=task).count(), 2)
+
+
+class AgendaTests(TestCase):
+	def setUp(self):
+		self.user = User.objects.create_user(username='planner', password='Password@123')
+		self.client.login(username='planner', password='Password@123')
+		self.monday = datetime(2026, 3, 2).date()
+
+	def test_week_agenda_merges_tasks_recurrences_and_plan_days(self):
+		Todo.objects.create(user=self.user, title='Dentist', scheduled_date=self.monday + timedelta(days=2))
+		Todo.objects.create(user=self.user, title='Report', deadline=self.monday + timedelta(days=4))
+		Todo.objects.create(user=self.user, title='Next week', scheduled_date=self.monday + timedelta(days=9))
+		gym = Todo.objects.create(user=self.user, title='Gym', is_recurring=True, recurring_type='DAILY')
+		RecurrenceRule.objects.create(task=gym, freq='DAILY', interval=2, dtstart=self.monday - timedelta(days=30))
+		OccurrenceOverride.objects.create(task=gym, date=self.monday, status='COMPLETED')
+		StudyPlan.objects.create(
+			user=self.user, subject='Physics', goal='Mechanics', duration_days=3,
+			generated_plan='Day 1', start_date=self.monday + timedelta(days=5),
+		)
+
+		response = self.client.get(reverse('agenda'), {'view': 'week', 'date': (self.monday + timedelta(days=3)).isoformat()})
+		days = {day['date']: day['items'] for day in response.json()['days']}
+		self.assertEqual(len(days), 7)
+		titles = {date: [item['title'] for item in items] for date, items in days.items()}
+
+		self.assertEqual(titles[self.monday.isoformat()], ['Gym'])
+		self.assertEqual(days[self.monday.isoformat()][0]['status'], 'COMPLETED')
+		self.assertIn('Dentist', titles[(self.monday + timedelta(days=2)).isoformat()])
+		self.assertEqual(days[(self.monday + timedelta(days=4)).isoformat()][0]['kind'], 'deadline')
+		self.assertEqual(titles[(self.monday + timedelta(days=6)).isoformat()], ['Gym', 'Day 2: Physics'])
+		self.assertNotIn('Next week', str(titles))
+
+		month = self.client.get(reverse('agenda'), {'view': 'month', 'date': self.monday.isoformat()}).json()
+		self.assertEqual((month['start'], month['end']), ('2026-03-01', '2026-03-31'))
+
+	def test_team_owner_sees_only_own_and_assigned_team_tasks(self):
+		member = User.objects.create_user(username='member', password='Password@123')
+		team = Team.objects.create(name='Crew', owner=self.user)
+		team.members.add(self.user, member)
+		for assignee in (member, member, self.user):
+			Todo.objects.create(user=self.user, team=team, assignee=assignee, title=f'Team: {assignee.username}', scheduled_date=self.monday)
+
+		days = self.client.get(reverse('agenda'), {'view': 'week', 'date': self.monday.isoformat()}).json()['days']
+		self.assertEqual([item['title'] for item in days[0]['items']], ['Team: planner'])
+		feed = self.client.get(reverse('calendar_feed', args=[self.user.profile.get_calendar_token()]))
+		body = b''.join(feed.streaming_content).decode()
+		self.assertNotIn('Team: member', body)
+		self.assertIn('Team: planner', body)
+
+	def test_ics_feed_streams_and_answers_304_until_something_changes(self):
+		task = Todo.objects.create(user=self.user, title='Pay rent, on time', scheduled_date=self.monday)
+		gym = Todo.objects.create(user=self.user, title='Gym', is_recurring=True, recurring_type='WEEKLY')
+		RecurrenceRule.objects.create(task=gym, freq='WEEKLY', weekdays='MO,TH', dtstart=self.monday)
+
+		self.client.logout()
+		url = reverse('calendar_feed', args=[self.user.profile.get_calendar_token()])
+		response = self.client.get(url)
+		self.assertTrue(response.streaming)
+		body = b''.join(response.streaming_content).decode()
+		self.assertIn('SUMMARY:Pay rent\\, on time', body)
+		self.assertIn('RRULE:FREQ=WEEKLY;BYDAY=MO,TH', body)
+		self.assertTrue(body.endswith('END:VCALENDAR\r\n'))
+
+		etag = response['ETag']
+		self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+		task.title = 'Pay rent'
+		task.save()
+		fresh = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(fresh.status_code, 200)
+		self.assertNotEqual(fresh['ETag'], etag)
+
+		plan = StudyPlan.objects.create(user=self.user, subject='Physics', goal='Mechanics', generated_plan='', start_date=self.monday)
+		etag = self.client.get(url)['ETag']
+		plan.start_date = self.monday + timedelta(days=7)
+		plan.save()
+		self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+		self.assertEqual(self.client.get(reverse('calendar_feed', args=['nope'])).status_code, 404)
+
+
+class SearchTests(TestCase):
+	def setUp(self):
+		self.user = User.objects.create_user(username='seeker', password='Password@123')
+		self.other = User.objects.create_user(username='stranger', password='Password@123')
+		self.client.login(username='seeker', password='Password@123')
+
+	def test_results_are_ranked_scoped_and_follow_edits(self):
+		memo_hit = Todo.objects.create(user=self.user, title='Weekly chores', memo='Buy physics textbook')
+		title_hit = Todo.objects.create(user=self.user, title='Physics revision', memo='Chapter 3')
+		Todo.objects.create(user=self.other, title='Physics homework')
+		Todo.objects.create(user=self.user, title='Physics deleted', status='DELETED')
+
+		response = self.client.get(reverse('search'), {'q': 'physic'})
+		self.assertEqual([row['id'] for row in response.json()['results']], [title_hit.id, memo_hit.id])
+
+		title_hit.title = 'Chemistry revision'
+		title_hit.memo = ''
+		title_hit.save()
+		response = self.client.get(reverse('search'), {'q': 'physics'})
+		self.assertEqual([row['id'] for row in response.json()['results']], [memo_hit.id])
+
+		memo_hit.delete()
+		self.assertEqual(self.client.get(reverse('search'), {'q': 'physics'}).json()['results'], [])
+
+	def test_pagination_and_plan_search(self):
+		for index in range(25):
+			Todo.objects.create(user=self.user, title=f'Essay draft {index}')
+		first = self.client.get(reverse('search'), {'q': 'essay'}).json()
+		second = self.client.get(reverse('search'), {'q': 'essay', 'page': 2}).json()
+		self.assertEqual((len(first['results']), first['has_next']), (20, True))
+		self.assertEqual((len(second['results']), second['has_next']), (5, False))
+
+		plan = StudyPlan.objects.create(
+			user=self.user, subject='Organic Chemistry', goal='Reactions', generated_plan='## Day 1: Alkanes',
+		)
+		response = self.client.get(reverse('search'), {'q': 'alkanes', 'type': 'plans'})
+		self.assertEqual([row['id'] for row in response.json()['results']], [plan.id])
+
+
+@override_settings(EXPORT_ROOT=os.path.join(tempfile.gettempdir(), 'smart-planner-test-exports'))
+class DataExportTests(TestCase):
+	def setUp(self):
+		self.user = User.objects.create_user(username='exporter', password='Password@123')
+		self.client.login(username='exporter', password='Password@123')
+		Todo.objects.create(user=self.user, title='Write, "quoted" essay', memo='Line one\nLine two')
+		Todo.objects.create(user=self.user, title='Read', scheduled_date=timezone.localdate())
+		StudyPlan.objects.create(user=self.user, subject='History', goal='Dates', generated_plan='## Day 1: Rome')
+		badge = Badge.objects.create(badge_id='first', name='First Step', description='First task')
+		UserBadge.objects.create(user=self.user, badge=badge)
+		other = User.objects.create_user(username='someone-else', password='Password@123')
+		Todo.objects.create(user=other, title='Not mine')
+
+	def test_jsonl_export_streams_every_record_type(self):
+		response = self.client.get(reverse('export_data'))
+		self.assertTrue(response.streaming)
+		records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+		self.assertEqual(
+			[record['type'] for record in records], ['task', 'task', 'study_plan', 'badge', 'profile'],
+		)
+		self.assertEqual(records[0]['memo'], 'Line one\nLine two')
+		self.assertEqual(records[3]['code'], 'first')
+
+	def test_csv_export_has_one_model_per_file(self):
+		response = self.client.get(reverse('export_data'), {'format': 'csv', 'model': 'tasks'})
+		rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+		self.assertEqual(rows[0][:3], ['id', 'title', 'status'])
+		self.assertEqual([row[1] for row in rows[1:]], ['Write, "quoted" essay', 'Read'])
+		self.assertIn('exporter-tasks.csv', response['Content-Disposition'])
+
+	def test_background_export_writes_gzip_file(self):
+		self.client.post(reverse('request_data_export'), {'format': 'jsonl'})
+		data_export = DataExport.objects.get(user=self.user)
+		build_data_export.now(data_export.id)
+
+		data_export.refresh_from_db()
+		self.assertEqual(data_export.status, 'READY')
+		response = self.client.get(reverse('download_data_export', args=[data_export.id]))
+		lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+		self.assertEqual(len(lines), 5)
+
+
+class TaskImportTests(TestCase):
+	def setUp(self):
+		self.user = User.objects.create_user(username='importer', password='Password@123')
+		self.client.login(username='importer', password='Password@123')
+
+	def test_csv_import_batches_rows_and_reports_bad_lines(self):
+		tomorrow = (timezone.localdate() + timedelta(days=1)).isoformat()
+		lines = ['title,priority,scheduled_date,recurring_type,difficulty']
+		lines += [f'Task {index},high,{tomorrow},,Easy' for index in range(5)]
+		lines += [',2,,,', 'Bad date,2,31-12-2025,,', 'Gym,low,,WEEKDAYS,hard']
+		batches = []
+
+		result = import_tasks(self.user, io.StringIO('\n'.join(lines)), 'csv', batch_size=2, on_batch=batches.append)
+
+		self.assertEqual(result.created, 6)
+		self.assertEqual([len(batch) for batch in batches], [2, 2, 2])
+		self.assertEqual([line for line, _ in result.errors], [7, 8])
+		self.assertIn('title is required', result.errors[0][1])
+		self.assertEqual(Todo.objects.get(title='Task 0').priority, 3)
+		self.assertEqual(Todo.objects.get(title='Gym').recurrence.to_rrule(), 'FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR')
+		self.assertEqual(ScheduledReminder.objects.filter(user=self.user, kind='SCHEDULED').count(), 5)
+
+	def test_ics_upload_unfolds_lines_and_keeps_rrule(self):
+		ics = (
+			'BEGIN:VCALENDAR\r\nBEGIN:VEVENT\r\nSUMMARY:Pay rent\\, on time\r\n'
+			'DESCRIPTION:A long description that was folded\r\n  onto a second line\r\n'
+			'DTSTART;VALUE=DATE:20260302\r\nRRULE:FREQ=MONTHLY;BYMONTHDAY=1\r\nEND:VEVENT\r\n'
+			'BEGIN:VTODO\r\nSUMMARY:File taxes\r\nDUE;VALUE=DATE:20260415\r\nPRIORITY:1\r\nEND:VTODO\r\n'
+			'END:VCALENDAR\r\n'
+		)
+		upload = SimpleUploadedFile('calendar.ics', ics.encode(), content_type='text/calendar')
+		response = self.client.post(reverse('import_tasks'), {'file': upload}, follow=True)
+		self.assertContains(response, 'Imported 2 task(s).')
+
+		rent = Todo.objects.get(title='Pay rent, on time')
+		self.assertEqual(rent.memo, 'A long description that was folded onto a second line')
+		self.assertEqual(rent.recurrence.to_rrule(), 'FREQ=MONTHLY;BYMONTHDAY=1')
+		taxes = Todo.objects.get(title='File taxes')
+		self.assertEqual((taxes.deadline.isoformat(), taxes.priority), ('2026-04-15', 3))
+
+	def test_jsonl_upload_reports_invalid_lines_and_queues_enrichment(self):
+		jsonl = '{"title": "Plan sprint"}\nnot json\n{"type": "study_plan", "subject": "skip me"}\n{"title": "Buy milk", "category": "Shopping"}\n'
+		upload = SimpleUploadedFile('tasks.jsonl', jsonl.encode())
+		with patch('core.views.enrich_imported_tasks') as enrich:
+			response = self.client.post(reverse('import_tasks'), {'file': upload, 'enrich': '1'}, follow=True)
+		self.assertContains(response, 'Imported 2 task(s).')
+		self.assertContains(response, 'line 2: invalid JSON')
+		enrich.assert_called_once_with([
+			[Todo.objects.get(title='Plan sprint').id, ['category', 'difficulty', 'time_estimate_minutes']],
+			[Todo.objects.get(title='Buy milk').id, ['difficulty', 'time_estimate_minutes']],
+		])
+
+	def test_enrichment_classifies_many_tasks_per_prompt(self):
+		tasks = Todo.objects.bulk_create([Todo(user=self.user, title=f'Imported {index}') for index in range(30)])
+		reply = '\n'.join(f'{index} | Work | Hard | 50' for index in range(1, 26))
+		with patch('core.ai_service.call_groq_api', return_value=reply) as api:
+			enrich_imported_tasks.now([[task.id, ['category', 'difficulty', 'time_estimate_minutes']] for task in tasks])
+		self.assertEqual(api.call_count, 2)
+		self.assertEqual(Todo.objects.filter(category='Work', difficulty='Hard', time_estimate_minutes=50).count(), 30)
+
+	def test_enrichment_keeps_values_the_file_supplied(self):
+		# Explicit values equal to the model defaults still count as supplied.
+		csv_text = 'title,difficulty,time_estimate_minutes\nQuick call,Moderate,25\nEdited later,,\n'
+		with patch('core.views.enrich_imported_tasks') as enrich:
+			self.client.post(reverse('import_tasks'), {'file': SimpleUploadedFile('tasks.csv', csv_text.encode()), 'enrich': '1'})
+		task, edited = Todo.objects.get(title='Quick call'), Todo.objects.get(title='Edited later')
+		edited.memo = 'chosen by hand'
+		edited.save()
+
+		with patch('core.ai_service.call_groq_api', return_value='1 | Work | Hard | 50'):
+			enrich_imported_tasks.now(*enrich.call_args.args)
+		task.refresh_from_db()
+		self.assertEqual((task.category, task.difficulty, task.time_estimate_minutes), ('Work', 'Moderate', 25))
+		self.assertEqual((task.version, task.last_updated > task.created), (1, True))
+		# A task the user touched since the import is left alone.
+		edited.refresh_from_db()
+		self.assertEqual(edited.category, 'Other')
+
+	def test_bad_rrules_estimates_and_csv_become_row_errors(self):
+		lines = ['title,rrule,time_estimate_minutes', 'Good,,', 'Negative count,FREQ=DAILY;COUNT=-1,']
+		lines += ['Huge interval,FREQ=DAILY;INTERVAL=40000,', 'Day zero,FREQ=MONTHLY;BYMONTHDAY=0,']
+		lines += ['Day forty,FREQ=MONTHLY;BYMONTHDAY=40,', 'Infinite,,inf', 'Also good,,30']
+		result = import_tasks(self.user, io.StringIO('\n'.join(lines)), 'csv')
+		self.assertEqual(result.created, 2)
+		self.assertEqual([line for line, _ in result.errors], [3, 4, 5, 6, 7])
+
+		# Past csv.field_size_limit(), the reader raises csv.Error.
+		result = import_tasks(self.user, io.StringIO('title\nBefore\n"' + 'x' * 200000), 'csv')
+		self.assertEqual(result.created, 1)
+		self.assertIn('unreadable CSV', result.errors[0][1])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BulkTaskActionTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_user(username='bulker', password='Password@123')
+		self.other = User.objects.create_user(username='outsider', password='Password@123')
+		self.client.login(username='bulker', password='Password@123')
+
+	def _post(self, **payload):
+		return self.client.post(reverse('bulk_task_action'), data=json.dumps(payload), content_type='application/json')
+
+	def _complete_queries(self, count):
+		tasks = [Todo.objects.create(user=self.user, title=f'Batch {count}-{index}') for index in range(count)]
+		with CaptureQueriesContext(connection) as queries:
+			response = self._post(action='complete', task_ids=[task.id for task in tasks])
+		return response.json(), len(queries)
+
+	def test_complete_is_set_based_and_awards_xp_once(self):
+		small, small_queries = self._complete_queries(3)
+		large, large_queries = self._complete_queries(30)
+
+		self.assertEqual(small_queries, large_queries)
+		self.assertEqual((large['updated'], large['xp_awarded']), (30, 750))
+		self.assertEqual(Todo.objects.filter(user=self.user, status='COMPLETED').count(), 33)
+		profile = self.user.profile
+		profile.refresh_from_db()
+		# 825 XP in total: 100 + 200 + 300 buys levels 2-4, leaving 225 towards level 5.
+		self.assertEqual((profile.level, profile.xp), (4, 225))
+
+	def test_permission_check_skips_foreign_tasks_and_allows_team_owner(self):
+		mine = Todo.objects.create(user=self.user, title='Mine')
+		foreign = Todo.objects.create(user=self.other, title='Theirs')
+		team = Team.objects.create(name='Crew', owner=self.user)
+		team_task = Todo.objects.create(user=self.other, team=team, title='Team work')
+
+		response = self._post(action='delete', task_ids=[mine.id, foreign.id, team_task.id])
+
+		self.assertEqual(response.json()['denied'], [foreign.id])
+		self.assertEqual(list(Todo.objects.exclude(status='DELETED').values_list('title', flat=True)), ['Theirs'])
+
+	def test_deleted_task_cannot_be_completed_or_moved(self):
+		task = Todo.objects.create(user=self.user, title='Gone', difficulty='Hard')
+		self.client.post(reverse('delete_task', args=[task.id]))
+		task.refresh_from_db()
+		self.assertEqual(task.status, 'DELETED')
+
+		self.assertEqual(self.client.get(reverse('complete_task', args=[task.id])).status_code, 404)
+		self.assertEqual(self.client.post(reverse('update_task_status', args=[task.id]), {'status': 'ACTIVE'}).status_code, 404)
+		self.assertEqual(self.client.get(reverse('snooze_task', args=[task.id])).status_code, 404)
+		response = self.client.post(
+			reverse('move_task', args=[task.id]), json.dumps({'status': 'COMPLETED', 'version': task.version}),
+			content_type='application/json',
+		)
+		self.assertEqual(response.status_code, 404)
+
+		task.refresh_from_db()
+		self.assertEqual(task.status, 'DELETED')
+		self.user.profile.refresh_from_db()
+		self.assertEqual(self.user.profile.xp, 0)
+
+	def test_status_reschedule_and_priority_updates(self):
+		tasks = [Todo.objects.create(user=self.user, title=f'Task {index}') for index in range(3)]
+		ids = [task.id for task in tasks]
+		tomorrow = timezone.localdate() + timedelta(days=1)
+
+		self._post(action='reschedule', task_ids=ids, scheduled_date=tomorrow.isoformat())
+		self.assertEqual(ScheduledReminder.objects.filter(task_id__in=ids, kind='SCHEDULED').count(), 3)
+
+		self._post(action='reprioritise', task_ids=ids, priority=3)
+		self._post(action='status', task_ids=ids, status='COMPLETED')
+		self.assertEqual(set(Todo.objects.values_list('priority', 'status', 'scheduled_date')), {(3, 'COMPLETED', tomorrow)})
+		self.assertFalse(ScheduledReminder.objects.filter(task_id__in=ids).exists())
+
+		self.assertEqual(self._post(action='reprioritise', task_ids=ids, priority=7).status_code, 400)
+
+	def test_complete_moves_recurring_tasks_to_next_occurrence(self):
+		today = timezone.localdate()
+		daily = Todo.objects.create(
+			user=self.user, title='Stretch', is_recurring=True, recurring_type='DAILY', scheduled_date=today,
+		)
+		RecurrenceRule.objects.create(task=daily, freq='DAILY', dtstart=today)
+		once = Todo.objects.create(user=self.user, title='Once')
+
+		self._post(action='complete', task_ids=[daily.id, once.id])
+
+		daily.refresh_from_db()
+		self.assertEqual((daily.status, daily.scheduled_date), ('INBOX', today + timedelta(days=1)))
+		self.assertTrue(OccurrenceOverride.objects.filter(task=daily, date=today, status='COMPLETED').exists())
+		self.assertEqual(Todo.objects.get(id=once.id).status, 'COMPLETED')
+
+
+class SubTaskTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_user(username='stepper', password='Password@123')
+		self.client.login(username='stepper', password='Password@123')
+
+	def test_parses_legacy_list_repr_json_and_plain_lines(self):
+		legacy = str(['<strong style="color: var(--accent-color);">Research</strong> the topic', 'Write <em>notes</em> & review'])
+		self.assertEqual(parse_sub_tasks(legacy)[1], 'Write <em>notes</em> & review')
+		self.assertEqual(parse_sub_tasks('["one", "two"]'), ['one', 'two'])
+		self.assertEqual(parse_sub_tasks('- one\n\n2. two'), ['one', 'two'])
+
+		task = Todo.objects.create(user=self.user, title='Legacy')
+		first, second = build_subtasks(task, parse_sub_tasks(legacy))
+		self.assertEqual(first.text, '**Research** the topic')
+		self.assertIn('<strong style="color: var(--accent-color);">Research</strong>', first.html)
+		self.assertEqual(second.html, 'Write <em style="color: #bdbdbd; font-style: italic;">notes</em> &amp; review')
+		self.assertNotIn('<script>', build_subtasks(task, ['<script>alert(1)</script> step'])[0].html)
+
+	def test_ai_steps_are_stored_as_rows_and_rendered_with_prefetch(self):
+		with patch('core.views.get_task_category_with_ai', return_value='Study'), \
+				patch('core.views.get_task_difficulty_with_ai', return_value='Easy'), \
+				patch('core.views.get_time_estimate_with_ai', return_value=30), \
+				patch('core.views.get_sub_tasks_with_ai', return_value=[f'**Step** {index}' for index in range(6)]):
+			self.client.post(reverse('createtodo_ai'), {'magic_input': 'Revise chemistry'})
+
+		task = Todo.objects.get(title='Revise chemistry')
+		self.assertEqual(task.sub_tasks.splitlines()[0], '**Step** 0')
+		self.assertEqual(list(task.subtasks.values_list('position', flat=True)), list(range(6)))
+		Todo.objects.filter(id=task.id).update(status='ACTIVE')
+
+		with CaptureQueriesContext(connection) as queries:
+			response = self.client.get(reverse('personal_dashboard'))
+		self.assertContains(response, '<strong style="color: var(--accent-color);">Step</strong> 5', html=False)
+		self.assertEqual(sum('core_subtask' in query['sql'] for query in queries), 1)
+
+	def test_toggle_is_a_single_row_update_and_checks_ownership(self):
+		task = Todo.objects.create(user=self.user, title='Mine')
+		step = SubTask.objects.create(task=task, position=0, text='Do it', html='Do it')
+		other = User.objects.create_user(username='nosy', password='Password@123')
+		foreign = SubTask.objects.create(task=Todo.objects.create(user=other, title='Theirs'), position=0, text='x', html='x')
+
+		with CaptureQueriesContext(connection) as queries:
+			response = self.client.post(reverse('toggle_subtask', args=[step.id]), data=json.dumps({'done': True}), content_type='application/json')
+		self.assertEqual(response.json()['done'], True)
+		self.assertEqual([query['sql'].split()[0] for query in queries if 'core_subtask' in query['sql']], ['UPDATE'])
+		step.refresh_from_db()
+		self.assertTrue(step.is_done and step.completed_at)
+
+		response = self.client.post(reverse('toggle_subtask', args=[foreign.id]), data=json.dumps({'done': True}), content_type='application/json')
+		self.assertEqual(response.status_code, 404)
+
+	def test_import_creates_subtask_rows(self):
+		rows = [json.dumps({'title': 'Trip', 'sub_tasks': ['Book train', 'Pack']})]
+		import_tasks(self.user, io.StringIO('\n'.join(rows)), 'jsonl')
+		task = Todo.objects.get(title='Trip')
+		self.assertEqual(list(task.subtasks.values_list('text', flat=True)), ['Book train', 'Pack'])
+
+
+class RenderCacheTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		rendering.clear_local_cache()
+		self.user = User.objects.create_user(username='reader', password='Password@123')
+		self.client.login(username='reader', password='Password@123')
+
+	def test_markdown_filter_renders_once_per_distinct_text(self):
+		template = Template('{% load core_tags %}{{ text|markdown }}')
+		with patch('core.rendering.md.markdown', wraps=rendering.md.markdown) as render:
+			first = template.render(Context({'text': '**Bold** <script>x</script>'}))
+			template.render(Context({'text': '**Bold** <script>x</script>'}))
+			rendering.clear_local_cache()  # another worker: served from the shared cache
+			template.render(Context({'text': '**Bold** <script>x</script>'}))
+			template.render(Context({'text': 'Different'}))
+		self.assertEqual(render.call_count, 2)
+		self.assertIn('<strong>Bold</strong>', first)
+		self.assertNotIn('<script>', first)
+
+	def test_local_lru_is_bounded(self):
+		with patch('core.rendering.RENDER_CACHE_SIZE', 3):
+			for index in range(10):
+				rendering.render_markdown(f'text {index}')
+		self.assertEqual(len(rendering._local), 3)
+
+	def test_plan_page_reuses_parsed_structure(self):
+		plan = StudyPlan.objects.create(user=self.user, subject='Bio', goal='Pass', generated_plan='## Day 1: Cells\n- Read **notes**')
+		with patch('core.rendering._plan_structure', wraps=rendering._plan_structure) as parse:
+			for _ in range(3):
+				response = self.client.get(reverse('view_study_plan', args=[plan.id]))
+		self.assertContains(response, '<strong style="color: var(--accent-color);">notes</strong>')
+		self.assertEqual(parse.call_count, 1)
+
+	@override_settings(MARKDOWN_PRECOMPUTE=True)
+	def test_precompute_renders_at_write_time(self):
+		plan = StudyPlan.objects.create(user=self.user, subject='Art', goal='-', generated_plan='## Day 1: Sketch\n- Draw')
+		loose = StudyPlan.objects.create(user=self.user, subject='Music', goal='-', generated_plan='*Practise* scales')
+		self.assertIsNotNone(cache.get(rendering.cache_key('plan', plan.generated_plan)))
+		self.assertIsNotNone(cache.get(rendering.cache_key('markdown', loose.generated_plan)))
+
+	def test_markdown_keeps_code_and_quotes_but_drops_raw_html(self):
+		html = rendering.render_markdown(
+			'```\na < b && c\n```\n\n> quoted\n\n<img src=x onerror=alert(1)> [bad](javascript:alert(1)) [ok](https://example.com)'
+		)
+		self.assertIn('<code>a &lt; b &amp;&amp; c\n</code>', html)
+		self.assertIn('<blockquote>', html)
+		self.assertIn('&lt;img src=x onerror=alert(1)&gt;', html)
+		self.assertNotIn('javascript:', html)
+		self.assertIn('<a href="https://example.com">ok</a>', html)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class KanbanMoveTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_user(username='mover', password='Password@123')
+		self.client.login(username='mover', password='Password@123')
+		self.task = Todo.objects.create(user=self.user, title='Drag me', scheduled_date=timezone.localdate() + timedelta(days=1))
+
+	def _move(self, status, version):
+		return self.client.post(
+			reverse('move_task', args=[self.task.id]),
+			data=json.dumps({'status': status, 'version': version}), content_type='application/json',
+		)
+
+	def test_move_returns_only_the_changed_card(self):
+		version = self.task.version
+		with CaptureQueriesContext(connection) as queries:
+			response = self._move('ACTIVE', version)
+
+		card = response.json()['card']
+		self.assertEqual((card['id'], card['status'], card['version']), (self.task.id, 'ACTIVE', version + 1))
+		# Session/user lookups + one read of the card + demoting the old ACTIVE card + the conditional UPDATE;
+		# no board query, no reminder resync.
+		self.assertLessEqual(len(queries), 7)
+		self.assertNotIn(b'Workflow Board', response.content)
+
+		self._move('COMPLETED', version + 1)
+		self.assertFalse(ScheduledReminder.objects.filter(task=self.task).exists())
+
+	def test_stale_version_is_rejected_with_current_card(self):
+		stale = self.task.version
+		self.task.title = 'Renamed in another tab'
+		self.task.save()
+
+		response = self._move('COMPLETED', stale)
+
+		self.assertEqual(response.status_code, 409)
+		self.assertEqual(response.json()['card']['title'], 'Renamed in another tab')
+		self.task.refresh_from_db()
+		self.assertEqual(self.task.status, 'INBOX')
+		self.assertEqual(self._move('COMPLETED', self.task.version).status_code, 200)
+
+	def test_timer_saves_keep_version_and_foreign_tasks_are_hidden(self):
+		version = self.task.version
+		self.task.timer_seconds_remaining = 300
+		self.task.save(update_fields=['timer_seconds_remaining'])
+		self.task.refresh_from_db()
+		self.assertEqual(self.task.version, version)
+
+		other = User.objects.create_user(username='stranger', password='Password@123')
+		foreign = Todo.objects.create(user=other, title='Not yours')
+		response = self.client.post(
+			reverse('move_task', args=[foreign.id]),
+			data=json.dumps({'status': 'ACTIVE', 'version': foreign.version}), content_type='application/json',
+		)
+		self.assertEqual(response.status_code, 404)
+
+
+class SyncApiTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_user(username='syncer', password='Password@123')
+		self.client.login(username='syncer', password='Password@123')
+		self.tasks = [Todo.objects.create(user=self.user, title=f'Cached {index}') for index in range(5)]
+		self.plan = StudyPlan.objects.create(user=self.user, subject='Maths', goal='Pass', generated_plan='## Day 1')
+		self._backdate()
+
+	def _backdate(self):
+		# queryset.update() skips auto_now, so this puts every row outside the settle window.
+		an_hour_ago = timezone.now() - timedelta(hours=1)
+		Todo.objects.update(last_updated=an_hour_ago)
+		StudyPlan.objects.update(last_updated=an_hour_ago)
+		Profile.objects.update(last_updated=an_hour_ago)
+
+	def _sync(self, cursor=None):
+		response = self.client.get(reverse('sync'), {'since': cursor} if cursor else {})
+		self.assertEqual(response.status_code, 200)
+		return response.json()
+
+	def test_plans_pending_deletion_sync_as_deleted(self):
+		cursor = self._sync()['cursor']
+		StudyPlan.objects.filter(id=self.plan.id).update(pending_deletion=True, last_updated=timezone.now())
+
+		delta = self._sync(cursor)
+		self.assertEqual((delta['plans'], delta['deleted_plans']), ([], [self.plan.id]))
+		self.assertEqual(self._sync()['plans'], [])
+
+	def test_delta_contains_only_changed_rows(self):
+		full = self._sync()
+		self.assertTrue(full['full'])
+		self.assertEqual(len(full['tasks']), 5)
+		self.assertEqual(full['plans'][0]['subject'], 'Maths')
+		self.assertIsNotNone(full['profile'])
+
+		self.assertEqual(self._sync(full['cursor'])['tasks'], [])
+
+		edited = self.tasks[2]
+		edited.memo = 'changed on another device'
+		edited.save(update_fields=['memo'])
+		delta = self._sync(full['cursor'])
+		self.assertEqual([row['id'] for row in delta['tasks']], [edited.id])
+		self.assertEqual((delta['plans'], delta['profile'], delta['deleted_tasks']), ([], None, []))
+
+	def test_deletes_arrive_as_tombstones(self):
+		cursor = self._sync()['cursor']
+		self.client.post(reverse('delete_task', args=[self.tasks[0].id]))
+		self.client.post(reverse('delete_study_plan', args=[self.plan.id]))
+
+		delta = self._sync(cursor)
+		self.assertEqual(delta['deleted_tasks'], [self.tasks[0].id])
+		self.assertEqual(delta['deleted_plans'], [self.plan.id])
+		self.assertEqual(delta['tasks'], [])
+		# A fresh full sync doesn't send tombstones at all.
+		fresh = self._sync()
+		self.assertEqual((len(fresh['tasks']), fresh['deleted_tasks']), (4, []))
+
+	def test_pages_by_keyset_even_when_timestamps_tie(self):
+		seen, cursor, pages = [], None, 0
+		while True:
+			payload = changes_since(self.user, cursor, limit=2)
+			seen += [row['id'] for row in payload['tasks']]
+			cursor, pages = payload['cursor'], pages + 1
+			if not payload['has_more']:
+				break
+		self.assertEqual(sorted(seen), sorted(task.id for task in self.tasks))
+		self.assertEqual(pages, 3)
+
+	def test_bad_and_expired_cursors(self):
+		response = self.client.get(reverse('sync'), {'since': 'not-a-cursor'})
+		self.assertEqual(response.status_code, 400)
+
+		SyncTombstone.objects.create(user=self.user, model='task', object_id=999)
+		expired = encode_cursor({'issued': (timezone.now() - timedelta(days=90)).isoformat()})
+		payload = self._sync(expired)
+		self.assertTrue(payload['reset'])
+		self.assertEqual((len(payload['tasks']), payload['deleted_tasks']), (5, []))
+
+
+class ConditionalGetTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_user(username='revisit', password='Password@123')
+		self.client.login(username='revisit', password='Password@123')
+		self.plan = StudyPlan.objects.create(user=self.user, subject='Physics', goal='Revise', generated_plan='## Day 1: Optics\n- Lenses')
+		self.task = Todo.objects.create(user=self.user, title='Essay', status='COMPLETED', datecompleted=timezone.now())
+
+	def _etag(self, url):
+		# The first visit also sets the CSRF cookie, which is part of the validator.
+		self.client.get(url)
+		response = self.client.get(url)
+		self.assertEqual(response.status_code, 200)
+		return response['ETag']
+
+	def _revisit(self, url, etag):
+		return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+	def test_unchanged_pages_get_304_without_rendering(self):
+		for url in (reverse('plan_list'), reverse('view_study_plan', args=[self.plan.id]), reverse('task_history'), reverse('profile')):
+			etag = self._etag(url)
+			response = self._revisit(url, etag)
+			self.assertEqual(response.status_code, 304, url)
+			self.assertEqual(response.content, b'')
+			self.assertFalse(response.templates)
+
+	def test_writes_invalidate_the_validator(self):
+		plans_url, plan_url = reverse('plan_list'), reverse('view_study_plan', args=[self.plan.id])
+		plans_etag, plan_etag = self._etag(plans_url), self._etag(plan_url)
+		self.plan.goal = 'Revise and practise'
+		self.plan.save()
+		self.assertEqual(self._revisit(plans_url, plans_etag).status_code, 200)
+		self.assertEqual(self._revisit(plan_url, plan_etag).status_code, 200)
+
+		# queryset.update() sends no signals; last_updated alone must catch it.
+		history_url = reverse('task_history')
+		etag = self._etag(history_url)
+		Todo.objects.filter(id=self.task.id).update(title='Essay (final)', last_updated=timezone.now() + timedelta(seconds=1))
+		self.assertEqual(self._revisit(history_url, etag).status_code, 200)
+
+		# A hard delete leaves no timestamp behind; the page version catches it.
+		etag = self._etag(plans_url)
+		StudyPlan.objects.create(user=self.user, subject='Extra', goal='-', generated_plan='-').delete()
+		self.assertEqual(self._revisit(plans_url, etag).status_code, 200)
+
+		profile_url = reverse('profile')
+		etag = self._etag(profile_url)
+		badge = Badge.objects.create(badge_id='test_badge', name='Tester', description='-')
+		UserBadge.objects.create(user=self.user, badge=badge)
+		self.assertEqual(self._revisit(profile_url, etag).status_code, 200)
+
+	def test_moving_an_older_completed_task_out_of_history_invalidates_it(self):
+		older = Todo.objects.create(user=self.user, title='Lab report', status='COMPLETED', datecompleted=timezone.now())
+		Todo.objects.filter(id=older.id).update(last_updated=timezone.now() - timedelta(days=1))
+		older.refresh_from_db()
+		history_url = reverse('task_history')
+		etag = self._etag(history_url)
+		response = self.client.post(
+			reverse('move_task', args=[older.id]), json.dumps({'status': 'INBOX', 'version': older.version}),
+			content_type='application/json',
+		)
+		self.assertEqual(response.status_code, 200)
+		response = self._revisit(history_url, etag)
+		self.assertEqual(response.status_code, 200)
+		self.assertNotContains(response, 'Lab report')
+
+		# A bare update() bumps nothing, but the row count no longer matches.
+		etag = self._etag(history_url)
+		Todo.objects.filter(id=self.task.id).update(status='INBOX')
+		self.assertEqual(self._revisit(history_url, etag).status_code, 200)
+
+	def test_focus_rollup_and_forecast_refresh_invalidate_the_profile(self):
+		profile_url = reverse('profile')
+		start = timezone.now() - timedelta(hours=2)
+		FocusSession.objects.create(user=self.user, started_at=start, ended_at=start + timedelta(hours=1), seconds=3600)
+		etag = self._etag(profile_url)
+		focus.rollup_pending_sessions()
+		self.assertEqual(self._revisit(profile_url, etag).status_code, 200)
+
+		# The page was rendered from a forecast the nightly refresh replaces.
+		cache.set(forecast.FORECAST_KEY.format(self.user.id), {'completions': 99}, forecast.FORECAST_TIMEOUT)
+		etag = self._etag(profile_url)
+		forecast.refresh_all()
+		self.assertEqual(self._revisit(profile_url, etag).status_code, 200)
+		# An unchanged forecast leaves the page cacheable.
+		etag = self._etag(profile_url)
+		forecast.refresh_all()
+		self.assertEqual(self._revisit(profile_url, etag).status_code, 304)
+
+	def test_pending_messages_always_render(self):
+		url = reverse('plan_list')
+		etag = self._etag(url)
+		self.client.post(reverse('delete_completed_plans'))  # queues "No completed plans to delete."
+		response = self._revisit(url, etag)
+		self.assertEqual(response.status_code, 200)
+		self.assertContains(response, 'No completed plans to delete.')
+
+
+class MoodSuggestionTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_user(username='picker', password='Password@123')
+		self.client.login(username='picker', password='Password@123')
+
+	def _suggest(self, difficulty):
+		return self.client.get(reverse('suggest_task_by_mood', args=[difficulty]))
+
+	def test_ranking_weighs_mood_priority_deadline_and_snooze(self):
+		today = timezone.localdate()
+		Todo.objects.create(user=self.user, title='Easy but urgent', difficulty='Easy', priority=3, deadline=today)
+		Todo.objects.create(user=self.user, title='Hard, low', difficulty='Hard', priority=1)
+		Todo.objects.create(user=self.user, title='Hard, high', difficulty='Hard', priority=3)
+		Todo.objects.create(user=self.user, title='Hard, high, due', difficulty='Hard', priority=3, deadline=today + timedelta(days=1))
+		Todo.objects.create(
+			user=self.user, title='Hard, snoozed', difficulty='Hard', priority=3, deadline=today,
+			snoozed_until=timezone.now() + timedelta(hours=2),
+		)
+
+		titles = list(ranked_candidates(self.user, 'Hard').values_list('title', flat=True))
+		self.assertEqual(titles, ['Hard, high, due', 'Hard, high', 'Hard, low', 'Easy but urgent'])
+		self.assertEqual(ranked_candidates(self.user, 'Easy').first().title, 'Easy but urgent')
+
+	def test_suggestion_swaps_the_active_task_in_constant_queries(self):
+		def suggest_queries(inbox_size):
+			Todo.objects.filter(user=self.user).delete()
+			Todo.objects.bulk_create([Todo(user=self.user, title=f'Task {index}') for index in range(inbox_size)])
+			self._suggest('Moderate')
+			with CaptureQueriesContext(connection) as queries:
+				self._suggest('Moderate')
+			return len(queries)
+
+		self.assertEqual(suggest_queries(5), suggest_queries(50))
+		self.assertEqual(Todo.objects.filter(user=self.user, status='ACTIVE').count(), 1)
+		self.assertEqual(Todo.objects.filter(user=self.user, status='INBOX').count(), 49)
+
+	def test_empty_inbox_keeps_the_active_task(self):
+		active = Todo.objects.create(user=self.user, title='Keep going', status='ACTIVE')
+
+		response = self.client.get(reverse('suggest_task_by_mood', args=['Easy']), follow=True)
+
+		self.assertEqual(Todo.objects.get(id=active.id).status, 'ACTIVE')
+		self.assertContains(response, 'No pending tasks found')
+
+	def test_one_active_task_per_person(self):
+		Todo.objects.create(user=self.user, title='First', status='ACTIVE')
+		with self.assertRaises(IntegrityError), transaction.atomic():
+			Todo.objects.create(user=self.user, title='Second', status='ACTIVE')
+
+		# A team task counts against its assignee, not the team owner who created it.
+		member = User.objects.create_user(username='member', password='Password@123')
+		team = Team.objects.create(name='Crew', owner=self.user)
+		Todo.objects.create(user=self.user, team=team, assignee=member, title='Delegated', status='ACTIVE')
+
+		tasks = [Todo.objects.create(user=self.user, title=f'Bulk {index}') for index in range(2)]
+		response = self.client.post(
+			reverse('bulk_task_action'), content_type='application/json',
+			data=json.dumps({'action': 'status', 'status': 'ACTIVE', 'task_ids': [task.id for task in tasks]}),
+		)
+		self.assertEqual(response.status_code, 400)
+
+		response = self.client.post(
+			reverse('move_task', args=[tasks[0].id]), content_type='application/json',
+			data=json.dumps({'status': 'ACTIVE', 'version': tasks[0].version}),
+		)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(
+			set(Todo.objects.filter(status='ACTIVE').values_list('title', flat=True)), {'Bulk 0', 'Delegated'},
+		)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AutoScheduleTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_user(username='packer', password='Password@123')
+		self.client.login(username='packer', password='Password@123')
+		self.today = timezone.localdate()
+
+	def _task(self, task_id, minutes=30, priority=2, deadline=None, difficulty='Moderate', snoozed_until=None):
+		return {
+			'id': task_id, 'title': f'T{task_id}', 'priority': priority, 'difficulty': difficulty, 'deadline': deadline,
+			'time_estimate_minutes': minutes, 'snoozed_until': snoozed_until, 'created': timezone.now(),
+		}
+
+	def test_packs_by_urgency_under_capacity(self):
+		day = [self.today + timedelta(days=offset) for offset in range(4)]
+		tasks = [
+			self._task(1, minutes=40, deadline=self.today),
+			self._task(2, minutes=40, priority=3),
+			self._task(3, minutes=500),
+			self._task(4, minutes=5, difficulty='Hard'),
+			self._task(5, minutes=5, difficulty='Hard'),
+			self._task(6, minutes=5, difficulty='Hard'),
+			self._task(7, minutes=10, snoozed_until=timezone.now() + timedelta(days=3)),
+			self._task(8, minutes=90),
+			self._task(9, minutes=30, priority=1),
+		]
+
+		placed, unplaced = plan_schedule(tasks, self.today, 4, 60, load={day[1]: 20}, hard_load={day[1]: 1})
+
+		self.assertEqual(placed, {
+			1: day[0],  # the deadline goes first
+			2: day[1],  # 40 minutes only fits next to the 20 already booked tomorrow
+			3: day[2],  # longer than a day: takes an empty day alone
+			4: day[0], 5: day[0],
+			6: day[3],  # today has room, but already holds two Hard tasks
+			7: day[3],  # not before the snooze ends
+			9: day[3],
+		})
+		self.assertEqual(unplaced, [8])
+
+	def test_preview_saves_nothing_and_apply_is_one_bulk_write(self):
+		def apply_queries(count):
+			Todo.objects.filter(user=self.user).delete()
+			Todo.objects.bulk_create([Todo(user=self.user, title=f'Job {index}', time_estimate_minutes=30) for index in range(count)])
+			with CaptureQueriesContext(connection) as queries:
+				response = self.client.post(reverse('auto_schedule'), data=json.dumps({'capacity_minutes': 120}), content_type='application/json')
+			return response.json(), sum(query['sql'].startswith('UPDATE') for query in queries)
+
+		Todo.objects.create(user=self.user, title='Later', time_estimate_minutes=30)
+		response = self.client.post(reverse('auto_schedule'), data=json.dumps({'preview': True}), content_type='application/json')
+		self.assertEqual(response.json()['scheduled'][0]['scheduled_date'], self.today.isoformat())
+		self.assertFalse(Todo.objects.filter(scheduled_date__isnull=False).exists())
+
+		small, small_updates = apply_queries(5)
+		large, large_updates = apply_queries(50)
+		self.assertEqual((small_updates, large_updates), (1, 1))
+		self.assertEqual((len(large['scheduled']), large['unscheduled']), (50, []))
+		self.assertEqual(Todo.objects.filter(user=self.user, scheduled_date=self.today).count(), 4)
+		self.assertEqual(ScheduledReminder.objects.filter(user=self.user, kind='SCHEDULED').count(), 50)
+		self.assertEqual(self.client.post(reverse('auto_schedule'), data=json.dumps({'days': 0}), content_type='application/json').status_code, 400)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ForecastTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_user(username='forecaster', password='Password@123')
+
+	def _complete(self, user, when, minutes=30, focus_minutes=None):
+		task = Todo.objects.create(user=user, title='Done', status='COMPLETED', time_estimate_minutes=minutes)
+		Todo.objects.filter(id=task.id).update(datecompleted=when)
+		if focus_minutes:
+			FocusSession.objects.create(user=user, task=task, started_at=when - timedelta(minutes=focus_minutes), ended_at=when, seconds=focus_minutes * 60)
+		return task
+
+	def test_forecast_is_computed_from_arrays(self):
+		today = datetime(2026, 10, 19).date()  # a Monday
+		mondays = [datetime.fromisoformat('2026-10-19T10:00+00:00').timestamp() - week * 7 * 86400 for week in range(6)]
+		completed = np.array(mondays + [datetime.fromisoformat('2026-10-18T22:00+00:00').timestamp()])
+		estimates = np.array([30.0] * 6 + [60.0])
+		focus_seconds = np.array([3600.0] * 5 + [0.0, 0.0])
+
+		result = forecast.compute_forecast(completed, estimates, focus_seconds, today)
+
+		self.assertEqual(result['completions'], 7)
+		self.assertEqual(result['weekday_probability'][0], 0.75)  # 6 of the 8 Mondays in the window
+		self.assertEqual(result['weekday_probability'][6], 0.125)
+		self.assertEqual((result['best_weekday'], result['best_hour']), ('Monday', 10))
+		self.assertEqual(result['slot_probability'][0][10], 0.75)
+		self.assertEqual(result['daily_capacity_minutes'], 60)
+		self.assertEqual((result['estimate_overrun'], result['estimate_overrun_p80']), (2.0, 2.0))
+
+	def test_nightly_refresh_caches_every_user_in_chunks(self):
+		other = User.objects.create_user(username='second', password='Password@123')
+		now = timezone.now()
+		for day in range(6):
+			self._complete(self.user, now - timedelta(days=day), focus_minutes=45)
+		self._complete(other, now - timedelta(days=1))
+		self._complete(other, now - timedelta(days=90))
+
+		with CaptureQueriesContext(connection) as queries:
+			self.assertEqual(forecast.refresh_all(chunk_size=1), 2)
+		self.assertEqual(len(queries), 5)  # per chunk: users, completions; plus the final empty users page
+
+		with CaptureQueriesContext(connection) as queries:
+			mine = forecast.get_forecast(self.user)
+		self.assertEqual(len(queries), 0)
+		self.assertEqual((mine['completions'], mine['daily_capacity_minutes'], mine['estimate_overrun']), (6, 45, 1.5))
+		self.assertEqual(forecast.get_forecast(other)['completions'], 1)
+
+	def test_auto_schedule_uses_forecast_capacity_and_overrun(self):
+		cache.set(forecast.FORECAST_KEY.format(self.user.id), {'daily_capacity_minutes': 60, 'estimate_overrun': 2.0})
+		for index in range(3):
+			Todo.objects.create(user=self.user, title=f'Essay {index}', time_estimate_minutes=30)
+
+		rows, unscheduled = scheduler.auto_schedule(self.user, days=3, preview=True)
+
+		today = timezone.localdate()
+		self.assertEqual([row['scheduled_date'] for row in rows], [today + timedelta(days=offset) for offset in range(3)])
+		self.assertEqual(unscheduled, [])
+
+
+class RetentionTests(TestCase):
+	def test_purge_removes_only_expired_rows_in_batches(self):
+		now = timezone.now()
+		old = now - timedelta(days=40)
+		user = User.objects.create_user(username='keeper', password='Password@123')
+		stale_tasks = [Todo.objects.create(user=user, title=f'Gone {n}', status='DELETED') for n in range(5)]
+		fresh_deleted = Todo.objects.create(user=user, title='Deleted yesterday', status='DELETED')
+		open_task = Todo.objects.create(user=user, title='Still open')
+		SubTask.objects.create(task=stale_tasks[0], position=0, text='Step', html='Step')
+		Todo.objects.filter(id__in=[task.id for task in stale_tasks]).update(last_updated=old)
+		Todo.objects.filter(id=open_task.id).update(last_updated=old)
+
+		SyncTombstone.objects.create(user=user, model='task', object_id=999)
+		recent_tombstone = SyncTombstone.objects.create(user=user, model='task', object_id=998)
+		SyncTombstone.objects.exclude(id=recent_tombstone.id).update(deleted_at=old)
+
+		abandoned = User.objects.create_user(username='abandoned', password='Password@123', is_active=False)
+		waiting = User.objects.create_user(username='waiting', password='Password@123', is_active=False)
+		User.objects.filter(id__in=[abandoned.id, waiting.id]).update(date_joined=old)
+		OTPVerification.objects.create(user=abandoned, otp='123456')
+		OTPVerification.objects.filter(user=abandoned).update(created_at=old)
+		OTPVerification.objects.create(user=waiting, otp='654321')
+
+		with CaptureQueriesContext(connection) as queries:
+			report = retention.purge_expired(batch_size=2, now=now)
+		task_deletes = [query for query in queries.captured_queries if query['sql'].startswith('DELETE FROM "core_todo"')]
+
+		self.assertEqual(report['tasks'], {'core.Todo': 5, 'core.SubTask': 1})
+		self.assertEqual(report['tombstones'], {'core.SyncTombstone': 1})
+		self.assertEqual(report['otps'], {'core.OTPVerification': 1})
+		self.assertEqual(report['pending_signups']['auth.User'], 1)
+		self.assertEqual(len(task_deletes), 3)  # 5 tasks in batches of 2
+
+		self.assertEqual(set(Todo.objects.values_list('id', flat=True)), {fresh_deleted.id, open_task.id})
+		self.assertEqual(list(SyncTombstone.objects.values_list('id', flat=True)), [recent_tombstone.id])
+		self.assertEqual(set(User.objects.values_list('username', flat=True)), {'keeper', 'waiting'})
+		self.assertTrue(OTPVerification.objects.filter(user=waiting).exists())
+		self.assertEqual(retention.purge_expired(now=now), {name: {} for name, _ in retention.POLICIES})
+
+
+class BackgroundDeletionTests(TestCase):
+	def setUp(self):
+		self.user = User.objects.create_user(username='cleaner', password='Password@123')
+		self.client.login(username='cleaner', password='Password@123')
+
+	def test_reset_history_hides_at_once_and_deletes_in_batches(self):
+		done = [Todo.objects.create(user=self.user, title=f'Done {n}', status='COMPLETED', datecompleted=timezone.now()) for n in range(5)]
+		SubTask.objects.create(task=done[0], position=0, text='Step', html='Step')
+		FocusSession.objects.create(user=self.user, task=done[1], started_at=timezone.now(), ended_at=timezone.now(), seconds=60)
+		open_task = Todo.objects.create(user=self.user, title='Open')
+
+		self.client.post(reverse('reset_history'))
+		self.assertNotContains(self.client.get(reverse('task_history')), 'Done 0')
+		self.assertEqual(Todo.objects.filter(status='COMPLETED').count(), 5)
+
+		later = Todo.objects.create(user=self.user, title='Done later', status='COMPLETED', datecompleted=timezone.now() + timedelta(seconds=1))
+		with CaptureQueriesContext(connection) as queries:
+			deleted = retention.delete_task_history(self.user.id, batch_size=2)
+		self.assertEqual(deleted, 5)
+		self.assertEqual(sum(query['sql'].startswith('DELETE FROM "core_todo"') for query in queries.captured_queries), 3)
+		self.assertEqual(set(Todo.objects.values_list('id', flat=True)), {open_task.id, later.id})
+		self.assertFalse(SubTask.objects.exists())
+		self.assertIsNone(FocusSession.objects.get().task_id)
+		self.assertEqual(SyncTombstone.objects.filter(user=self.user, model='task').count(), 5)
+		self.assertContains(self.client.get(reverse('task_history')), 'Done later')
+
+	def test_deleting_completed_plans_and_a_team_is_deferred_to_the_job(self):
+		plan = StudyPlan.objects.create(user=self.user, subject='Finished Calculus', goal='Goal', generated_plan='', is_completed=True)
+		kept = StudyPlan.objects.create(user=self.user, subject='Ongoing', goal='Goal', generated_plan='')
+		Todo.objects.create(user=self.user, title='From plan', study_plan=plan)
+		team = Team.objects.create(name='Crew', owner=self.user)
+		team.members.add(self.user)
+		Todo.objects.create(user=self.user, title='Team task', team=team, assignee=self.user)
+
+		self.client.post(reverse('delete_completed_plans'))
+		self.client.post(reverse('delete_team', args=[team.id]))
+		today = timezone.localdate()
+		agenda_days = self.client.get(reverse('agenda'), {'view': 'week', 'date': today.isoformat()}).json()['days']
+		self.assertNotIn('Finished Calculus', str(agenda_days))
+		self.assertIn('Ongoing', str(agenda_days))
+		self.assertEqual(self.client.get(reverse('search'), {'q': 'calculus', 'type': 'plans'}).json()['results'], [])
+		export = b''.join(self.client.get(reverse('export_data'), {'format': 'jsonl'}).streaming_content).decode()
+		self.assertNotIn('Finished Calculus', export)
+		feed = self.client.get(reverse('calendar_feed', args=[self.user.profile.get_calendar_token()]))
+		self.assertNotIn('Finished Calculus', b''.join(feed.streaming_content).decode())
+		plan_list = self.client.get(reverse('plan_list'))
+		self.assertNotContains(plan_list, 'Finished Calculus')
+		self.assertContains(plan_list, 'Ongoing')
+		self.assertEqual(self.client.get(reverse('view_study_plan', args=[plan.id])).status_code, 404)
+		self.assertEqual(self.client.get(reverse('team_dashboard', args=[team.id])).status_code, 404)
+		self.assertEqual(Todo.objects.count(), 2)
+
+		delete_study_plans.now(self.user.id)
+		delete_team_rows.now(team.id)
+		self.assertEqual(list(StudyPlan.objects.values_list('id', flat=True)), [kept.id])
+		self.assertFalse(Team.objects.exists())
+		self.assertFalse(Todo.objects.exists())
+
+
+	def test_deleting_one_plan_is_deferred_to_the_job(self):
+		plan = StudyPlan.objects.create(user=self.user, subject='Big plan', goal='Goal', generated_plan='')
+		Todo.objects.bulk_create([Todo(user=self.user, title=f'Day {day}', study_plan=plan) for day in range(50)])
+
+		with CaptureQueriesContext(connection) as queries:
+			response = self.client.post(reverse('delete_study_plan', args=[plan.id]))
+		self.assertFalse([query for query in queries if query['sql'].startswith('DELETE')])
+		self.assertRedirects(response, reverse('plan_list'))
+		self.assertEqual(self.client.get(reverse('view_study_plan', args=[plan.id])).status_code, 404)
+
+		delete_study_plans.now(self.user.id)
+		self.assertFalse(StudyPlan.objects.exists())
+		self.assertFalse(Todo.objects.exists())
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AsgiEventStreamTests(TransactionTestCase):
+	def test_stream_pushes_events_to_logged_in_tab(self):
+		from antiprocastination.asgi import application
+
+		cache.clear()
+		user = User.objects.create_user(username='streamer', password='Password@123')
+		self.client.login(username='streamer', password='Password@123')
+		session_id = self.client.cookies['sessionid'].value
+
+		async def run():
+			communicator = ApplicationCommunicator(application, {
+				'type': 'http',
+				'method': 'GET',
+				'path': '/events/stream/',
+				'headers': [(b'cookie', f'sessionid={session_id}'.encode())],
+			})
+			await communicator.send_input({'type': 'http.request'})
+			start = await communicator.receive_output(5)
+			await communicator.receive_output(5)  # retry hint
+
+			publish_event(user.id, 'timer', {'task_id': 1, 'seconds': 60, 'running': True})
+			chunk = await communicator.receive_output(5)
+
+			await communicator.send_input({'type': 'http.disconnect'})
+			await communicator.wait(5)
+			return start, chunk
+
+		start, chunk = async_to_sync(run)()
+		self.assertEqual(start['status'], 200)
+		self.assertIn(b'event: timer', chunk['body'])
+		self.assertIn(b'"seconds": 60', chunk['body'])
@@ -0,0 +1,59 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def client_ip(request):
+    proxy_count = getattr(settings, 'THROTTLE_PROXY_COUNT', 0)
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    if proxy_count and forwarded:
+        hops = [hop.strip() for hop in forwarded.split(',') if hop.strip()]
+        if len(hops) >= proxy_count:
+            # Entries left of the ones our own proxies appended are client-controlled.
+            return hops[-proxy_count]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _hit(scope, identity, limit, window, now):
+    """
+    Sliding-window counter: the previous fixed window is weighted by how much
+    of it still overlaps the sliding window. Two cache reads and one atomic
+    incr per identity, whatever the traffic volume.
+    """
+    digest = hashlib.sha256(identity.encode()).hexdigest()[:32]
+    bucket = int(now // window)
+    key = f"throttle:{scope}:{digest}:{bucket}"
+    previous_key = f"throttle:{scope}:{digest}:{bucket - 1}"
+
+    previous_count = cache.get(previous_key, 0)
+    cache.add(key, 0, timeout=window * 2)
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        # Key expired between add() and incr().
+        cache.set(key, 1, timeout=window * 2)
+        count = 1
+
+    overlap = 1 - (now % window) / window
+    return previous_count * overlap + count <= limit
+
+
+def is_throttled(request, scope, user_id=None, email=None):
+    """
+    Records an attempt for `scope` against the client IP and, when given,
+    the user id and email. Returns True if any of them is over its limit.
+    Callers check this before touching the database or sending mail.
+    """
+    limit, window = settings.THROTTLE_RATES[scope]
+    now = time.time()
+
+    identities = [f"ip:{client_ip(request)}"]
+    if user_id:
+        identities.append(f"user:{user_id}")
+    if email:
+        identities.append(f"email:{email.strip().lower()}")
+
+    allowed = [_hit(scope, identity, limit, window, now) for identity in identities]
+    return not all(allowed)
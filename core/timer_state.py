@@ -0,0 +1,189 @@
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Todo
+
+
+TIMER_TTL = 24 * 60 * 60
+DIRTY_KEY = 'timer:dirty'
+LOCK_TIMEOUT = 5
+
+
+def _key(task_id):
+    return f"timer:{task_id}"
+
+
+class LockTimeout(Exception):
+    """Another request held the timer lock for longer than LOCK_TIMEOUT."""
+
+
+@contextmanager
+def _locked(name):
+    """
+    Short mutex built on cache.add, which is atomic on every backend we use.
+    Raises LockTimeout rather than running the block unlocked, and only
+    releases a lock this call still owns.
+    """
+    lock_key = f"timer:lock:{name}"
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while not cache.add(lock_key, token, timeout=LOCK_TIMEOUT):
+        if time.monotonic() > deadline:
+            raise LockTimeout(name)
+        time.sleep(0.01)
+    try:
+        yield
+    finally:
+        # Past LOCK_TIMEOUT the key may already belong to someone else.
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+def _state_from_row(task_id, row):
+    started_at = row['timer_start_time']
+    return {
+        'task_id': task_id,
+        'user_id': row['user_id'],
+        'assignee_id': row['assignee_id'],
+        'estimate_minutes': row['time_estimate_minutes'],
+        'seconds': row['timer_seconds_remaining'],
+        'started_at': started_at.timestamp() if started_at else None,
+        # started_at is re-anchored by +5 min / edits; this keeps the real
+        # start for the focus ledger (best effort after a cold load).
+        'session_started_at': started_at.timestamp() if started_at else None,
+    }
+
+
+def state_for_task(task):
+    """Cached state if there is one, otherwise the state stored on the row."""
+    state = cache.get(_key(task.id))
+    if state is not None:
+        return state
+    return _state_from_row(task.id, {
+        'user_id': task.user_id,
+        'assignee_id': task.assignee_id,
+        'time_estimate_minutes': task.time_estimate_minutes,
+        'timer_seconds_remaining': task.timer_seconds_remaining,
+        'timer_start_time': task.timer_start_time,
+    })
+
+
+def load(task_id, user_id):
+    """
+    Returns the timer state for a task owned by `user_id`, or None. Only a
+    cold cache costs a (single, narrow) SELECT.
+    """
+    state = cache.get(_key(task_id))
+    if state is None:
+        row = (
+            Todo.objects.filter(id=task_id, user_id=user_id).exclude(status='DELETED')
+            .values('user_id', 'assignee_id', 'time_estimate_minutes', 'timer_seconds_remaining', 'timer_start_time')
+            .first()
+        )
+        if row is None:
+            return None
+        state = _state_from_row(task_id, row)
+        cache.set(_key(task_id), state, timeout=TIMER_TTL)
+    if state['user_id'] != user_id:
+        return None
+    return state
+
+
+def remaining_seconds(state):
+    if state['seconds'] is None:
+        return None
+    remaining = int(state['seconds'])
+    if state['started_at']:
+        remaining -= int(time.time() - state['started_at'])
+    return max(0, remaining)
+
+
+def default_seconds(state):
+    return max(60, int(state['estimate_minutes'] or 25) * 60)
+
+
+def _persist(state):
+    started_at = state['started_at']
+    Todo.objects.filter(id=state['task_id']).update(
+        timer_seconds_remaining=state['seconds'],
+        timer_start_time=datetime.fromtimestamp(started_at, tz=dt_timezone.utc) if started_at else None,
+    )
+
+
+def apply(task_id, user_id, change, transition):
+    """
+    Runs `change(state)` under the task's lock and stores the result;
+    None when the task isn't the user's or the lock couldn't be taken.
+    Transitions (start/pause) are written straight to the row; other edits
+    are left for flush_dirty() when TIMER_WRITE_BEHIND is on. Either way a
+    call makes at most one two-column UPDATE.
+    """
+    try:
+        with _locked(task_id):
+            state = load(task_id, user_id)
+            if state is None:
+                return None
+            state = change(state)
+            if state is None:
+                return None
+            cache.set(_key(task_id), state, timeout=TIMER_TTL)
+    except LockTimeout:
+        return None
+
+    if transition or not getattr(settings, 'TIMER_WRITE_BEHIND', False):
+        _persist(state)
+        return state
+    try:
+        with _locked('dirty'):
+            dirty = cache.get(DIRTY_KEY) or set()
+            dirty.add(task_id)
+            cache.set(DIRTY_KEY, dirty, timeout=None)
+    except LockTimeout:
+        # Can't queue it for the flush job, so write it through instead.
+        _persist(state)
+    return state
+
+
+def stop(state):
+    """Change function for apply(): pauses a timer, keeping what is left."""
+    remaining = remaining_seconds(state)
+    if remaining is None:
+        return None
+    state['seconds'] = remaining
+    state['started_at'] = None
+    state['session_started_at'] = None
+    return state
+
+
+def forget(task_id):
+    """Drops cached state after the row's timer columns were changed directly."""
+    cache.delete(_key(task_id))
+
+
+def flush_dirty(batch_size=500):
+    """Writes buffered timer edits back to Todo rows; returns the row count."""
+    try:
+        with _locked('dirty'):
+            dirty = cache.get(DIRTY_KEY) or set()
+            cache.delete(DIRTY_KEY)
+    except LockTimeout:
+        return 0  # the next run picks them up
+    if not dirty:
+        return 0
+
+    keys = [_key(task_id) for task_id in dirty]
+    rows = []
+    for state in cache.get_many(keys).values():
+        started_at = state['started_at']
+        rows.append(Todo(
+            id=state['task_id'],
+            timer_seconds_remaining=state['seconds'],
+            timer_start_time=datetime.fromtimestamp(started_at, tz=dt_timezone.utc) if started_at else None,
+        ))
+    Todo.objects.bulk_update(rows, ['timer_seconds_remaining', 'timer_start_time'], batch_size=batch_size)
+    return len(rows)
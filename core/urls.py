@@ -19,6 +19,18 @@ urlpatterns = [
     path('task/pause/<int:task_id>/', views.pause_task_timer, name='pause_task_timer'),
     path('task/edit_time/<int:task_id>/', views.edit_task_timer, name='edit_task_timer'),
     path('task/status/<int:task_id>/', views.task_timer_status, name='task_timer_status'),
+    path('events/stream/', views.event_stream_unavailable, name='event_stream'),
+    path('events/poll/', views.event_poll_view, name='event_poll'),
+
+    path('agenda/', views.agenda_view, name='agenda'),
+    path('calendar/<str:token>.ics', views.calendar_feed_view, name='calendar_feed'),
+    path('search/', views.search_view, name='search'),
+    path('sync/', views.sync_view, name='sync'),
+
+    path('export/', views.export_data_view, name='export_data'),
+    path('export/request/', views.request_data_export_view, name='request_data_export'),
+    path('export/<int:export_id>/download/', views.download_data_export_view, name='download_data_export'),
+    path('import/', views.import_tasks_view, name='import_tasks'),
     
 
     path('history/', views.task_history_view, name='task_history'),
@@ -42,6 +54,10 @@ urlpatterns = [
     path('generate-plan/', views.create_study_plan_view, name='generate_plan'),
         path('kanban/', views.kanban_board_view, name='kanban_board'),
         path('kanban/update-status/<int:task_id>/', views.update_task_status_view, name='update_task_status'),
+    path('tasks/<int:task_id>/move/', views.move_task_view, name='move_task'),
+    path('subtasks/<int:subtask_id>/toggle/', views.toggle_subtask_view, name='toggle_subtask'),
+    path('tasks/bulk/', views.bulk_task_action_view, name='bulk_task_action'),
+    path('tasks/auto-schedule/', views.auto_schedule_view, name='auto_schedule'),
 
     path('study-plan/create/', views.create_study_plan_view, name='create_study_plan'),
     path('study-plan/<int:plan_id>/', views.view_study_plan_view, name='view_study_plan'),
@@ -49,6 +65,10 @@ urlpatterns = [
 
     path('plans/', views.plan_list, name='plan_list'),
 
+    path('study-plan/<int:plan_id>/regenerate/', views.regenerate_plan_days_view, name='regenerate_plan_days'),
+    path('study-plan/<int:plan_id>/progress/', views.study_plan_progress_view, name='study_plan_progress'),
+    path('study-plan/<int:plan_id>/schedule/', views.schedule_study_plan_view, name='schedule_study_plan'),
+
     path('study-plan/<int:plan_id>/delete/', views.delete_study_plan_view, name='delete_study_plan'),
 
     path('study-plan/<int:plan_id>/complete/', views.complete_study_plan_view, name='complete_study_plan'),
@@ -1,26 +1,40 @@
+import json
 import logging
 import os
 import random
 import re
+import time
+from types import SimpleNamespace
 
 import markdown as md
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.utils import timezone
-from datetime import timedelta, date
-from django.http import JsonResponse
+from datetime import timedelta, date, time as datetime_time
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.db import transaction
 from .models import Todo as Task, Profile, Badge, UserBadge, Team, User, StudyPlan
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from itertools import groupby
-from .ai_service import call_groq_api, generate_study_plan_with_ai
+from .ai_service import call_groq_api, contains_blocked_content
 from django.db.models import Q
 from django.db.models import Count
+from django.db.models import F
+from django.db.models import Max
 from django.db.models.functions import ExtractHour
 from .models import Team, Todo
-from django.core.mail import send_mail
-from django.conf import settings
-from .models import OTPVerification
+from .models import OTPVerification, ScheduledReminder, EmailOutbox, RecurrenceRule, OccurrenceOverride, DataExport, SubTask
+from .recurrence import RECURRENCE_PRESETS, next_occurrence
+from .email_service import email_delivery_error
+from .throttle import is_throttled
+from .events import events_since, latest_event_id, publish_event, publish_task_batch_event, publish_task_event
+from . import agenda, conditional, export, focus, forecast, importer, plans, rendering, scheduler, search, subtasks, suggest, sync, timer_state
+from .tasks import (
+    build_data_export, delete_study_plans, delete_task_history, delete_team_rows, enrich_imported_tasks, generate_study_plan,
+)
 from django.contrib import messages
 from better_profanity import profanity
 
@@ -36,42 +50,6 @@ from .ai_service import (
 logger = logging.getLogger(__name__)
 
 
-def parse_plan_days(plan_text):
-    """
-    Returns list of dicts: [{'day': 1, 'title': 'Title', 'content': '...'}, ...]
-    Robustly extracts blocks that start with "## Day N: Title" (case-insensitive).
-    Works with the AI output format your app expects.
-    """
-    pattern = r'##\s*Day\s*(\d+)\s*:?\s*([^\n\r]+)\s*(.*?)(?=(?:##\s*Day\s*\d+\s*:)|\Z)'
-    matches = re.findall(pattern, plan_text, flags=re.IGNORECASE | re.DOTALL)
-    days = []
-    for num_str, title, content in matches:
-        try:
-            num = int(num_str)
-        except ValueError:
-            continue
-        days.append({
-            'day': num,
-            'title': title.strip(),
-            'content': content.strip()
-        })
-    days.sort(key=lambda d: d['day'])
-    return days
-
-
-BLOCKED_AI_PATTERN = re.compile(
-    r'(sex|sexual|porn|pornography|nude|nudes|hookup|explicit|erotic|intimacy tips|kiss|physical relation|bedroom|adult\s*content|\bxxx\b|\b18\+\b)',
-    re.IGNORECASE,
-)
-
-
-def _contains_blocked_ai_content(*texts):
-    for text in texts:
-        if text and BLOCKED_AI_PATTERN.search(str(text)):
-            return True
-    return False
-
-
 def _can_manage_task(user, task):
     if task.user_id == user.id:
         return True
@@ -82,32 +60,32 @@ def _can_manage_task(user, task):
     return False
 
 
-def _get_task_timer_remaining_seconds(task):
-    if task.timer_seconds_remaining is None:
-        return None
+def _publish_timer_event(state):
+    seconds = timer_state.remaining_seconds(state)
+    running = bool(state['started_at'])
+    for user_id in {state['user_id'], state['assignee_id']} - {None}:
+        publish_event(user_id, 'timer', {'task_id': state['task_id'], 'seconds': seconds, 'running': running})
+    return seconds, running
+
 
-    remaining = int(task.timer_seconds_remaining)
-    if task.timer_start_time:
-        elapsed = int((timezone.now() - task.timer_start_time).total_seconds())
-        remaining = max(0, remaining - elapsed)
-    return max(0, remaining)
 
 
+XP_BY_DIFFICULTY = {'Easy': 15, 'Moderate': 25, 'Hard': 40}
 
 
-def award_xp_and_level_up(user, task_difficulty):
-    """Awards XP based on task difficulty and handles level ups."""
+def award_xp_and_level_up(user, task_difficulty, xp_to_add=None):
+    """Awards XP based on task difficulty (or a precomputed batch total) and handles level ups."""
     profile, created = Profile.objects.get_or_create(user=user)
     
-    xp_map = {'Easy': 15, 'Moderate': 25, 'Hard': 40}
-    xp_to_add = xp_map.get(task_difficulty, 25)
+    if xp_to_add is None:
+        xp_to_add = XP_BY_DIFFICULTY.get(task_difficulty, 25)
     
     profile.xp += xp_to_add
     
-    xp_for_next_level = profile.level * 100
-    if profile.xp >= xp_for_next_level:
+    # Bulk completions can cross more than one level in a single award
+    while profile.xp >= profile.level * 100:
+        profile.xp -= profile.level * 100
         profile.level += 1
-        profile.xp -= xp_for_next_level 
     
     profile.save()
     
@@ -173,7 +151,7 @@ def create_study_plan_view(request):
         subject = request.POST.get('subject')
         goal = request.POST.get('goal')
 
-        if _contains_blocked_ai_content(subject, goal):
+        if contains_blocked_content(subject, goal):
             messages.error(request, "This topic is not allowed. Please use a study-focused and safe topic.")
             return render(request, 'core/create_study_plan.html')
         
@@ -187,32 +165,11 @@ def create_study_plan_view(request):
              return render(request, 'core/create_study_plan.html')
 
         if subject and goal:
-            plan_text = generate_study_plan_with_ai(subject, goal, duration_days)
+            # The AI calls run in the background; the plan page shows progress until it's READY.
+            new_plan = plans.start_generation(user, subject, goal, duration_days)
+            generate_study_plan(new_plan.id)
 
-            if _contains_blocked_ai_content(plan_text):
-                messages.error(request, "Generated plan was blocked due to unsafe content. Please try a different topic.")
-                return render(request, 'core/create_study_plan.html')
-            
-            if not plan_text or "Could not generate" in plan_text:
-                messages.error(request, "The AI failed to generate a plan. Please try again.")
-                return render(request, 'core/create_study_plan.html')
-
-            
-            today = timezone.now().date()
-            end_date_calc = today + timedelta(days=duration_days - 1)
-
-            new_plan = StudyPlan.objects.create(
-                user=user, 
-                subject=subject, 
-                goal=goal,
-                duration_days=duration_days, 
-                generated_plan=plan_text,
-                start_date=today,      
-                end_date=end_date_calc, 
-                is_active=True
-            )
-            
-            messages.success(request, "Your AI plan has been generated!")
+            messages.success(request, "Your AI plan is being generated. It will appear here in a moment.")
             return redirect('view_study_plan', plan_id=new_plan.id) 
         else:
             messages.error(request, "Please fill in all fields.")
@@ -220,48 +177,33 @@ def create_study_plan_view(request):
     return render(request, 'core/create_study_plan.html')
 
 
-@login_required
-def view_study_plan_view(request, plan_id):
-    plan = get_object_or_404(StudyPlan, id=plan_id, user=request.user)
+def _study_plan_stamps(request, plan_id):
+    stamp = StudyPlan.objects.filter(id=plan_id, user=request.user).values_list('last_updated', flat=True).first()
+    return None if stamp is None else [stamp]
 
-    plan_structure = []
-    days = parse_plan_days(plan.generated_plan)
 
-    for d in days:
-        
-        lines = d['content'].splitlines()
-        tasks = []
-        fallback_lines = []
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            if line.startswith(('-', '*')) or re.match(r'^\d+\.', line):
-            
-                task_text = re.sub(r'^[\-\*\d\.\s]+', '', line).strip()
-                if task_text:
-                    processed_line = re.sub(r'\*\*(.*?)\*\*', r'<strong style="color: var(--accent-color);">\1</strong>', task_text)
-                    processed_line = re.sub(r'\*(.*?)\*', r'<em class="text-secondary" style="font-weight: 500;">\1</em>', processed_line)
-                    processed_line = re.sub(r'\_(.*?)\_', r'<em class="text-secondary" style="font-weight: 500;">\1</em>', processed_line)
-                    tasks.append(processed_line)
-            elif not line.startswith('#'):
-                fallback_lines.append(line)
-
-        if not tasks and fallback_lines:
-            tasks = fallback_lines
-
-        if tasks:
-            # Keep URL param slash-safe by passing only day number token.
-            day_key = f"Day {d['day']}"
-            pretty_title = f"Day {d['day']} {d['title']}"
-            plan_structure.append((day_key, pretty_title, tasks))
+@login_required
+@conditional.conditional_page(_study_plan_stamps)
+def view_study_plan_view(request, plan_id):
+    plan = get_object_or_404(StudyPlan, id=plan_id, user=request.user, pending_deletion=False)
+    # Memoised by content hash, so a 90-day plan is only parsed once.
+    plan_structure = rendering.plan_structure(plan.generated_plan)
 
     context = {
         'plan': plan,
-        'plan_structure': plan_structure
+        'plan_structure': plan_structure,
+        'max_regenerate_days': plans.MAX_REGENERATE_DAYS,
+        'progress': None if plan.generation_status == 'READY' else plans.generation_progress(plan),
     }
     return render(request, 'core/view_study_plan.html', context)
 
+
+@login_required
+def study_plan_progress_view(request, plan_id):
+    """Polled by the plan page while the background job writes the plan."""
+    plan = get_object_or_404(StudyPlan.objects.only('id', 'duration_days', 'generation_status'), id=plan_id, user=request.user, pending_deletion=False)
+    return JsonResponse(plans.generation_progress(plan))
+
 # core/views.py
 from django.db.models import Q
 from .models import Todo, Profile, StudyPlan # Dono models ko import karein
@@ -292,10 +234,11 @@ def personal_dashboard_view(request):
         .order_by('scheduled_date', 'created')
     )
 
-    active_task = all_my_tasks.filter(status='ACTIVE').first()
+    active_task = all_my_tasks.filter(status='ACTIVE').prefetch_related('subtasks').first()
     show_mood = True if not active_task else False
-    active_timer_seconds = _get_task_timer_remaining_seconds(active_task) if active_task else None
-    active_timer_running = bool(active_task and active_task.timer_start_time and active_timer_seconds and active_timer_seconds > 0)
+    active_timer = timer_state.state_for_task(active_task) if active_task else None
+    active_timer_seconds = timer_state.remaining_seconds(active_timer) if active_timer else None
+    active_timer_running = bool(active_timer and active_timer['started_at'] and active_timer_seconds and active_timer_seconds > 0)
     
     # UP NEXT: Inbox waale wo tasks jo upar assigned section mein nahi hain
     pending_tasks = all_my_tasks.filter(status='INBOX').exclude(
@@ -342,7 +285,7 @@ def kanban_board_view(request):
 
 @login_required
 def update_task_status_view(request, task_id):
-    task = get_object_or_404(Todo, id=task_id)
+    task = get_object_or_404(Todo.objects.exclude(status='DELETED'), id=task_id)
 
     if not _can_manage_task(request.user, task):
         messages.error(request, "You do not have permission to update this task.")
@@ -357,7 +300,11 @@ def update_task_status_view(request, task_id):
                 task.datecompleted = timezone.now()
             else:
                 task.datecompleted = None
-            task.save(update_fields=['status', 'datecompleted'])
+            with transaction.atomic():
+                if new_status == 'ACTIVE':
+                    suggest.demote_active(suggest.active_owner(task), keep=task.id)
+                task.save(update_fields=['status', 'datecompleted'])
+            publish_task_event(task, 'task', status=task.status)
             messages.success(request, f"Task moved to {new_status.title()}.")
         else:
             messages.error(request, "Invalid status update.")
@@ -365,6 +312,327 @@ def update_task_status_view(request, task_id):
     return redirect('kanban_board')
 
 
+@login_required
+def toggle_subtask_view(request, subtask_id):
+    """Ticks or unticks one step ({"done": true|false}) with a single-row UPDATE."""
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'POST required.'}, status=405)
+    try:
+        done = bool(json.loads(request.body or b'{}')['done'])
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({'status': 'error', 'message': 'Send JSON with done.'}, status=400)
+
+    user = request.user
+    updated = SubTask.objects.filter(id=subtask_id).exclude(task__status='DELETED').filter(
+        Q(task__user=user) | Q(task__assignee=user) | Q(task__team__owner=user)
+    ).update(is_done=done, completed_at=timezone.now() if done else None)
+    if not updated:
+        return JsonResponse({'status': 'error', 'message': 'Step not found.'}, status=404)
+    return JsonResponse({'status': 'ok', 'id': subtask_id, 'done': done})
+
+
+KANBAN_CARD_FIELDS = ('id', 'title', 'status', 'priority', 'version', 'datecompleted')
+
+
+def _kanban_card(row):
+    return {**row, 'priority_display': dict(Todo.PRIORITY_CHOICES).get(row['priority'])}
+
+
+@login_required
+def move_task_view(request, task_id):
+    """
+    JSON version of update_task_status_view for the board's drag-and-drop.
+    Takes {"status", "version"} and applies the move with
+    UPDATE ... WHERE version = n, so an edit made in another tab (or by a
+    teammate) since the card was rendered comes back as a 409 carrying the
+    current card instead of being overwritten. Only the moved card is sent
+    back; the board isn't re-queried or re-rendered.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'POST required.'}, status=405)
+    try:
+        payload = json.loads(request.body or b'{}')
+        new_status = payload['status']
+        version = int(payload['version'])
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({'status': 'error', 'message': 'Send JSON with status and version.'}, status=400)
+    if new_status not in {'INBOX', 'ACTIVE', 'COMPLETED'}:
+        return JsonResponse({'status': 'error', 'message': 'Invalid status update.'}, status=400)
+
+    card = (
+        _manageable_tasks(request.user, [task_id])
+        .values(*KANBAN_CARD_FIELDS, 'user_id', 'assignee_id').first()
+    )
+    if card is None:
+        return JsonResponse({'status': 'error', 'message': 'Task not found.'}, status=404)
+    if card['version'] != version:
+        return JsonResponse({'status': 'conflict', 'card': _kanban_card(
+            {field: card[field] for field in KANBAN_CARD_FIELDS}
+        )}, status=409)
+
+    now = timezone.now()
+    changes = {
+        'status': new_status,
+        'datecompleted': now if new_status == 'COMPLETED' else None,
+        'version': version + 1,
+        'last_updated': now,
+    }
+    with transaction.atomic():
+        if new_status == 'ACTIVE':
+            # Only one ACTIVE card per person: whatever was in progress goes back to the inbox.
+            suggest.demote_active(suggest.active_owner(card), keep=task_id, now=now)
+        # The version check is repeated in the UPDATE itself, so two moves
+        # racing past the read above still can't both win.
+        if not Todo.objects.filter(id=task_id, version=version).update(**changes):
+            transaction.set_rollback(True)
+            card = Todo.objects.filter(id=task_id).values(*KANBAN_CARD_FIELDS).first()
+            return JsonResponse({'status': 'conflict', 'card': card and _kanban_card(card)}, status=409)
+        # INBOX and ACTIVE share the same reminders; only crossing COMPLETED changes them.
+        if 'COMPLETED' in (card['status'], new_status) and card['status'] != new_status:
+            ScheduledReminder.sync_for_tasks([task_id])
+
+    # update() skips the signals, so the history/profile validators are bumped here.
+    conditional.bump_page_version(card['user_id'], card['assignee_id'])
+    publish_task_event(SimpleNamespace(**card), 'task', status=new_status)
+    card.update(changes)
+    return JsonResponse({'status': 'ok', 'card': _kanban_card(
+        {field: card[field] for field in KANBAN_CARD_FIELDS}
+    )})
+
+
+BULK_ACTIONS = {'status', 'complete', 'delete', 'reschedule', 'reprioritise'}
+BULK_MAX_TASKS = 500
+
+
+def _manageable_tasks(user, task_ids):
+    """_can_manage_task() for a whole set of ids in one query."""
+    return Todo.objects.filter(id__in=task_ids).exclude(status='DELETED').filter(
+        Q(user=user) | Q(assignee=user) | Q(team__owner=user)
+    )
+
+
+def _bulk_payload(request):
+    if request.content_type == 'application/json':
+        try:
+            payload = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        return payload if isinstance(payload, dict) else None
+    return {
+        'action': request.POST.get('action'),
+        'task_ids': request.POST.getlist('task_ids'),
+        'status': request.POST.get('status'),
+        'scheduled_date': request.POST.get('scheduled_date'),
+        'priority': request.POST.get('priority'),
+    }
+
+
+def _bulk_complete(user, rows):
+    """
+    Completes a batch: set-based UPDATEs for the plain tasks, one
+    bulk_update for recurring ones moving to their next occurrence, and
+    XP/badges awarded once for the whole batch.
+    """
+    rows = [row for row in rows if row['status'] != 'COMPLETED']
+    if not rows:
+        return 0, 0
+    now = timezone.now()
+    ids = [row['id'] for row in rows]
+
+    for row in rows:
+        if row['timer_start_time']:
+            # Running timers close their focus stretch, same as complete_task
+            state = timer_state.load(row['id'], row['user_id'])
+            if state and state['started_at']:
+                focus.close_session(state)
+                Todo.objects.filter(id=row['id']).update(timer_seconds_remaining=timer_state.remaining_seconds(state))
+        timer_state.forget(row['id'])
+
+    rules = {
+        rule.task_id: rule
+        for rule in RecurrenceRule.objects.filter(task_id__in=[row['id'] for row in rows if row['is_recurring']])
+    }
+    overrides, rolled = [], []
+    for row in rows:
+        rule = rules.get(row['id'])
+        if rule is None:
+            continue
+        base_date = row['scheduled_date'] or now.date()
+        overrides.append(OccurrenceOverride(task_id=row['id'], date=base_date, status='COMPLETED', completed_at=now))
+        next_date = next_occurrence(rule, base_date)
+        if next_date:
+            rolled.append(Todo(
+                id=row['id'], status='INBOX', datecompleted=None, scheduled_date=next_date,
+                last_completed=now.date(), timer_start_time=None, timer_seconds_remaining=None, last_updated=now,
+                version=F('version') + 1,
+            ))
+    rolled_ids = {task.id for task in rolled}
+
+    with transaction.atomic():
+        Todo.objects.filter(id__in=ids, team__isnull=False, assignee__isnull=True).update(assignee=user)
+        Todo.objects.filter(id__in=ids).exclude(id__in=rolled_ids).update(
+            status='COMPLETED', datecompleted=now, timer_start_time=None, last_updated=now,
+            version=F('version') + 1,
+        )
+        OccurrenceOverride.objects.bulk_create(overrides, ignore_conflicts=True)
+        Todo.objects.bulk_update(rolled, [
+            'status', 'datecompleted', 'scheduled_date', 'last_completed',
+            'timer_start_time', 'timer_seconds_remaining', 'last_updated', 'version',
+        ])
+        ScheduledReminder.sync_for_tasks(ids)
+    conditional.bump_page_version(*{user_id for row in rows for user_id in (row['user_id'], row['assignee_id'])})
+
+    xp = sum(XP_BY_DIFFICULTY.get(row['difficulty'], 25) for row in rows)
+    award_xp_and_level_up(user, None, xp_to_add=xp)
+    # Badge rules only look at difficulty, age and completion time, so one
+    # check against the batch's hardest/oldest values covers every task.
+    check_and_award_badges(user, SimpleNamespace(
+        difficulty='Hard' if any(row['difficulty'] == 'Hard' for row in rows) else rows[0]['difficulty'],
+        created=min(row['created'] for row in rows),
+        datecompleted=now,
+    ))
+    return len(rows), xp
+
+
+@login_required
+def bulk_task_action_view(request):
+    """
+    Applies one action to many tasks: status / complete / delete /
+    reschedule / reprioritise. Takes JSON or form data with `task_ids`;
+    ids the user may not manage are skipped and returned as `denied`.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'POST required.'}, status=405)
+
+    payload = _bulk_payload(request)
+    if payload is None:
+        return JsonResponse({'status': 'error', 'message': 'Invalid JSON body.'}, status=400)
+    action = payload.get('action')
+    if action not in BULK_ACTIONS:
+        return JsonResponse({'status': 'error', 'message': 'Unknown action.'}, status=400)
+    try:
+        task_ids = {int(task_id) for task_id in payload.get('task_ids') or []}
+    except (TypeError, ValueError):
+        return JsonResponse({'status': 'error', 'message': 'task_ids must be numbers.'}, status=400)
+    if not task_ids or len(task_ids) > BULK_MAX_TASKS:
+        return JsonResponse({'status': 'error', 'message': f'Select between 1 and {BULK_MAX_TASKS} tasks.'}, status=400)
+
+    rows = list(_manageable_tasks(request.user, task_ids).values(
+        'id', 'user_id', 'assignee_id', 'status', 'difficulty', 'created',
+        'is_recurring', 'scheduled_date', 'timer_start_time',
+    ))
+    ids = [row['id'] for row in rows]
+    denied = sorted(task_ids - set(ids))
+    now = timezone.now()
+    xp_awarded = 0
+
+    if action == 'status':
+        new_status = payload.get('status')
+        if new_status not in {'INBOX', 'ACTIVE', 'COMPLETED'}:
+            return JsonResponse({'status': 'error', 'message': 'Invalid status update.'}, status=400)
+        if new_status == 'ACTIVE' and len(ids) > 1:
+            return JsonResponse({'status': 'error', 'message': 'Only one task can be active at a time.'}, status=400)
+        with transaction.atomic():
+            if new_status == 'ACTIVE' and rows:
+                suggest.demote_active(suggest.active_owner(rows[0]), keep=ids[0], now=now)
+            updated = Todo.objects.filter(id__in=ids).update(
+                status=new_status,
+                datecompleted=now if new_status == 'COMPLETED' else None,
+                last_updated=now,
+                version=F('version') + 1,
+            )
+            # INBOX and ACTIVE share the same reminders; only crossing COMPLETED changes them.
+            ScheduledReminder.sync_for_tasks([
+                row['id'] for row in rows if 'COMPLETED' in (row['status'], new_status) and row['status'] != new_status
+            ])
+        event_status = new_status
+    elif action == 'complete':
+        updated, xp_awarded = _bulk_complete(request.user, rows)
+        event_status = 'COMPLETED'
+    elif action == 'delete':
+        for task_id in ids:
+            timer_state.forget(task_id)
+        # Soft delete: the rows stay behind as sync tombstones.
+        with transaction.atomic():
+            updated = Todo.objects.filter(id__in=ids).update(
+                status='DELETED', timer_start_time=None, last_updated=now, version=F('version') + 1,
+            )
+            ScheduledReminder.sync_for_tasks(ids)
+        event_status = 'DELETED'
+    elif action == 'reschedule':
+        try:
+            scheduled_date = date.fromisoformat(payload.get('scheduled_date') or '')
+        except ValueError:
+            return JsonResponse({'status': 'error', 'message': 'scheduled_date must be YYYY-MM-DD.'}, status=400)
+        with transaction.atomic():
+            updated = Todo.objects.filter(id__in=ids).update(
+                scheduled_date=scheduled_date, last_updated=now, version=F('version') + 1,
+            )
+            # Tasks already on that day keep their (possibly sent) reminders.
+            ScheduledReminder.sync_for_tasks([row['id'] for row in rows if row['scheduled_date'] != scheduled_date])
+        event_status = None
+    else:
+        try:
+            priority = int(payload.get('priority'))
+        except (TypeError, ValueError):
+            priority = None
+        if priority not in (1, 2, 3):
+            return JsonResponse({'status': 'error', 'message': 'priority must be 1, 2 or 3.'}, status=400)
+        updated = Todo.objects.filter(id__in=ids).update(priority=priority, last_updated=now, version=F('version') + 1)
+        event_status = None
+
+    # Every action writes with update(), which skips the page-version signals.
+    conditional.bump_page_version(*{user_id for row in rows for user_id in (row['user_id'], row['assignee_id'])})
+    publish_task_batch_event(rows, 'task', status=event_status, action=action)
+    return JsonResponse({
+        'status': 'ok',
+        'action': action,
+        'updated': updated,
+        'denied': denied,
+        'xp_awarded': xp_awarded,
+    })
+
+
+@login_required
+def auto_schedule_view(request):
+    """
+    Packs the user's unscheduled INBOX tasks into the next `days` days under
+    `capacity_minutes` per day ({"days", "capacity_minutes", "preview"}).
+    Without capacity_minutes, the user's forecast capacity is used. With
+    preview, the proposed dates come back and nothing is saved.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'POST required.'}, status=405)
+    payload = _bulk_payload(request)
+    if payload is None:
+        return JsonResponse({'status': 'error', 'message': 'Invalid JSON body.'}, status=400)
+    try:
+        days = int(payload.get('days', scheduler.SCHEDULE_DAYS))
+        # Left out, the user's forecast capacity applies.
+        capacity = int(payload['capacity_minutes']) if payload.get('capacity_minutes') is not None else None
+    except (TypeError, ValueError):
+        return JsonResponse({'status': 'error', 'message': 'days and capacity_minutes must be numbers.'}, status=400)
+    if not 1 <= days <= scheduler.MAX_SCHEDULE_DAYS or not 1 <= (capacity or 1) <= scheduler.MAX_CAPACITY_MINUTES:
+        return JsonResponse({
+            'status': 'error',
+            'message': f'days must be 1-{scheduler.MAX_SCHEDULE_DAYS} and capacity_minutes 1-{scheduler.MAX_CAPACITY_MINUTES}.',
+        }, status=400)
+    preview = payload.get('preview') in (True, 'true', '1', 'on')
+
+    rows, unscheduled = scheduler.auto_schedule(request.user, days=days, capacity=capacity, preview=preview)
+    if rows and not preview:
+        publish_task_batch_event(rows, 'task', action='reschedule')
+    return JsonResponse({
+        'status': 'ok',
+        'preview': preview,
+        'scheduled': [
+            {field: row[field] for field in ('id', 'title', 'scheduled_date', 'time_estimate_minutes')}
+            for row in rows
+        ],
+        'unscheduled': unscheduled,
+    })
+
+
 @login_required
 def createtodo_ai(request):
     if request.method == 'POST':
@@ -380,12 +648,12 @@ def createtodo_ai(request):
             priority_val = 2
 
         recurring_type = request.POST.get('recurring_type', '')
-        if recurring_type not in ['DAILY', 'WEEKLY']:
+        if recurring_type not in RECURRENCE_PRESETS:
             recurring_type = ''
-        is_recurring = recurring_type in ['DAILY', 'WEEKLY']
+        is_recurring = recurring_type in RECURRENCE_PRESETS
 
         if user_sentence:
-            if _contains_blocked_ai_content(user_sentence):
+            if contains_blocked_content(user_sentence):
                 messages.error(request, "This task topic is not allowed. Please enter a safe productivity task.")
                 return redirect('personal_dashboard')
 
@@ -400,7 +668,7 @@ def createtodo_ai(request):
                 category=category, 
                 difficulty=difficulty,
                 time_estimate_minutes=time_estimate, 
-                sub_tasks=sub_tasks_list,
+                sub_tasks=subtasks.search_text(sub_tasks_list),
                 status='INBOX',
                 priority=priority_val,
                 team=None,
@@ -408,11 +676,11 @@ def createtodo_ai(request):
                 is_recurring=is_recurring,
                 recurring_type=recurring_type,
             )
+            SubTask.objects.bulk_create(subtasks.build_subtasks(new_task, sub_tasks_list))
+            if is_recurring:
+                RecurrenceRule.from_preset(new_task, recurring_type)
             messages.success(request, f"✅ '{new_task.title}' added to inbox! Now pick your mood to start it.")
 
-            if isinstance(sub_tasks_list, list):
-                 sub_tasks_list = " ".join(sub_tasks_list)
-
            
 
             
@@ -429,9 +697,9 @@ def add_task_manual(request):
         # --- NAYI DATE VALUE LO ---
         scheduled_date = request.POST.get('scheduled_date')
         recurring_type = request.POST.get('recurring_type', '')
-        if recurring_type not in ['DAILY', 'WEEKLY']:
+        if recurring_type not in RECURRENCE_PRESETS:
             recurring_type = ''
-        is_recurring = recurring_type in ['DAILY', 'WEEKLY']
+        is_recurring = recurring_type in RECURRENCE_PRESETS
         
         # Agar user date nahi dalta (waise humne required kiya hai), 
         # toh default aaj ki date rakho
@@ -439,7 +707,7 @@ def add_task_manual(request):
             scheduled_date = timezone.now().date()
 
         if title:
-            Task.objects.create(
+            new_task = Task.objects.create(
                 user=user, 
                 title=title, 
                 status='INBOX', 
@@ -448,6 +716,8 @@ def add_task_manual(request):
                 is_recurring=is_recurring,
                 recurring_type=recurring_type,
             )
+            if is_recurring:
+                RecurrenceRule.from_preset(new_task, recurring_type)
             
     return redirect('personal_dashboard')
 
@@ -456,7 +726,7 @@ def add_task_manual(request):
 
 @login_required
 def complete_task(request, task_id):
-    task = get_object_or_404(Task, id=task_id)
+    task = get_object_or_404(Task.objects.exclude(status='DELETED'), id=task_id)
     
     can_complete = False
     if task.team is None and task.user == request.user: 
@@ -479,18 +749,36 @@ def complete_task(request, task_id):
     if task.team and not task.assignee:
         task.assignee = request.user
 
+    timer = timer_state.state_for_task(task)
+    if timer['started_at']:
+        # Completing a task ends its focus stretch and stops the clock.
+        focus.close_session(timer)
+        task.timer_seconds_remaining = timer_state.remaining_seconds(timer)
+        task.timer_start_time = None
+    timer_state.forget(task.id)
+
     task.save()
     
     award_xp_and_level_up(request.user, task.difficulty)
     check_and_award_badges(request.user, task)
     
-    if task.is_recurring and task.recurring_type in ['DAILY', 'WEEKLY']:
-        next_days = 1 if task.recurring_type == 'DAILY' else 7
+    # Recurring: is occurrence ko override table mein mark karo, row agle occurrence pe chali jaati hai
+    rule = RecurrenceRule.objects.filter(task=task).first() if task.is_recurring else None
+    next_date = None
+    if rule:
         base_date = task.scheduled_date or completion_time.date()
+        OccurrenceOverride.objects.update_or_create(
+            task=task,
+            date=base_date,
+            defaults={'status': 'COMPLETED', 'completed_at': completion_time},
+        )
+        next_date = next_occurrence(rule, base_date)
+
+    if next_date:
         task.last_completed = completion_time.date()
         task.status = 'INBOX'
         task.datecompleted = None
-        task.scheduled_date = base_date + timedelta(days=next_days)
+        task.scheduled_date = next_date
         task.timer_start_time = None
         task.timer_seconds_remaining = None
         task.save(update_fields=[
@@ -505,6 +793,7 @@ def complete_task(request, task_id):
         messages.success(request, f"Recurring task '{task.title}' reset for next cycle.")
     else:
         messages.success(request, f"Task '{task.title}' completed!")
+    publish_task_event(task, 'task', status=task.status)
     
    
     request.session['show_mood_prompt'] = True
@@ -517,7 +806,7 @@ def complete_task(request, task_id):
 
 @login_required
 def delete_task(request, task_id):
-    task = get_object_or_404(Task, id=task_id)
+    task = get_object_or_404(Task.objects.exclude(status='DELETED'), id=task_id)
    
     can_delete = False
     
@@ -531,7 +820,12 @@ def delete_task(request, task_id):
         can_delete = True
 
     if can_delete:
-        task.delete()
+        publish_task_event(task, 'task', status='DELETED')
+        timer_state.forget(task.id)
+        # Kept as a tombstone so synced clients learn about the delete.
+        task.status = 'DELETED'
+        task.timer_start_time = None
+        task.save(update_fields=['status', 'timer_start_time'])
         messages.success(request, f"Task '{task.title}' has been deleted.")
       
         request.session['show_mood_prompt'] = True
@@ -546,10 +840,11 @@ def delete_task(request, task_id):
 
 @login_required
 def snooze_task(request, task_id):
-    task = get_object_or_404(Task, id=task_id, user=request.user)
+    task = get_object_or_404(Task.objects.exclude(status='DELETED'), id=task_id, user=request.user)
     task.status = 'INBOX'
     task.snoozed_until = timezone.now() + timedelta(hours=1)
     task.save()
+    publish_task_event(task, 'task', status=task.status)
    
     next_task = Task.objects.filter(user=request.user, status='INBOX').exclude(id=task_id).order_by('created').first()
     if next_task:
@@ -561,53 +856,64 @@ def snooze_task(request, task_id):
 @login_required
 def start_task_timer(request, task_id):
     if request.method == 'POST':
-        task = get_object_or_404(Task, id=task_id, user=request.user)
-
-        remaining = _get_task_timer_remaining_seconds(task)
-        if remaining is None or remaining <= 0:
-            base_minutes = task.time_estimate_minutes or 25
-            remaining = max(60, int(base_minutes) * 60)
-
-        task.timer_seconds_remaining = remaining
-        task.timer_start_time = timezone.now()
-        task.save()
-        return JsonResponse({'status': 'ok', 'seconds': remaining, 'running': True})
+        def start(state):
+            remaining = timer_state.remaining_seconds(state)
+            if remaining is None or remaining <= 0:
+                remaining = timer_state.default_seconds(state)
+            state['seconds'] = remaining
+            state['started_at'] = time.time()
+            state['session_started_at'] = state['started_at']
+            return state
+
+        state = timer_state.apply(task_id, request.user.id, start, transition=True)
+        if state is None:
+            raise Http404("Task not found.")
+        seconds, running = _publish_timer_event(state)
+        return JsonResponse({'status': 'ok', 'seconds': seconds, 'running': running})
     return JsonResponse({'status': 'error'}, status=400)
 
 
 @login_required
 def add_time_to_timer(request, task_id):
     if request.method == 'POST':
-        task = get_object_or_404(Task, id=task_id, user=request.user)
-        remaining = _get_task_timer_remaining_seconds(task)
-        if remaining is not None:
-            task.timer_seconds_remaining = remaining + (5 * 60)
-            if task.timer_start_time:
-                task.timer_start_time = timezone.now()
-            task.save()
-            return JsonResponse({'status': 'ok', 'seconds': task.timer_seconds_remaining, 'running': bool(task.timer_start_time)})
+        def add_time(state):
+            remaining = timer_state.remaining_seconds(state)
+            if remaining is None:
+                return None
+            state['seconds'] = remaining + (5 * 60)
+            if state['started_at']:
+                state['started_at'] = time.time()
+            return state
+
+        state = timer_state.apply(task_id, request.user.id, add_time, transition=False)
+        if state is not None:
+            seconds, running = _publish_timer_event(state)
+            return JsonResponse({'status': 'ok', 'seconds': seconds, 'running': running})
     return JsonResponse({'status': 'error'}, status=400)
 
 
 @login_required
 def pause_task_timer(request, task_id):
     if request.method == 'POST':
-        task = get_object_or_404(Task, id=task_id, user=request.user)
-        remaining = _get_task_timer_remaining_seconds(task)
-        if remaining is None:
-            return JsonResponse({'status': 'error', 'message': 'Timer not initialized.'}, status=400)
-
-        task.timer_seconds_remaining = remaining
-        task.timer_start_time = None
-        task.save(update_fields=['timer_seconds_remaining', 'timer_start_time'])
-        return JsonResponse({'status': 'ok', 'seconds': remaining, 'running': False})
+        running_state = {}
+
+        def pause(state):
+            running_state.update(state)
+            return timer_state.stop(state)
+
+        with transaction.atomic():
+            state = timer_state.apply(task_id, request.user.id, pause, transition=True)
+            if state is None:
+                return JsonResponse({'status': 'error', 'message': 'Timer not initialized.'}, status=400)
+            focus.close_session(running_state)
+        seconds, running = _publish_timer_event(state)
+        return JsonResponse({'status': 'ok', 'seconds': seconds, 'running': running})
     return JsonResponse({'status': 'error'}, status=400)
 
 
 @login_required
 def edit_task_timer(request, task_id):
     if request.method == 'POST':
-        task = get_object_or_404(Task, id=task_id, user=request.user)
         try:
             minutes = int(request.POST.get('minutes', 0))
         except (TypeError, ValueError):
@@ -616,30 +922,254 @@ def edit_task_timer(request, task_id):
         if minutes < 1 or minutes > 600:
             return JsonResponse({'status': 'error', 'message': 'Minutes must be between 1 and 600.'}, status=400)
 
-        task.timer_seconds_remaining = minutes * 60
-        if task.timer_start_time:
-            task.timer_start_time = timezone.now()
-            running = True
-        else:
-            running = False
-        task.save(update_fields=['timer_seconds_remaining', 'timer_start_time'])
-        return JsonResponse({'status': 'ok', 'seconds': task.timer_seconds_remaining, 'running': running})
+        def edit(state):
+            state['seconds'] = minutes * 60
+            if state['started_at']:
+                state['started_at'] = time.time()
+            return state
+
+        state = timer_state.apply(task_id, request.user.id, edit, transition=False)
+        if state is None:
+            raise Http404("Task not found.")
+        seconds, running = _publish_timer_event(state)
+        return JsonResponse({'status': 'ok', 'seconds': seconds, 'running': running})
     return JsonResponse({'status': 'error'}, status=400)
 
 
 @login_required
 def task_timer_status(request, task_id):
-    task = get_object_or_404(Task, id=task_id, user=request.user)
-    remaining = _get_task_timer_remaining_seconds(task)
+    state = timer_state.load(task_id, request.user.id)
+    if state is None:
+        raise Http404("Task not found.")
+    remaining = timer_state.remaining_seconds(state)
     if remaining is None:
-        base_minutes = task.time_estimate_minutes or 25
-        remaining = max(60, int(base_minutes) * 60)
-    return JsonResponse({'status': 'ok', 'seconds': remaining, 'running': bool(task.timer_start_time)})
+        remaining = timer_state.default_seconds(state)
+    return JsonResponse({'status': 'ok', 'seconds': remaining, 'running': bool(state['started_at'])})
+
+
+def event_stream_unavailable(request):
+    """
+    /events/stream/ is served by antiprocastination.asgi. Reaching Django
+    means we are running under WSGI; 204 tells EventSource not to reconnect
+    so the dashboard switches to event_poll_view.
+    """
+    return HttpResponse(status=204)
 
 
 @login_required
+def event_poll_view(request):
+    """WSGI fallback for the event stream, served from the cache only."""
+    try:
+        cursor = int(request.GET.get('cursor', ''))
+    except ValueError:
+        return JsonResponse({'status': 'ok', 'cursor': latest_event_id(request.user.id), 'events': []})
+
+    latest, events = events_since(request.user.id, cursor)
+    return JsonResponse({'status': 'ok', 'cursor': latest, 'events': events})
+
+
+@login_required
+def agenda_view(request):
+    """Week/month agenda as JSON: ?view=week|month&date=YYYY-MM-DD (defaults to this week)."""
+    view = request.GET.get('view', 'week')
+    if view not in ('week', 'month'):
+        view = 'week'
+    try:
+        anchor = date.fromisoformat(request.GET.get('date', ''))
+    except ValueError:
+        anchor = timezone.localdate()
+
+    start, end = agenda.agenda_range(view, anchor)
+    entries = agenda.agenda_entries(request.user, start, end)
+    days = []
+    day = start
+    while day <= end:
+        days.append({'date': day.isoformat(), 'items': entries.get(day, [])})
+        day += timedelta(days=1)
+    return JsonResponse({'status': 'ok', 'view': view, 'start': start.isoformat(), 'end': end.isoformat(), 'days': days})
+
+
+def calendar_feed_view(request, token):
+    """
+    Per-user ICS subscription feed. Authenticated by the secret token in the
+    URL (calendar apps can't log in) and answered with 304 when the ETag or
+    Last-Modified the client sends is still current.
+    """
+    profile = Profile.objects.filter(calendar_token=token).select_related('user').first()
+    if profile is None:
+        raise Http404("Unknown calendar feed.")
+
+    etag, last_modified = agenda.feed_validators(profile.user)
+    last_modified_ts = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified_ts)
+    if response is None:
+        response = StreamingHttpResponse(
+            agenda.iter_ics_feed(profile.user, request.get_host()),
+            content_type='text/calendar; charset=utf-8',
+        )
+        response['Content-Disposition'] = 'inline; filename="smart-planner.ics"'
+    response['ETag'] = etag
+    if last_modified_ts:
+        response['Last-Modified'] = http_date(last_modified_ts)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+def search_view(request):
+    """Ranked full-text search: ?q=...&type=tasks|plans&page=N (20 per page)."""
+    query = request.GET.get('q', '').strip()[:200]
+    kind = request.GET.get('type', 'tasks')
+    if kind not in search.SEARCH_TARGETS:
+        kind = 'tasks'
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        page = 1
+
+    if not query:
+        return JsonResponse({'status': 'ok', 'query': '', 'page': page, 'has_next': False, 'results': []})
+
+    objects, has_next = search.search(request.user, query, kind=kind, page=page)
+    if kind == 'tasks':
+        results = [
+            {
+                'id': task.id,
+                'title': task.title,
+                'status': task.status,
+                'category': task.category,
+                'scheduled_date': task.scheduled_date.isoformat() if task.scheduled_date else None,
+            }
+            for task in objects
+        ]
+    else:
+        results = [
+            {
+                'id': plan.id,
+                'subject': plan.subject,
+                'goal': plan.goal,
+                'url': reverse('view_study_plan', args=[plan.id]),
+            }
+            for plan in objects
+        ]
+    return JsonResponse({'status': 'ok', 'query': query, 'page': page, 'has_next': has_next, 'results': results})
+
+
+@login_required
+def sync_view(request):
+    """
+    Incremental sync: ?since=<cursor> returns tasks, plans and profile
+    changed after the cursor, plus deleted ids. Without a cursor it starts a
+    full sync. Keep calling with the returned cursor while has_more is true.
+    """
+    try:
+        payload = sync.changes_since(request.user, request.GET.get('since') or None)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse({'status': 'ok', **payload})
+
+
+def _export_params(request):
+    export_format = request.GET.get('format', request.POST.get('format', 'jsonl'))
+    if export_format not in export.EXPORT_FORMATS:
+        export_format = 'jsonl'
+    model = request.GET.get('model', request.POST.get('model', ''))
+    if model not in export.EXPORT_SOURCES:
+        model = 'tasks' if export_format == 'csv' else ''
+    return export_format, model
+
+
+@login_required
+def export_data_view(request):
+    """Streams the account as JSON Lines (everything) or CSV (?model=tasks|plans|badges|profile)."""
+    export_format, model = _export_params(request)
+    response = StreamingHttpResponse(
+        export.iter_export(request.user, export_format, model or None),
+        content_type='text/csv; charset=utf-8' if export_format == 'csv' else 'application/x-ndjson; charset=utf-8',
+    )
+    filename = export.export_filename(request.user, export_format, model or None)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+def request_data_export_view(request):
+    if request.method == 'POST':
+        export_format, model = _export_params(request)
+        data_export = DataExport.objects.create(user=request.user, export_format=export_format, model=model)
+        build_data_export(data_export.id)
+        messages.success(request, "Your export is being prepared. The download link will appear here when it is ready.")
+    return redirect('profile')
+
+
+@login_required
+def download_data_export_view(request, export_id):
+    data_export = get_object_or_404(DataExport, id=export_id, user=request.user, status='READY')
+    path = os.path.join(export.export_root(), data_export.file_name)
+    if not os.path.exists(path):
+        raise Http404("This export has expired.")
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=os.path.basename(data_export.file_name))
+
+
+def _queue_enrichment(tasks):
+    targets = importer.enrichment_targets(tasks)
+    if targets:
+        enrich_imported_tasks(targets)
+
+
+@login_required
+def import_tasks_view(request):
+    """Streams an uploaded CSV / JSON Lines / ICS file into the inbox."""
+    if request.method != 'POST':
+        return redirect('profile')
+
+    upload = request.FILES.get('file')
+    if upload is None:
+        messages.error(request, "Please choose a file to import.")
+        return redirect('profile')
+
+    import_format = importer.detect_format(upload.name, request.POST.get('format', ''))
+    on_batch = _queue_enrichment if request.POST.get('enrich') else None
+    try:
+        result = importer.import_tasks(request.user, importer.open_upload(upload), import_format, on_batch=on_batch)
+    except UnicodeDecodeError:
+        messages.error(request, "The file must be UTF-8 encoded.")
+        return redirect('profile')
+
+    if result.created:
+        messages.success(request, f"Imported {result.created} task(s).")
+    if result.error_count:
+        details = "; ".join(f"line {line}: {error}" for line, error in result.errors[:10])
+        more = f" (and {result.error_count - 10} more)" if result.error_count > 10 else ""
+        messages.error(request, f"Skipped {result.error_count} row(s) — {details}{more}")
+    if not result.created and not result.error_count:
+        messages.info(request, "The file had no tasks in it.")
+    return redirect('profile')
+
+
+def _completed_history(user):
+    # Tasks up to history_cleared_at are waiting for the delete_task_history job.
+    cleared_at = Profile.objects.filter(user=user).values_list('history_cleared_at', flat=True).first()
+    completed = Task.objects.filter(user=user, status='COMPLETED')
+    if cleared_at:
+        completed = completed.filter(datecompleted__gt=cleared_at)
+    return completed
+
+
+def _history_stamps(request):
+    # The count catches a task leaving COMPLETED, which needn't move the max.
+    history = _completed_history(request.user).aggregate(latest=Max('last_updated'), count=Count('id'))
+    return [
+        history['latest'],
+        history['count'],
+        Profile.objects.filter(user=request.user).values_list('history_cleared_at', flat=True).first(),
+    ]
+
+
+@login_required
+@conditional.conditional_page(_history_stamps)
 def task_history_view(request):
-    completed_tasks = Task.objects.filter(user=request.user, status='COMPLETED').order_by('-datecompleted')
+    completed_tasks = _completed_history(request.user).order_by('-datecompleted')
     
     grouped_tasks = {}
     for date, tasks in groupby(completed_tasks, key=lambda task: task.datecompleted.date()):
@@ -651,47 +1181,20 @@ def task_history_view(request):
 @login_required
 def reset_history_view(request):
     if request.method == 'POST':
-        Task.objects.filter(user=request.user, status='COMPLETED').delete()
+        # Hidden now, deleted in batches by the background job.
+        Profile.objects.filter(user=request.user).update(history_cleared_at=timezone.now(), last_updated=timezone.now())
+        delete_task_history(request.user.id)
         messages.success(request, "Your task history has been successfully cleared!")
     return redirect('task_history')
 
 @login_required
 def suggest_task_by_mood(request, difficulty):
-    user = request.user
-    
-    # 1. Purane active task ko dhoondh kar INBOX mein waapas bhejo
-    active_task = Task.objects.filter(
-        Q(assignee=user) | Q(user=user, team=None),
-        status='ACTIVE'
-    ).first()
-    
-    if active_task:
-        active_task.status = 'INBOX'
-        active_task.save()
-
-    # 2. Mood ke hisaab se naya task dhoondho (jo personal ho YA team ka ho)
-    #    Snoozed tasks ko ignore karo
-    #    Sabse pehle High Priority, fir sabse purana
-    tasks_query = Task.objects.filter(
-        Q(assignee=user) | Q(user=user, team=None),
-        status='INBOX',
-        difficulty=difficulty
-    ).exclude(snoozed_until__gt=timezone.now()).order_by('-priority', 'created')
-
-    suggested_task = tasks_query.first()
-
-    # 3. Fallback logic: Agar uss difficulty ka task na mile, to koi bhi pending task le lo
-    if not suggested_task:
-        suggested_task = Task.objects.filter(
-            Q(assignee=user) | Q(user=user, team=None),
-            status='INBOX'
-        ).exclude(snoozed_until__gt=timezone.now()).order_by('-priority', 'created').first()
-
-    # 4. Naye task ko ACTIVE banao
+    # One ranked query picks the task; the old active one goes back to INBOX in the same transaction.
+    suggested_task = suggest.activate_next(request.user, difficulty)
+
     if suggested_task:
-        suggested_task.status = 'ACTIVE'
-        suggested_task.save()
-        messages.success(request, f"New task activated: '{suggested_task.title}'")
+        publish_task_event(SimpleNamespace(**suggested_task), 'task', status='ACTIVE')
+        messages.success(request, f"New task activated: '{suggested_task['title']}'")
     else:
         # Agar inbox khaali hai, to koi error nahi, bas message do
         messages.warning(request, "No pending tasks found to activate.")
@@ -740,7 +1243,7 @@ def team_list_view(request):
     User jin teams ka member hai, unki list dikhata hai.
     """
   
-    teams = request.user.teams.all()
+    teams = request.user.teams.filter(pending_deletion=False)
     context = {
         'teams': teams
     }
@@ -769,7 +1272,7 @@ def create_team_view(request):
 
 @login_required
 def team_dashboard_view(request, team_id):
-    team = get_object_or_404(Team, id=team_id)
+    team = get_object_or_404(Team, id=team_id, pending_deletion=False)
     
     if request.user not in team.members.all():
         messages.error(request, "You are not authorized to view this team.")
@@ -811,7 +1314,7 @@ def team_dashboard_view(request, team_id):
 
 @login_required
 def invite_member_view(request, team_id):
-    team = get_object_or_404(Team, id=team_id)
+    team = get_object_or_404(Team, id=team_id, pending_deletion=False)
     
     
     if request.method == 'POST' and request.user == team.owner:
@@ -833,7 +1336,7 @@ def invite_member_view(request, team_id):
 
 @login_required
 def update_team_name_view(request, team_id):
-    team = get_object_or_404(Team, id=team_id)
+    team = get_object_or_404(Team, id=team_id, pending_deletion=False)
 
     if request.user != team.owner:
         messages.error(request, "Only the team owner can rename the team.")
@@ -858,7 +1361,7 @@ def update_team_name_view(request, team_id):
 
 @login_required
 def delete_team_view(request, team_id):
-    team = get_object_or_404(Team, id=team_id)
+    team = get_object_or_404(Team, id=team_id, pending_deletion=False)
 
     if request.user != team.owner:
         messages.error(request, "Only the team owner can delete the team.")
@@ -866,7 +1369,8 @@ def delete_team_view(request, team_id):
 
     if request.method == 'POST':
         team_name = team.name
-        team.delete()
+        Team.objects.filter(id=team.id).update(pending_deletion=True)
+        delete_team_rows(team.id)
         messages.success(request, f"Team '{team_name}' deleted successfully.")
         return redirect('team_list')
 
@@ -877,76 +1381,94 @@ def delete_team_view(request, team_id):
 @login_required
 def add_plan_day_tasks_view(request, plan_id, day_str):
     if request.method == 'POST':
-        plan = get_object_or_404(StudyPlan, id=plan_id, user=request.user)
-        user_selected_date = request.POST.get('manual_scheduled_date')
-        
-        if not user_selected_date:
+        plan = get_object_or_404(StudyPlan, id=plan_id, user=request.user, pending_deletion=False)
+        try:
+            user_selected_date = date.fromisoformat(request.POST.get('manual_scheduled_date', ''))
+        except ValueError:
             messages.error(request, "Please select a date first!")
             return redirect('view_study_plan', plan_id=plan.id)
 
-        
-        lines = plan.generated_plan.splitlines()
-        found_day = False
-        tasks_to_add = []
-
-        # Day Number nikaalna (e.g., "Day 1" se "1" nikaalna)
         day_match = re.search(r'Day\s*(\d+)', day_str, re.IGNORECASE)
-        day_num = day_match.group(1) if day_match else None
-
-        for line in lines:
-            line_strip = line.strip()
-            if not line_strip: continue
-
-            # 1. Day Section dhoondhein (Thoda flexible check)
-            # Agar line mein "Day 1" ya "Day 01" hai
-            if not found_day:
-                if day_num and f"Day {day_num}" in line or day_str.lower() in line.lower():
-                    found_day = True
-                    continue
-            
-            # 2. Agar found_day True hai, toh lines collect karein
-            if found_day:
-                # Agar naya Day shuru ho jaye toh ruk jayein
-                if re.match(r'^(#*\s*Day\s*\d+)', line_strip, re.IGNORECASE) and day_num not in line_strip:
-                    break
-                
-                # Task lines: -, *, •, 1. ya bold tasks uthao
-                # Bullets hata kar sirf text rakho
-                clean_task = re.sub(r'^[\s\d\.\-\*\•\#]+', '', line_strip).strip()
-                if clean_task and len(clean_task) > 3: # Chhoti lines skip karo
-                    tasks_to_add.append(clean_task)
-
-        # 3. SAVE LOGIC
-        if not tasks_to_add:
-            print(f"RESULT: No tasks found for {day_str} in the plan text.")
+        day_num = int(day_match.group(1)) if day_match else None
+
+        created, already = plans.schedule_days(plan, {day_num: user_selected_date}) if day_num else ([], [])
+        if already:
+            messages.info(request, f"{day_str} is already on your dashboard.")
+        elif not created:
             messages.warning(request, f"Format Issue: No tasks found for '{day_str}'. Please check the AI Plan text.")
         else:
-            for title in tasks_to_add:
-                Todo.objects.create(
-                    user=request.user,
-                    title=title,
-                    status='INBOX',
-                    priority=2,
-                    scheduled_date=user_selected_date
-                )
-            messages.success(request, f"Added {len(tasks_to_add)} tasks for {day_str} to your dashboard!")
+            messages.success(request, f"Added {len(created)} tasks for {day_str} to your dashboard!")
             
     return redirect('personal_dashboard')
 
 
+@login_required
+def schedule_study_plan_view(request, plan_id):
+    """Puts every day of the plan on the calendar from a start date, in one bulk insert."""
+    plan = get_object_or_404(StudyPlan, id=plan_id, user=request.user, pending_deletion=False)
+    if request.method != 'POST' or plan.generation_status != 'READY':
+        return redirect('view_study_plan', plan_id=plan.id)
+
+    try:
+        start = date.fromisoformat(request.POST.get('start_date', ''))
+    except ValueError:
+        messages.error(request, "Please select a start date first!")
+        return redirect('view_study_plan', plan_id=plan.id)
+
+    dates = plans.plan_dates(start, plan.duration_days, skip_weekends=request.POST.get('skip_weekends') == 'on')
+    created, already = plans.schedule_days(plan, dates)
+    if created:
+        days = len({task.plan_day for task in created})
+        messages.success(request, f"Scheduled {len(created)} tasks over {days} days, from {start:%b %d} to {dates[plan.duration_days]:%b %d}.")
+    elif already:
+        messages.info(request, "This plan is already on your calendar.")
+    else:
+        messages.warning(request, "No tasks found in this plan.")
+    return redirect('view_study_plan', plan_id=plan.id)
+
+
+@login_required
+def regenerate_plan_days_view(request, plan_id):
+    """Rewrites Day start_day..end_day of a plan with one AI chunk call, keeping every other day."""
+    plan = get_object_or_404(StudyPlan, id=plan_id, user=request.user, pending_deletion=False)
+    if request.method != 'POST' or plan.generation_status != 'READY':
+        return redirect('view_study_plan', plan_id=plan.id)
+
+    try:
+        start_day = int(request.POST.get('start_day', ''))
+        end_day = int(request.POST.get('end_day') or start_day)
+    except ValueError:
+        messages.error(request, "Pick the days to regenerate.")
+        return redirect('view_study_plan', plan_id=plan.id)
+    if not 1 <= start_day <= end_day <= plan.duration_days or end_day - start_day >= plans.MAX_REGENERATE_DAYS:
+        messages.error(request, f"Choose up to {plans.MAX_REGENERATE_DAYS} days between 1 and {plan.duration_days}.")
+        return redirect('view_study_plan', plan_id=plan.id)
+
+    if is_throttled(request, 'plan_regenerate', user_id=request.user.id):
+        messages.error(request, "Too many regenerations. Please wait a few minutes and try again.")
+        return redirect('view_study_plan', plan_id=plan.id)
+
+    new_text = plans.regenerated_days(plan, start_day, end_day)
+    if contains_blocked_content(new_text):
+        messages.error(request, "The regenerated days were blocked due to unsafe content. Your plan is unchanged.")
+        return redirect('view_study_plan', plan_id=plan.id)
+
+    plans.save_regenerated_days(plan.id, new_text, start_day, end_day)
+    label = f"Day {start_day}" if start_day == end_day else f"Days {start_day}-{end_day}"
+    messages.success(request, f"{label} regenerated.")
+    return redirect('view_study_plan', plan_id=plan.id)
+
+
 @login_required
 def delete_study_plan_view(request, plan_id):
     """Deletes a study plan."""
-    plan = get_object_or_404(StudyPlan, id=plan_id, user=request.user)
+    plan = get_object_or_404(StudyPlan, id=plan_id, user=request.user, pending_deletion=False)
     
     if request.method == 'POST':
-        plan_name = plan.subject
-        
-        
-        Task.objects.filter(study_plan=plan).delete() 
-        
-        plan.delete()
-        messages.success(request, f"Plan '{plan_name}' has been deleted.")
+        # Hidden now; the plan and its tasks are deleted in batches by the background job.
+        StudyPlan.objects.filter(id=plan.id).update(pending_deletion=True, last_updated=timezone.now())
+        delete_study_plans(request.user.id)
+        messages.success(request, f"Plan '{plan.subject}' has been deleted.")
     
     return redirect('plan_list')
 
@@ -954,7 +1476,7 @@ def delete_study_plan_view(request, plan_id):
 def complete_study_plan_view(request, plan_id):
     """Marks a study plan as completed."""
    
-    plan = get_object_or_404(StudyPlan, id=plan_id, user=request.user)
+    plan = get_object_or_404(StudyPlan, id=plan_id, user=request.user, pending_deletion=False)
     
     if request.method == 'POST':
         plan.is_completed = True
@@ -969,22 +1491,46 @@ def complete_study_plan_view(request, plan_id):
 def delete_completed_plans_view(request):
     if request.method == 'POST':
        
-        plans = StudyPlan.objects.filter(user=request.user, is_completed=True)
-        count = plans.count()
+        count = StudyPlan.objects.filter(user=request.user, is_completed=True, pending_deletion=False).update(
+            pending_deletion=True, last_updated=timezone.now(),
+        )
         
         if count > 0:
-           
-            Task.objects.filter(study_plan__in=plans).delete()
-            plans.delete()
+            delete_study_plans(request.user.id)
             messages.success(request, f"Successfully deleted {count} completed plan(s).")
         else:
             messages.info(request, "No completed plans to delete.")
             
     return redirect('plan_list')
 
+def _profile_stamps(request):
+    # Badges, exports and focus sessions are only ever saved through the ORM,
+    # so the page version covers them; task stats also change via update().
+    tasks = Task.objects.filter(user=request.user).aggregate(latest=Max('last_updated'), count=Count('id'))
+    return [
+        Profile.objects.filter(user=request.user).values_list('last_updated', flat=True).first(),
+        tasks['latest'],
+        tasks['count'],
+    ]
+
+
 @login_required
+@conditional.conditional_page(_profile_stamps)
 def profile_view(request):
     profile, created = Profile.objects.get_or_create(user=request.user)
+
+    if request.method == 'POST':
+        try:
+            reminder_time = datetime_time.fromisoformat(request.POST.get('reminder_time', ''))
+        except ValueError:
+            messages.error(request, "Please pick a valid reminder time.")
+            return redirect('profile')
+
+        profile.reminder_time = reminder_time
+        profile.save(update_fields=['reminder_time'])
+        ScheduledReminder.reschedule_for_user(request.user, reminder_time)
+        messages.success(request, f"Daily reminders will now arrive at {reminder_time:%H:%M}.")
+        return redirect('profile')
     
     all_badges = Badge.objects.all()
     
@@ -1030,11 +1576,17 @@ def profile_view(request):
         'work_time_counts': list(work_buckets.values()),
         'productivity_best_slot': productivity_best_slot,
         'productivity_total_points': productivity_total_points,
+        'focus': focus.focus_summary(request.user),
+        'forecast': forecast.get_forecast(request.user),
+        'data_exports': DataExport.objects.filter(user=request.user).order_by('-created_at')[:3],
+        'calendar_feed_url': request.build_absolute_uri(
+            reverse('calendar_feed', args=[profile.get_calendar_token()])
+        ),
     }
     return render(request, 'core/profile.html', context)
 @login_required
 def add_team_task_view(request, team_id):
-    team = get_object_or_404(Team, id=team_id)
+    team = get_object_or_404(Team, id=team_id, pending_deletion=False)
 
     if request.method == 'POST' and request.user in team.members.all():
         title = request.POST.get('title')
@@ -1092,14 +1644,19 @@ def add_team_task_view(request, team_id):
 
     return redirect('team_dashboard', team_id=team.id)
 
+def _plan_list_stamps(request):
+    return [StudyPlan.objects.filter(user=request.user, pending_deletion=False).aggregate(latest=Max('last_updated'))['latest']]
+
+
 @login_required
+@conditional.conditional_page(_plan_list_stamps)
 def plan_list(request):
     """
     Simple view to render list of study plans for current user.
     Template: core/plan_list.html
     """
     user = request.user
-    plans = StudyPlan.objects.filter(user=user).order_by('-created_at')
+    plans = StudyPlan.objects.filter(user=user, pending_deletion=False).order_by('-created_at')
     context = {
         'plans': plans,
     }
@@ -1127,19 +1684,14 @@ def _save_or_refresh_otp(user, otp_code):
     otp_obj.save(update_fields=['otp', 'created_at'])
 
 
-def _send_otp_email(user, otp_code, purpose='verify'):
+def _queue_otp_email(user, otp_code, purpose='verify'):
     """
-    Send OTP via Brevo transactional email HTTP API (avoids SMTP port blocks on Render).
-    Falls back to Django send_mail only if BREVO_API_KEY is not set.
+    Writes the OTP mail to the outbox inside the caller's transaction; the
+    deliver_outbox_emails job sends it. Returns False when no delivery
+    channel is configured so callers can use the local-OTP fallback.
     """
-    import httpx
-
-    api_key = os.environ.get("BREVO_API_KEY", "")
-    from_email = settings.DEFAULT_FROM_EMAIL
-    from_name = "Smart Planner"
-
-    if not from_email:
-        raise ValueError("DEFAULT_FROM_EMAIL is not configured.")
+    if email_delivery_error():
+        return False
 
     if purpose == 'reset':
         subject = "Smart Planner Password Reset OTP"
@@ -1156,32 +1708,8 @@ def _send_otp_email(user, otp_code, purpose='verify'):
             "This code is valid for 5 minutes."
         )
 
-    if api_key:
-        # Use Brevo REST API (works on all hosting including Render free tier)
-        payload = {
-            "sender": {"name": from_name, "email": from_email},
-            "to": [{"email": user.email}],
-            "subject": subject,
-            "textContent": text_content,
-        }
-        headers = {
-            "accept": "application/json",
-            "content-type": "application/json",
-            "api-key": api_key,
-        }
-        resp = httpx.post(
-            "https://api.brevo.com/v3/smtp/email",
-            json=payload,
-            headers=headers,
-            timeout=15,
-        )
-        if resp.status_code not in (200, 201):
-            raise RuntimeError(f"Brevo API error {resp.status_code}: {resp.text}")
-    else:
-        # Fallback: Django SMTP backend (may be blocked on some hosts)
-        if not settings.EMAIL_HOST_USER or not settings.EMAIL_HOST_PASSWORD:
-            raise ValueError("Neither BREVO_API_KEY nor SMTP credentials are configured.")
-        send_mail(subject, text_content, from_email, [user.email])
+    EmailOutbox.objects.create(to_email=user.email, subject=subject, text_content=text_content)
+    return True
 
 
 def _get_pending_signup_user(username, email):
@@ -1210,6 +1738,10 @@ def signup_view(request):
             messages.error(request, "Username, email, and password are required.")
             return redirect('signup')
 
+        if is_throttled(request, 'signup', email=email):
+            messages.error(request, "Too many attempts. Please wait a few minutes and try again.")
+            return redirect('signup')
+
         clean_username = re.sub(r'[^a-zA-Z]', '', username).lower()
         if profanity.contains_profanity(username) or profanity.contains_profanity(clean_username):
             messages.error(request, "Username contains prohibited words.")
@@ -1237,8 +1769,10 @@ def signup_view(request):
                 user.save()
 
                 _save_or_refresh_otp(user, otp_code)
+                email_queued = _queue_otp_email(user, otp_code, purpose='verify')
 
-            _send_otp_email(user, otp_code, purpose='verify')
+            if not email_queued:
+                raise ValueError(email_delivery_error())
 
             request.session['verify_user_id'] = user.id
             request.session['temp_email'] = email
@@ -1267,6 +1801,12 @@ def resend_otp_view(request):
     verify_user_id = request.session.get('verify_user_id')
     reset_user_id = request.session.get('reset_user_id')
 
+    if is_throttled(request, 'resend_otp', user_id=verify_user_id or reset_user_id):
+        messages.error(request, "Too many attempts. Please wait a few minutes and try again.")
+        if reset_user_id and not verify_user_id:
+            return redirect('forgot_password_verify')
+        return redirect('verify_otp')
+
     user = None
     purpose = 'verify'
     if verify_user_id:
@@ -1281,17 +1821,18 @@ def resend_otp_view(request):
         return redirect('signup')
 
     otp_code = str(random.randint(100000, 999999))
-    _save_or_refresh_otp(user, otp_code)
+    with transaction.atomic():
+        _save_or_refresh_otp(user, otp_code)
+        email_queued = _queue_otp_email(user, otp_code, purpose=purpose)
 
-    try:
-        _send_otp_email(user, otp_code, purpose=purpose)
+    if email_queued:
         messages.success(request, "New OTP sent successfully.")
-    except Exception as e:
-        logger.exception("Resend OTP email failed for user_id=%s purpose=%s", user.id, purpose)
+    else:
+        logger.error("Resend OTP email not queued for user_id=%s purpose=%s: %s", user.id, purpose, email_delivery_error())
         if _is_local_request(request):
             messages.warning(request, f"Email delivery failed locally. Use this OTP: {otp_code}")
         else:
-            messages.error(request, f"Failed to send OTP: {e}")
+            messages.error(request, f"Failed to send OTP: {email_delivery_error()}")
 
     if purpose == 'reset':
         return redirect('forgot_password_verify')
@@ -1312,6 +1853,10 @@ def verify_otp_view(request):
         return redirect('signup')
 
     if request.method == 'POST':
+        if is_throttled(request, 'verify_otp', user_id=user.id):
+            messages.error(request, "Too many attempts. Please wait a few minutes and try again.")
+            return redirect('verify_otp')
+
         entered_otp = request.POST.get('otp', '').strip()
         otp_obj = OTPVerification.objects.filter(user=user).first()
 
@@ -1343,6 +1888,10 @@ def verify_otp_view(request):
 def forgot_password_request_view(request):
     if request.method == 'POST':
         identifier = request.POST.get('identifier', '').strip()
+        if is_throttled(request, 'forgot_password', email=identifier):
+            messages.error(request, "Too many attempts. Please wait a few minutes and try again.")
+            return redirect('forgot_password')
+
         user = User.objects.filter(
             Q(username__iexact=identifier) | Q(email__iexact=identifier),
             is_active=True,
@@ -1353,22 +1902,23 @@ def forgot_password_request_view(request):
             return redirect('forgot_password')
 
         otp_code = str(random.randint(100000, 999999))
-        _save_or_refresh_otp(user, otp_code)
+        with transaction.atomic():
+            _save_or_refresh_otp(user, otp_code)
+            email_queued = _queue_otp_email(user, otp_code, purpose='reset')
 
         request.session['reset_user_id'] = user.id
         request.session['temp_email'] = user.email
 
-        try:
-            _send_otp_email(user, otp_code, purpose='reset')
+        if email_queued:
             messages.success(request, "Password reset OTP sent to your email.")
             return redirect('forgot_password_verify')
-        except Exception as e:
-            logger.exception("Password reset OTP email failed for user_id=%s", user.id)
-            if _is_local_request(request):
-                messages.warning(request, f"Email delivery failed locally. Use this OTP: {otp_code}")
-                return redirect('forgot_password_verify')
-            messages.error(request, f"Could not send OTP: {e}")
-            return redirect('forgot_password')
+
+        logger.error("Password reset OTP email not queued for user_id=%s: %s", user.id, email_delivery_error())
+        if _is_local_request(request):
+            messages.warning(request, f"Email delivery failed locally. Use this OTP: {otp_code}")
+            return redirect('forgot_password_verify')
+        messages.error(request, f"Could not send OTP: {email_delivery_error()}")
+        return redirect('forgot_password')
 
     return render(request, 'registration/forgot_password.html')
 
@@ -1387,6 +1937,10 @@ def forgot_password_verify_view(request):
         return redirect('forgot_password')
 
     if request.method == 'POST':
+        if is_throttled(request, 'verify_otp', user_id=user.id):
+            messages.error(request, "Too many attempts. Please wait a few minutes and try again.")
+            return redirect('forgot_password_verify')
+
         entered_otp = request.POST.get('otp', '').strip()
         password = request.POST.get('password', '')
         confirm_password = request.POST.get('confirm_password', '')
@@ -1432,7 +1986,7 @@ def assign_task_to_member_view(request):
         assignee_id = request.POST.get('assignee_id')
         deadline = request.POST.get('deadline') # Jo naya field aapne add kiya
         
-        team = get_object_or_404(Team, id=team_id, owner=request.user)
+        team = get_object_or_404(Team, id=team_id, owner=request.user, pending_deletion=False)
         assignee = get_object_or_404(User, id=assignee_id)
 
         # Todo table mein naya task create karna
@@ -1451,7 +2005,7 @@ def assign_task_to_member_view(request):
     
 def schedule_assigned_task_view(request, task_id):
     # 1. Sirf wahi task uthao jahan current user 'assignee' hai
-    task = get_object_or_404(Todo, id=task_id, assignee=request.user)
+    task = get_object_or_404(Todo.objects.exclude(status='DELETED'), id=task_id, assignee=request.user)
     
     if request.method == 'POST':
         user_date = request.POST.get('my_schedule_date')